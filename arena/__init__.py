@@ -0,0 +1,7 @@
+from .match import run_match # Ensure correct relative import
+from .openings import DEFAULT_OPENINGS, default_openings, load_openings, game_pgn
+from .players import parse_engine_spec
+from .stats import MatchStats, SPRT, SPRT_H0, SPRT_H1, elo_from_score, score_from_elo
+
+__all__ = ['run_match', 'DEFAULT_OPENINGS', 'default_openings', 'load_openings', 'game_pgn', 'parse_engine_spec',
+           'MatchStats', 'SPRT', 'SPRT_H0', 'SPRT_H1', 'elo_from_score', 'score_from_elo']
@@ -0,0 +1,159 @@
+"""Plays arena matches between two engines in parallel worker processes.
+
+Each worker loads both engines once and keeps up to `concurrency` games going at the same time. On
+every step, all the games where one MCTS engine is to move are searched together, so the network is
+called with one batch per simulation step instead of once per game. Both games of an opening pair go
+to the same worker, where they share the evaluator's transposition table. The parent process collects
+finished games, updates the Elo estimate and stops every worker as soon as the SPRT is decided; games
+that were already running finish, but are reported apart and do not change the statistics.
+"""
+import logging
+import multiprocessing
+import queue
+import time
+import traceback
+import chess
+from .openings import board_from_opening, opening_moves
+from .stats import MatchStats
+
+logger = logging.getLogger('training') # Get training logger
+
+ENGINE_A, ENGINE_B = 0, 1
+
+class ArenaGame:
+    """One game from an opening; `result` is set once it is over (or adjudicated a draw at `max_plies`)."""
+
+    def __init__(self, task, max_plies):
+        self.task = task
+        self.board = board_from_opening(task['fen'], task['moves'])
+        self.white_engine = ENGINE_A if task['a_is_white'] else ENGINE_B
+        self.max_plies = max_plies
+        self.plies = 0 # Played after the opening
+        self.result = None
+        self.termination = None
+
+    @property
+    def engine_to_move(self):
+        return self.white_engine if self.board.turn == chess.WHITE else 1 - self.white_engine
+
+    def play(self, move):
+        self.board.push(move)
+        self.plies += 1
+        outcome = self.board.outcome() # Checkmate, stalemate, insufficient material, 75 moves, fivefold
+        if outcome is not None:
+            self.result, self.termination = outcome.result(), outcome.termination.name.lower()
+        elif self.board.is_repetition(3):
+            self.result, self.termination = "1/2-1/2", 'threefold_repetition'
+        elif self.board.halfmove_clock >= 100:
+            self.result, self.termination = "1/2-1/2", 'fifty_moves'
+        elif self.plies >= self.max_plies:
+            self.result, self.termination = "1/2-1/2", 'max_plies'
+
+    def a_score(self):
+        if self.result == "1/2-1/2":
+            return 0.5
+        white_won = self.result == "1-0"
+        return 1.0 if white_won == (self.white_engine == ENGINE_A) else 0.0
+
+    def to_dict(self):
+        return dict(self.task, result=self.result, termination=self.termination, a_score=self.a_score(), plies=self.plies,
+                    game_moves=[move.uci() for move in self.board.move_stack[len(self.task['moves']):]])
+
+def _play_games(engine_specs, backend, tasks, results, stop_event, concurrency, max_plies):
+    from .players import build_players
+    players = build_players(engine_specs, backend=backend)
+    pending, active = list(tasks), []
+    while not stop_event.is_set():
+        while pending and len(active) < concurrency:
+            active.append(ArenaGame(pending.pop(0), max_plies))
+        if not active:
+            return
+        for engine_index, player in enumerate(players):
+            games = [game for game in active if game.result is None and game.engine_to_move == engine_index]
+            if games:
+                for game, move in zip(games, player.choose_moves([game.board for game in games])):
+                    game.play(move)
+        for game in active:
+            if game.result is not None:
+                results.put(game.to_dict())
+        active = [game for game in active if game.result is None]
+
+def _worker(engine_specs, backend, tasks, results, stop_event, concurrency, max_plies):
+    try:
+        _play_games(engine_specs, backend, tasks, results, stop_event, concurrency, max_plies)
+    except Exception:
+        results.put({'error': traceback.format_exc()})
+    finally:
+        results.put(None) # This worker is done
+
+def game_tasks(openings, num_games):
+    """Games in opening pairs: game 2k plays opening k with engine A as white, game 2k + 1 with colours reversed."""
+    tasks = []
+    for index in range(num_games):
+        name, board = openings[(index // 2) % len(openings)]
+        fen, moves = opening_moves(board)
+        tasks.append({'index': index, 'opening': name, 'fen': fen, 'moves': moves, 'a_is_white': index % 2 == 0})
+    return tasks
+
+def run_match(engine_a, engine_b, openings, num_games, num_workers=4, concurrency=16, max_plies=400, sprt=None, backend='keras', on_game=None):
+    """Plays up to `num_games` games between parsed engine specs `engine_a` and `engine_b`.
+
+    `on_game(game, stats)` is called in this process after every counted game. Returns the report: both
+    engines, Elo statistics of engine A, the SPRT state (if any) and every game. Once the SPRT is decided,
+    the statistics stay as they were at the decision; games finished afterwards go to 'late_games'.
+    """
+    start_time = time.time()
+    tasks = game_tasks(openings, num_games)
+    pairs = [tasks[start:start + 2] for start in range(0, len(tasks), 2)]
+    num_workers = max(1, min(num_workers, len(pairs)))
+    context = multiprocessing.get_context('spawn') # TensorFlow is not fork-safe
+    stop_event = context.Event()
+    results = context.Queue()
+    workers = [context.Process(target=_worker, name=f"stockzero-arena-{index}", daemon=True, args=(
+        [engine_a, engine_b], backend, [task for pair in pairs[index::num_workers] for task in pair], results, stop_event, concurrency, max_plies,
+    )) for index in range(num_workers)]
+    for worker in workers:
+        worker.start()
+
+    stats, games, late_games, errors = MatchStats(), [], [], []
+    decision, finished_workers = None, 0
+    while finished_workers < num_workers:
+        try:
+            item = results.get(timeout=5.0)
+        except queue.Empty:
+            if any(worker.exitcode not in (None, 0) for worker in workers): # Killed without reporting, e.g. out of memory
+                errors.append("An arena worker exited unexpectedly")
+                break
+            continue
+        if item is None:
+            finished_workers += 1
+        elif 'error' in item:
+            errors.append(item['error'])
+            stop_event.set()
+        elif decision is not None: # Was running when the SPRT was decided
+            late_games.append(item)
+        else:
+            stats.add(item['a_score'])
+            games.append(item)
+            if on_game is not None:
+                on_game(item, stats)
+            if sprt is not None and decision is None:
+                decision = sprt.status(stats)
+                if decision is not None:
+                    logger.info(f"SPRT decided {decision} after {stats.games} games, stopping the arena")
+                    stop_event.set()
+    stop_event.set()
+    for worker in workers:
+        worker.join(timeout=30)
+        if worker.is_alive():
+            worker.terminate()
+    if errors:
+        raise RuntimeError(f"Arena worker failed:\n{errors[0]}")
+
+    games.sort(key=lambda game: game['index'])
+    late_games.sort(key=lambda game: game['index'])
+    return {
+        'engine_a': engine_a, 'engine_b': engine_b, 'games_planned': num_games, 'workers': num_workers,
+        'stats': stats.to_dict(), 'sprt': sprt.to_dict(stats) if sprt is not None else None, # Both as of the decision
+        'seconds': time.time() - start_time, 'games': games, 'late_games': late_games,
+    }
@@ -0,0 +1,94 @@
+"""Opening suites for arena matches.
+
+Every opening is played twice with colours reversed, so the two engines meet in the same positions
+and games started from different openings are far less correlated than games from the initial position.
+"""
+import chess
+import chess.pgn
+
+DEFAULT_OPENINGS = [ # Short main lines (SAN), roughly balanced
+    "e4 e5 Nf3 Nc6 Bb5 a6",
+    "e4 e5 Nf3 Nc6 Bc4 Bc5",
+    "e4 e5 Nf3 Nf6 Nxe5 d6",
+    "e4 e5 Nf3 Nc6 d4 exd4",
+    "e4 c5 Nf3 d6 d4 cxd4",
+    "e4 c5 Nf3 Nc6 d4 cxd4",
+    "e4 c5 Nc3 Nc6 g3 g6",
+    "e4 e6 d4 d5 Nc3 Bb4",
+    "e4 e6 d4 d5 e5 c5",
+    "e4 c6 d4 d5 e5 Bf5",
+    "e4 c6 d4 d5 Nc3 dxe4",
+    "e4 d6 d4 Nf6 Nc3 g6",
+    "e4 d5 exd5 Qxd5 Nc3 Qa5",
+    "d4 d5 c4 e6 Nc3 Nf6",
+    "d4 d5 c4 c6 Nf3 Nf6",
+    "d4 d5 c4 dxc4 Nf3 Nf6",
+    "d4 Nf6 c4 e6 Nc3 Bb4",
+    "d4 Nf6 c4 g6 Nc3 Bg7",
+    "d4 Nf6 c4 e6 Nf3 b6",
+    "d4 Nf6 c4 c5 d5 b5",
+    "d4 f5 g3 Nf6 Bg2 g6",
+    "d4 d5 Nf3 Nf6 Bf4 c5",
+    "c4 e5 Nc3 Nf6 Nf3 Nc6",
+    "c4 c5 Nc3 Nc6 g3 g6",
+    "Nf3 d5 g3 Nf6 Bg2 c6",
+    "Nf3 Nf6 c4 b6 g3 Bb7",
+    "g3 d5 Bg2 Nf6 Nf3 c6",
+    "b3 e5 Bb2 Nc6 e3 d5",
+]
+
+def opening_board(moves_san):
+    """The position after the space-separated SAN moves, with the moves on the stack (for repetition detection)."""
+    board = chess.Board()
+    for san in moves_san.split():
+        board.push_san(san)
+    return board
+
+def load_openings(path):
+    """Start positions from a file: one FEN/EPD or SAN move line per line, or the games of a PGN file.
+
+    Returns a list of (name, board).
+    """
+    if path.endswith(".pgn"):
+        openings = []
+        with open(path) as pgn_file:
+            while (game := chess.pgn.read_game(pgn_file)) is not None:
+                board = game.end().board()
+                openings.append((game.headers.get('Opening') or board.fen(), board))
+        return openings
+    openings = []
+    with open(path) as openings_file:
+        for line in openings_file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if "/" in line:
+                try:
+                    board = chess.Board(line)
+                except ValueError: # EPD, with operations instead of move clocks
+                    board, _ = chess.Board.from_epd(line)
+            else:
+                board = opening_board(line)
+            openings.append((line, board))
+    return openings
+
+def default_openings():
+    return [(moves_san, opening_board(moves_san)) for moves_san in DEFAULT_OPENINGS]
+
+def opening_moves(board):
+    """The opening as a FEN and UCI moves, small enough to send to worker processes."""
+    root = board.root()
+    return root.fen(), [move.uci() for move in board.move_stack]
+
+def board_from_opening(fen, moves_uci):
+    board = chess.Board(fen)
+    for move_uci in moves_uci:
+        board.push_uci(move_uci)
+    return board
+
+def game_pgn(fen, moves_uci, headers):
+    """PGN text of a finished arena game."""
+    game = chess.pgn.Game.from_board(board_from_opening(fen, moves_uci))
+    for name, value in headers.items():
+        game.headers[name] = str(value)
+    return str(game)
@@ -0,0 +1,94 @@
+"""Engines that can play in the arena, described by short spec strings.
+
+* `rl:<checkpoint>[@<nodes>]`: an RL checkpoint searched with MCTS at a fixed number of simulations
+  per move (100 by default). `<checkpoint>` is a weights file, a registry version, or `latest`.
+* `traditional[:<depth>]`: the alpha-beta `traditional_engine` at a fixed depth (2 by default).
+* `mcts:<nodes>`: fixed-node MCTS without a network (uniform priors, values only from finished games),
+  a reference that does not change between checkpoints.
+"""
+import contextlib
+import io
+import os
+import chess
+import numpy as np
+
+DEFAULT_NODES = 100
+DEFAULT_DEPTH = 2
+MAX_TABLE_SIZE = 20000 # Evaluations kept per network and worker (about 0.5 KB each, 10 MB)
+
+def parse_engine_spec(spec):
+    """Parses an engine spec string into a dict; RL checkpoints are resolved to a weights file here, once."""
+    kind, _, argument = spec.partition(":")
+    if kind == 'rl':
+        checkpoint, _, nodes = argument.partition("@")
+        return {'kind': 'rl', 'name': spec, 'weights': resolve_checkpoint(checkpoint or 'latest'), 'nodes': int(nodes or DEFAULT_NODES)}
+    if kind == 'traditional':
+        return {'kind': 'traditional', 'name': spec, 'depth': int(argument or DEFAULT_DEPTH)}
+    if kind == 'mcts':
+        return {'kind': 'mcts', 'name': spec, 'nodes': int(argument or DEFAULT_NODES)}
+    raise ValueError(f"Unknown engine spec: {spec} (expected rl:<checkpoint>[@<nodes>], traditional[:<depth>] or mcts:<nodes>)")
+
+def resolve_checkpoint(checkpoint):
+    from engine import MODEL_DIR, MODEL_WEIGHTS_FILE
+    from engine.registry import ModelRegistry
+    if os.path.exists(checkpoint):
+        return checkpoint
+    registry = ModelRegistry(MODEL_DIR, MODEL_WEIGHTS_FILE)
+    model_version = registry.latest() if checkpoint == 'latest' else registry.get(checkpoint)
+    if model_version is None:
+        raise ValueError(f"No checkpoint '{checkpoint}': not a file and not a version in {MODEL_DIR}")
+    return model_version.weights_file
+
+class UniformNetwork:
+    """Stands in for the network: uniform policy over all moves (masked to legal ones by the search) and value 0."""
+
+    def __call__(self, board_inputs):
+        from engine.utils import NUM_POSSIBLE_MOVES
+        batch_size = len(board_inputs)
+        return np.full((batch_size, NUM_POSSIBLE_MOVES), 1.0 / NUM_POSSIBLE_MOVES, dtype=np.float32), np.zeros((batch_size, 1), dtype=np.float32)
+
+class MCTSPlayer:
+    """Searches all the positions where it is to move together: one batched network call per simulation step.
+
+    The evaluator (and its transposition table) is shared by every game of the worker that uses the same network.
+    """
+
+    def __init__(self, evaluator, nodes):
+        self.evaluator = evaluator
+        self.nodes = nodes
+
+    def choose_moves(self, boards):
+        from engine.mcts import MCTSNode, run_mcts_batch, choose_best_move_from_mcts
+        root_nodes = [MCTSNode(board) for board in boards]
+        run_mcts_batch(root_nodes, self.evaluator, self.nodes)
+        return [choose_best_move_from_mcts(root_node) for root_node in root_nodes]
+
+class TraditionalPlayer:
+    def __init__(self, depth):
+        self.depth = depth
+
+    def choose_moves(self, boards):
+        from engine import traditional_engine
+        moves = []
+        for board in boards:
+            traditional_engine.board = board.copy()
+            with contextlib.redirect_stdout(io.StringIO()): # selectmove prints when the opening book is missing
+                moves.append(chess.Move.from_uci(traditional_engine.selectmove(self.depth)))
+        return moves
+
+def build_players(engine_specs, backend='keras', max_table_size=MAX_TABLE_SIZE):
+    """Players for parsed `engine_specs`, loading every distinct checkpoint once and sharing its evaluator."""
+    from engine.backends import load_policy_value_net
+    from engine.evaluator import BatchedEvaluator
+    evaluators = {}
+    players = []
+    for engine_spec in engine_specs:
+        if engine_spec['kind'] == 'traditional':
+            players.append(TraditionalPlayer(engine_spec['depth']))
+            continue
+        network_key = engine_spec.get('weights') # None for the network-free MCTS
+        if network_key not in evaluators:
+            policy_value_net = load_policy_value_net(network_key, backend=backend) if network_key else UniformNetwork()
+            evaluators[network_key] = BatchedEvaluator(policy_value_net, max_table_size=max_table_size)
+        players.append(MCTSPlayer(evaluators[network_key], engine_spec['nodes']))
+    return players
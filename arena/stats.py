@@ -0,0 +1,106 @@
+"""Elo estimates with confidence intervals and the sequential probability ratio test for arena matches.
+
+Scores are from engine A's point of view (win 1, draw 0.5, loss 0). The variance of a game's score is
+estimated from the observed wins, draws and losses, so draws narrow the interval as they should.
+"""
+import math
+
+def score_from_elo(elo):
+    return 1.0 / (1.0 + 10.0 ** (-elo / 400.0))
+
+def elo_from_score(score):
+    score = min(max(score, 1e-6), 1.0 - 1e-6) # A clean sweep has no finite Elo
+    return -400.0 * math.log10(1.0 / score - 1.0)
+
+class MatchStats:
+    """Running win/draw/loss counts of engine A."""
+
+    def __init__(self):
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    def add(self, score):
+        if score == 1.0:
+            self.wins += 1
+        elif score == 0.5:
+            self.draws += 1
+        else:
+            self.losses += 1
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    @property
+    def score(self):
+        return (self.wins + 0.5 * self.draws) / self.games if self.games else 0.5
+
+    @property
+    def variance(self):
+        """Variance of one game's score."""
+        if not self.games:
+            return 0.0
+        score = self.score
+        return (self.wins * (1.0 - score) ** 2 + self.draws * (0.5 - score) ** 2 + self.losses * score ** 2) / self.games
+
+    def elo(self):
+        return elo_from_score(self.score)
+
+    def elo_interval(self, z=1.96):
+        """(low, high) Elo bounds, 95% by default (normal approximation of the mean score)."""
+        if not self.games:
+            return -math.inf, math.inf
+        margin = z * math.sqrt(self.variance / self.games)
+        return elo_from_score(self.score - margin), elo_from_score(self.score + margin)
+
+    def likelihood_of_superiority(self):
+        """Probability that engine A is the stronger one, from wins and losses only."""
+        if not self.wins + self.losses:
+            return 0.5
+        return 0.5 * (1.0 + math.erf((self.wins - self.losses) / math.sqrt(2.0 * (self.wins + self.losses))))
+
+    def to_dict(self):
+        low, high = self.elo_interval()
+        return {'games': self.games, 'wins': self.wins, 'draws': self.draws, 'losses': self.losses, 'score': self.score,
+                'elo': self.elo(), 'elo_low': low, 'elo_high': high, 'los': self.likelihood_of_superiority()}
+
+SPRT_H0 = 'H0' # Engine A is not `elo1` stronger (gate fails)
+SPRT_H1 = 'H1' # Engine A is at least `elo1` stronger than `elo0` (gate passes)
+
+class SPRT:
+    """Sequential probability ratio test of H0: Elo = elo0 against H1: Elo = elo1.
+
+    Uses the normal approximation of the log-likelihood ratio (as Fishtest's simplified test), checked
+    after every game; `alpha` and `beta` are the false positive and false negative rates.
+    """
+
+    def __init__(self, elo0=0.0, elo1=10.0, alpha=0.05, beta=0.05, min_games=20):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.min_games = min_games # The variance estimate is meaningless on a handful of games
+        self.lower_bound = math.log(beta / (1.0 - alpha))
+        self.upper_bound = math.log((1.0 - beta) / alpha)
+
+    def llr(self, stats):
+        if not stats.games or stats.variance == 0:
+            return 0.0
+        score0, score1 = score_from_elo(self.elo0), score_from_elo(self.elo1)
+        return (score1 - score0) * (2.0 * stats.score - score0 - score1) / (2.0 * stats.variance / stats.games)
+
+    def status(self, stats):
+        """SPRT_H1 or SPRT_H0 once a bound is crossed, None while the test is still running."""
+        if stats.games < self.min_games:
+            return None
+        llr = self.llr(stats)
+        if llr >= self.upper_bound:
+            return SPRT_H1
+        if llr <= self.lower_bound:
+            return SPRT_H0
+        return None
+
+    def to_dict(self, stats):
+        return {'elo0': self.elo0, 'elo1': self.elo1, 'alpha': self.alpha, 'beta': self.beta, 'llr': self.llr(stats),
+                'lower_bound': self.lower_bound, 'upper_bound': self.upper_bound, 'result': self.status(stats)}
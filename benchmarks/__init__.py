@@ -0,0 +1,3 @@
+from .suite import BENCHMARKS, BenchmarkContext, run_benchmarks, compare_to_baseline, save_report, load_report # Ensure correct relative import
+
+__all__ = ['BENCHMARKS', 'BenchmarkContext', 'run_benchmarks', 'compare_to_baseline', 'save_report', 'load_report']
@@ -0,0 +1,265 @@
+"""Benchmarks for the engine hot paths, with JSON results and baseline comparison.
+
+Run through `python manage.py run_benchmarks`. Every benchmark uses the fixed positions below and fixed
+seeds, and reports a throughput (higher is better) taken as the best of several repeats.
+"""
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import chess
+import numpy as np
+
+BENCHMARK_POSITIONS = [ # Opening, middlegame and endgame positions used by every benchmark
+    chess.STARTING_FEN,
+    "r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3",
+    "r1bq1rk1/pp2bppp/2n1pn2/2pp4/2PP4/2N1PN2/PP2BPPP/R1BQ1RK1 w - - 0 8",
+    "r2q1rk1/1b1nbppp/p2ppn2/1p6/3NP3/1BN1B3/PPP1QPPP/R4RK1 w - - 4 12",
+    "2r2rk1/pp1q1ppp/4pn2/3p4/3P4/2PB1Q2/P4PPP/R4RK1 w - - 0 18",
+    "8/5pk1/6p1/3R4/5P2/6PK/r7/8 w - - 0 45",
+]
+SEED = 1234
+REPEATS = 3 # Each benchmark keeps its best repeat to reduce noise
+MCTS_SIMULATION_COUNTS = (25, 100, 400)
+
+class BenchmarkContext:
+    """Shared state for a benchmark run: positions, the network under test and the iteration scale."""
+
+    def __init__(self, policy_value_net=None, quick=False, network=None):
+        self.boards = [chess.Board(fen) for fen in BENCHMARK_POSITIONS]
+        self._policy_value_net = policy_value_net
+        self.network = network # Architecture config of the seeded network (engine/network_config.py), baseline if None
+        self.scale = 0.2 if quick else 1.0
+
+    def iterations(self, count):
+        return max(1, int(count * self.scale))
+
+    @property
+    def policy_value_net(self):
+        if self._policy_value_net is None:
+            self._policy_value_net = build_benchmark_network(network=self.network)
+        return self._policy_value_net
+
+def seed_everything(seed=SEED):
+    random.seed(seed)
+    np.random.seed(seed)
+    try:
+        import tensorflow as tf
+        tf.random.set_seed(seed)
+    except ImportError:
+        pass
+
+def build_benchmark_network(weights_file=None, network=None):
+    """Randomly initialised (seeded) network with the `network` architecture, or a trained one when `weights_file` is given."""
+    from engine.backends import weights_network_config
+    from engine.model import build_policy_value_net
+    from engine.utils import NUM_POSSIBLE_MOVES
+    seed_everything()
+    policy_value_net = build_policy_value_net(NUM_POSSIBLE_MOVES, weights_network_config(weights_file) if weights_file else network)
+    if weights_file:
+        policy_value_net.load_weights(weights_file)
+    return policy_value_net
+
+@contextlib.contextmanager
+def no_evaluation_cache():
+    """Swaps the Django cache for a dummy one so `MCTSNode.evaluate` always reaches the network."""
+    from django.test.utils import override_settings
+    with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}):
+        yield
+
+def _best_rate(run_once, work_per_run, repeats=REPEATS):
+    """Times `run_once` `repeats` times and returns (best rate in work units per second, best seconds)."""
+    best_seconds = float('inf')
+    for _ in range(repeats):
+        seed_everything()
+        start_time = time.perf_counter()
+        run_once()
+        best_seconds = min(best_seconds, time.perf_counter() - start_time)
+    return work_per_run / best_seconds, best_seconds
+
+def bench_board_to_input(context):
+    from engine.utils import board_to_input
+    iterations = context.iterations(500)
+    def run_once():
+        for _ in range(iterations):
+            for board in context.boards:
+                board_to_input(board)
+    return _best_rate(run_once, iterations * len(context.boards)), "positions/sec"
+
+def bench_legal_moves_mask(context):
+    from engine.utils import get_legal_moves_mask
+    iterations = context.iterations(500)
+    def run_once():
+        for _ in range(iterations):
+            for board in context.boards:
+                get_legal_moves_mask(board)
+    return _best_rate(run_once, iterations * len(context.boards)), "positions/sec"
+
+def bench_mcts_evaluate(context):
+    from engine.mcts import MCTSNode
+    iterations = context.iterations(50)
+    policy_value_net = context.policy_value_net
+    def run_once():
+        for _ in range(iterations):
+            for board in context.boards:
+                MCTSNode(board).evaluate(policy_value_net)
+    with no_evaluation_cache():
+        MCTSNode(context.boards[0]).evaluate(policy_value_net) # Warm up (graph tracing, allocations)
+        return _best_rate(run_once, iterations * len(context.boards)), "evaluations/sec"
+
+def bench_network_batch(context):
+    """Forward passes at the batch size of `RLEngine.analyse` and the batched evaluator."""
+    from engine.utils import board_to_input
+    batch_size = 32
+    iterations = context.iterations(20)
+    board_inputs = np.stack([board_to_input(context.boards[i % len(context.boards)]) for i in range(batch_size)])
+    policy_value_net = context.policy_value_net
+    policy_value_net(board_inputs) # Warm up
+    def run_once():
+        for _ in range(iterations):
+            policy_value_net(board_inputs)
+    return _best_rate(run_once, iterations * batch_size), "positions/sec"
+
+def make_mcts_benchmark(num_simulations):
+    def bench_run_mcts(context):
+        from engine.mcts import MCTSNode, run_mcts
+        policy_value_net = context.policy_value_net
+        boards = context.boards[:2] if num_simulations >= 400 else context.boards
+        def run_once():
+            for board in boards:
+                run_mcts(MCTSNode(board), policy_value_net, num_simulations)
+        with no_evaluation_cache():
+            run_mcts(MCTSNode(boards[0]), policy_value_net, 2) # Warm up
+            return _best_rate(run_once, num_simulations * len(boards), repeats=2), "simulations/sec"
+    return bench_run_mcts
+
+def bench_traditional_selectmove(context):
+    from engine import traditional_engine
+
+    class CountingBoard(chess.Board):
+        nodes = 0
+        def push(self, move):
+            CountingBoard.nodes += 1
+            super().push(move)
+
+    boards = context.boards[:3]
+    def run_once():
+        for board in boards:
+            traditional_engine.board = CountingBoard(board.fen())
+            with contextlib.redirect_stdout(io.StringIO()): # selectmove prints when the opening book is missing
+                traditional_engine.selectmove(2)
+    original_board = traditional_engine.board # Module-global, restored for later users in this process
+    try:
+        CountingBoard.nodes = 0
+        run_once() # Warm up and count the nodes, the search is deterministic
+        return _best_rate(run_once, CountingBoard.nodes), "nodes/sec"
+    finally:
+        traditional_engine.board = original_board
+
+def bench_train_step(context):
+    import tensorflow as tf
+    from training.train_network import train_step
+    from engine.utils import board_to_input, NUM_POSSIBLE_MOVES
+    batch_size = 32
+    steps = context.iterations(20)
+    rng = np.random.default_rng(SEED)
+    board_inputs = tf.constant(np.stack([board_to_input(context.boards[i % len(context.boards)]) for i in range(batch_size)]))
+    policy_targets = rng.random((batch_size, NUM_POSSIBLE_MOVES)).astype(np.float32)
+    policy_targets = tf.constant(policy_targets / policy_targets.sum(axis=1, keepdims=True))
+    value_targets = tf.constant(rng.uniform(-1, 1, (batch_size, 1)).astype(np.float32))
+    model = build_benchmark_network(network=context.network)
+    optimizer = tf.keras.optimizers.Adam(learning_rate=0.001)
+    train_step(model, board_inputs, policy_targets, value_targets, optimizer) # Warm up
+    def run_once():
+        for _ in range(steps):
+            train_step(model, board_inputs, policy_targets, value_targets, optimizer)
+    return _best_rate(run_once, steps * batch_size), "samples/sec"
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COLD_START_SCRIPTS = {
+    # Django setup plus the API views, as a worker does before serving (TensorFlow must not be imported here)
+    'import': "import django; django.setup(); import webapp.chessgame.views",
+    # Then load a network and evaluate one position, as the prewarm hook does
+    'first_evaluation': ("import django; django.setup(); import webapp.chessgame.views; import chess; "
+                         "from benchmarks.suite import build_benchmark_network; from engine.mcts import MCTSNode; "
+                         "MCTSNode(chess.Board()).evaluate(build_benchmark_network())"),
+}
+
+def make_cold_start_benchmark(script):
+    def bench_cold_start(context):
+        env = dict(os.environ, STOCKZERO_PREWARM='False')
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'stockzero.settings')
+        def run_once():
+            subprocess.run([sys.executable, "-c", script], cwd=PROJECT_ROOT, env=env, check=True)
+        return _best_rate(run_once, 1), "starts/sec" # Fresh interpreter per run, so nothing is already imported
+    return bench_cold_start
+
+BENCHMARKS = {
+    'board_to_input': bench_board_to_input,
+    'get_legal_moves_mask': bench_legal_moves_mask,
+    'mcts_node_evaluate': bench_mcts_evaluate,
+    'network_batch32': bench_network_batch,
+    **{f'run_mcts_{num_simulations}': make_mcts_benchmark(num_simulations) for num_simulations in MCTS_SIMULATION_COUNTS},
+    'traditional_selectmove_depth2': bench_traditional_selectmove,
+    'train_step': bench_train_step,
+    **{f'cold_start_{name}': make_cold_start_benchmark(script) for name, script in COLD_START_SCRIPTS.items()},
+}
+
+def run_benchmarks(names=None, context=None, log=print):
+    """Runs the selected benchmarks (all by default) and returns a JSON-serialisable report."""
+    context = context or BenchmarkContext()
+    results = {}
+    for name in names or BENCHMARKS:
+        log(f"Running {name}...")
+        (rate, seconds), unit = BENCHMARKS[name](context)
+        results[name] = {'value': rate, 'unit': unit, 'seconds': seconds}
+        log(f"  {name}: {rate:,.1f} {unit}")
+    return {'meta': dict(run_metadata(), network=network_metadata(context)), 'results': results}
+
+def network_metadata(context):
+    """Architecture of the benchmarked network and its cost per position, so results are compared per configuration."""
+    from engine.network_config import network_config, network_cost
+    config = dict(getattr(context._policy_value_net, 'config', None) or context.network or network_config())
+    return dict(config, **network_cost(config))
+
+def run_metadata():
+    meta = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'seed': SEED,
+    }
+    try:
+        import tensorflow as tf
+        meta['tensorflow'] = tf.__version__
+    except ImportError:
+        pass
+    return meta
+
+def compare_to_baseline(report, baseline, tolerance=0.10):
+    """Returns `(name, baseline value, current value, ratio)` for every benchmark slower than the baseline by more than `tolerance`."""
+    regressions = []
+    for name, result in report['results'].items():
+        baseline_result = baseline.get('results', {}).get(name)
+        if baseline_result is None:
+            continue
+        ratio = result['value'] / baseline_result['value']
+        if ratio < 1.0 - tolerance:
+            regressions.append((name, baseline_result['value'], result['value'], ratio))
+    return regressions
+
+def save_report(report, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+
+def load_report(path):
+    with open(path) as report_file:
+        return json.load(report_file)
@@ -0,0 +1,65 @@
+"""Per-worker memory of pre-forked engine workers, to check that shared weights stay shared.
+
+Reads RSS, PSS (each shared page divided by the number of processes mapping it) and shared memory
+from /proc, so it only works on Linux. PSS is the number to compare: RSS counts shared pages in full
+in every worker.
+"""
+import multiprocessing
+import chess
+import numpy as np
+from .suite import BENCHMARK_POSITIONS
+
+def read_memory_kb():
+    """{'rss', 'pss', 'shared'} in kB for the calling process."""
+    memory = {}
+    with open("/proc/self/smaps_rollup") as smaps:
+        for line in smaps:
+            field, _, rest = line.partition(":")
+            if field in ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty'):
+                memory[field] = int(rest.split()[0])
+    return {'rss': memory['Rss'], 'pss': memory['Pss'], 'shared': memory['Shared_Clean'] + memory['Shared_Dirty']}
+
+def _run_evaluations(policy_value_net, evaluations):
+    from engine.utils import board_to_input
+    board_inputs = np.stack([board_to_input(chess.Board(fen)) for fen in BENCHMARK_POSITIONS])
+    for _ in range(evaluations):
+        policy_value_net(board_inputs)
+
+def _worker(load_net, preloaded_net, evaluations, barrier, results):
+    policy_value_net = preloaded_net if preloaded_net is not None else load_net()
+    _run_evaluations(policy_value_net, evaluations)
+    barrier.wait() # All workers alive at once, so PSS splits the shared pages between them
+    results.put(read_memory_kb())
+    barrier.wait() # Keep the pages mapped until every worker has measured
+
+def measure_worker_memory(load_net, num_workers, preload=True, evaluations=20):
+    """Forks `num_workers` workers that each evaluate the benchmark positions and report their memory.
+
+    With `preload` the master calls `load_net()` before forking, like gunicorn's `preload_app`;
+    otherwise each worker loads its own copy. Returns per-worker figures and the host total
+    (sum of PSS over master and workers) in kB.
+    """
+    context = multiprocessing.get_context('fork')
+    preloaded_net = None
+    if preload:
+        preloaded_net = load_net()
+        _run_evaluations(preloaded_net, 1)
+    barrier = context.Barrier(num_workers + 1)
+    results = context.Queue()
+    workers = [context.Process(target=_worker, args=(load_net, preloaded_net, evaluations, barrier, results)) for _ in range(num_workers)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    master_memory = read_memory_kb()
+    per_worker = [results.get() for _ in workers]
+    barrier.wait()
+    for worker in workers:
+        worker.join()
+    return {
+        'workers': num_workers,
+        'preload': preload,
+        'per_worker': per_worker,
+        'mean_worker_rss_kb': sum(memory['rss'] for memory in per_worker) / num_workers,
+        'mean_worker_pss_kb': sum(memory['pss'] for memory in per_worker) / num_workers,
+        'total_pss_kb': master_memory['pss'] + sum(memory['pss'] for memory in per_worker),
+    }
@@ -1,21 +1,122 @@
 import os # Import os module
-from .model import PolicyValueNetwork
+import threading
+import time
+import logging
+import chess
+import numpy as np
 from .rl_agent import RLEngine
-from .utils import NUM_POSSIBLE_MOVES
+from .utils import NUM_POSSIBLE_MOVES, board_to_input, get_game_result_value
+from .backends import load_policy_value_net, BACKEND_KERAS
+from .eval_cache import django_configured
+from .registry import ModelRegistry, ModelWatcher
+from .position_stats import get_position_stats
+
+logger = logging.getLogger('engine') # Get engine logger
 
 trained_engine = None
 MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'models') # models/ dir in project root
 MODEL_WEIGHTS_FILE = os.path.join(MODEL_DIR, "rl_chess_model.weights.h5") # Default model weights file path
 
+_engine_lock = threading.Lock() # Prewarm thread and first requests may race to load the model
+engine_status = {'ready': False, 'error': None, 'load_seconds': None, 'model_version': None}
+model_registry = ModelRegistry(MODEL_DIR, MODEL_WEIGHTS_FILE)
+served_model = None # ModelVersion behind trained_engine
+model_change_callbacks = [] # Called with the new ModelVersion after a swap, e.g. to drop search trees of the old model
+_model_watcher = None
+_model_watcher_pid = None
+
+def __getattr__(name):
+    # PolicyValueNetwork pulls in TensorFlow, so it is only imported when actually asked for
+    if name == 'PolicyValueNetwork':
+        from .model import PolicyValueNetwork
+        return PolicyValueNetwork
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _stockzero_settings(name):
+    if not django_configured(): # Standalone use, e.g. the UCI front end on a machine without the web stack
+        return {}
+    from django.conf import settings
+    return getattr(settings, name, {})
+
+def inference_backend_settings():
+    """`STOCKZERO_INFERENCE_BACKEND` from Django settings, or the Keras defaults outside Django."""
+    return _stockzero_settings('STOCKZERO_INFERENCE_BACKEND')
+
+def model_registry_settings():
+    """`STOCKZERO_MODEL_REGISTRY` from Django settings, or the defaults outside Django."""
+    return _stockzero_settings('STOCKZERO_MODEL_REGISTRY')
+
+def _select_model_version():
+    pinned_version = model_registry_settings().get('VERSION')
+    model_version = model_registry.get(pinned_version) if pinned_version else model_registry.latest()
+    if model_version is None and pinned_version:
+        raise FileNotFoundError(f"Pinned model version '{pinned_version}' not found in {MODEL_DIR}")
+    return model_version
+
+def _build_engine(model_version):
+    weights_file = model_version.weights_file if model_version is not None else MODEL_WEIGHTS_FILE # Raises the usual missing-weights error
+    backend_settings = inference_backend_settings()
+    policy_value_net = load_policy_value_net(weights_file, backend=backend_settings.get('BACKEND', BACKEND_KERAS),
+                                             tflite_model=backend_settings.get('TFLITE_MODEL'),
+                                             num_threads=backend_settings.get('NUM_THREADS'),
+                                             shared_weights=backend_settings.get('SHARED_WEIGHTS_DIR'))
+    policy_value_net.model_version = model_version.key if model_version is not None else None # Namespaces the evaluation cache
+    return RLEngine(policy_value_net, num_simulations_per_move=100, position_stats=get_position_stats(_stockzero_settings('STOCKZERO_POSITION_STATS')))
+
 def load_chess_engine():
-    global trained_engine
-    if trained_engine is None:
-        policy_value_net = PolicyValueNetwork(NUM_POSSIBLE_MOVES)
-        # Check if model weights file exists, if not, you might want to handle this case (e.g., raise exception, log warning)
-        if not os.path.exists(MODEL_WEIGHTS_FILE):
-            raise FileNotFoundError(f"Model weights file not found at: {MODEL_WEIGHTS_FILE}. Please train the model first and ensure the model weights file is placed in the models/ directory.")
-        policy_value_net.load_weights(MODEL_WEIGHTS_FILE) # Load from models/ directory
-        trained_engine = RLEngine(policy_value_net, num_simulations_per_move=100)
+    global trained_engine, served_model
+    with _engine_lock:
+        if trained_engine is None:
+            model_version = _select_model_version()
+            trained_engine = _build_engine(model_version)
+            served_model = model_version
+            engine_status['model_version'] = model_version.to_dict() if model_version is not None else None
+
+def reload_chess_engine(model_version):
+    """Atomically swaps the served engine for one running `model_version`.
+
+    The new model is loaded and warmed up before the swap; searches already running keep their
+    reference to the old engine and finish on it, new requests get the new one.
+    """
+    global trained_engine, served_model
+    start_time = time.perf_counter()
+    new_engine = _build_engine(model_version)
+    new_engine.policy_value_net(np.zeros((1, 8, 8, 12), dtype=np.float32)) # Warm up outside the lock
+    with _engine_lock:
+        trained_engine = new_engine
+        served_model = model_version
+        engine_status['model_version'] = model_version.to_dict()
+    logger.info(f"Now serving model {model_version.key} (loaded in {time.perf_counter() - start_time:.2f} seconds)")
+    for callback in model_change_callbacks:
+        callback(model_version)
+
+def get_model_version():
+    """Cache namespace of the served model (version plus content hash), or None before the first load."""
+    return served_model.key if served_model is not None else None
+
+def start_model_watcher():
+    """Starts polling models/ for new versions in this process (idempotent, restarted after a fork)."""
+    global _model_watcher, _model_watcher_pid
+    registry_settings = model_registry_settings()
+    if not registry_settings.get('WATCH', True) or _model_watcher_pid == os.getpid():
+        return _model_watcher
+    _model_watcher = ModelWatcher(model_registry, reload_chess_engine, get_model_version,
+                                  poll_interval=registry_settings.get('POLL_INTERVAL', 30.0), pinned_version=registry_settings.get('VERSION'))
+    _model_watcher_pid = os.getpid()
+    return _model_watcher.start()
+
+def prewarm_engine():
+    """Loads the model and runs one dummy batch (graph tracing, allocations) so the first request is fast."""
+    start_time = time.perf_counter()
+    try:
+        engine = get_stockzero_engine()
+        engine.policy_value_net(np.zeros((1, 8, 8, 12), dtype=np.float32))
+    except Exception as e:
+        engine_status['error'] = str(e)
+        logger.exception("Engine prewarm failed")
+        raise
+    engine_status.update(ready=True, error=None, load_seconds=time.perf_counter() - start_time)
+    logger.info(f"Engine prewarmed in {engine_status['load_seconds']:.2f} seconds")
 
 def get_ai_move(board_fen):
     global trained_engine
@@ -29,4 +130,4 @@ def get_stockzero_engine(): # Export function to get engine instance
     global trained_engine
     if trained_engine is None:
         load_chess_engine()
-    return trained_engine
\ No newline at end of file
+    return trained_engine
@@ -0,0 +1,174 @@
+import os
+import random
+import threading
+import chess
+import numpy as np
+
+BACKEND_KERAS = 'keras'
+BACKEND_TFLITE = 'tflite'
+BACKEND_NUMPY = 'numpy' # Memory-mapped weights shared across worker processes, see shared_weights.py
+QUANTIZATION_MODES = ('float32', 'float16', 'dynamic', 'int8')
+
+class TFLiteBackend:
+    """Runs a converted (optionally int8-quantized) `PolicyValueNetwork` through the TFLite interpreter.
+
+    Called like the Keras model: `backend(board_inputs)` returns `(policy, value)` numpy arrays.
+    Uses the standalone `tflite_runtime` package when installed, otherwise `tf.lite`.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+        self.model_path = model_path
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self._input_detail = self.interpreter.get_input_details()[0]
+        output_details = self.interpreter.get_output_details()
+        # Outputs are matched by shape: the policy head is the wide one, the value head has a single unit
+        self._policy_detail = max(output_details, key=lambda detail: detail['shape'][-1])
+        self._value_detail = min(output_details, key=lambda detail: detail['shape'][-1])
+        self._batch_size = int(self._input_detail['shape'][0])
+        self._lock = threading.Lock() # An interpreter must not be invoked from two threads at once (e.g. pondering)
+
+    def __call__(self, board_inputs):
+        board_inputs = np.asarray(board_inputs, dtype=np.float32)
+        with self._lock:
+            if board_inputs.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input_detail['index'], board_inputs.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_size = board_inputs.shape[0]
+            self.interpreter.set_tensor(self._input_detail['index'], _quantize(board_inputs, self._input_detail))
+            self.interpreter.invoke()
+            policy = _dequantize(self.interpreter.get_tensor(self._policy_detail['index']), self._policy_detail)
+            value = _dequantize(self.interpreter.get_tensor(self._value_detail['index']), self._value_detail)
+        return policy, value
+
+def _quantize(values, detail):
+    scale, zero_point = detail['quantization']
+    if detail['dtype'] == np.float32 or scale == 0:
+        return values.astype(detail['dtype'])
+    return np.clip(np.round(values / scale + zero_point), np.iinfo(detail['dtype']).min, np.iinfo(detail['dtype']).max).astype(detail['dtype'])
+
+def _dequantize(values, detail):
+    scale, zero_point = detail['quantization']
+    if detail['dtype'] == np.float32 or scale == 0:
+        return values.astype(np.float32)
+    return (values.astype(np.float32) - zero_point) * scale
+
+def tflite_model_path(weights_file, quantization):
+    """Where `convert_model` writes the TFLite model for `weights_file` (next to it in models/)."""
+    return f"{weights_file[:-len('.weights.h5')] if weights_file.endswith('.weights.h5') else weights_file}.{quantization}.tflite"
+
+def weights_network_config(weights_file):
+    """The architecture `weights_file` was trained with, from its sidecar metadata (baseline if none is recorded)."""
+    from .network_config import network_config
+    from .registry import read_model_metadata
+    return read_model_metadata(weights_file).get('network') or network_config()
+
+def load_keras_network(weights_file):
+    from .model import build_policy_value_net
+    from .utils import NUM_POSSIBLE_MOVES
+    if not os.path.exists(weights_file):
+        raise FileNotFoundError(f"Model weights file not found at: {weights_file}. Please train the model first and ensure the model weights file is placed in the models/ directory.")
+    policy_value_net = build_policy_value_net(NUM_POSSIBLE_MOVES, weights_network_config(weights_file)) # Variables are built before loading
+    policy_value_net.load_weights(weights_file) # Load from models/ directory
+    return policy_value_net
+
+def load_policy_value_net(weights_file, backend=BACKEND_KERAS, tflite_model=None, num_threads=None, shared_weights=None):
+    """Returns the network callable used by the engine for the configured backend."""
+    if backend == BACKEND_KERAS:
+        return load_keras_network(weights_file)
+    if backend == BACKEND_TFLITE:
+        tflite_model = tflite_model or tflite_model_path(weights_file, 'int8')
+        if not os.path.exists(tflite_model):
+            raise FileNotFoundError(f"TFLite model not found at: {tflite_model}. Run 'python manage.py convert_model' at deploy time.")
+        return TFLiteBackend(tflite_model, num_threads=num_threads)
+    if backend == BACKEND_NUMPY:
+        from .shared_weights import NumpyPolicyValueNetwork, shared_weights_dir
+        shared_weights = shared_weights or shared_weights_dir(weights_file)
+        if not os.path.isdir(shared_weights):
+            raise FileNotFoundError(f"Shared weights not found at: {shared_weights}. Run 'python manage.py export_shared_weights' at deploy time.")
+        return NumpyPolicyValueNetwork(shared_weights)
+    raise ValueError(f"Unknown inference backend: {backend}")
+
+# --- Deploy-time conversion and accuracy check ---
+def sample_positions(num_positions, seed=1234, max_plies=80, exclude=None):
+    """Reproducible positions from random playouts, used for calibration and the accuracy report.
+
+    Positions whose `position_key` is in `exclude` (e.g. the calibration set) are skipped.
+    """
+    from .utils import position_key
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < num_positions:
+        board = chess.Board()
+        for _ in range(rng.randint(0, max_plies)):
+            legal_moves = list(board.legal_moves)
+            if not legal_moves:
+                break
+            board.push(rng.choice(legal_moves))
+        if not board.is_game_over() and (exclude is None or position_key(board) not in exclude):
+            boards.append(board)
+    return boards
+
+def convert_to_tflite(policy_value_net, output_path, quantization='int8', calibration_boards=None):
+    """Converts a built Keras `PolicyValueNetwork` to a TFLite flatbuffer at `output_path`.
+
+    'dynamic' quantizes weights to int8; 'int8' also quantizes activations using `calibration_boards`
+    as the representative dataset. Input and output stay float32 so the backend is a drop-in replacement.
+    """
+    import tensorflow as tf
+    from .utils import board_to_input
+    if quantization not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {quantization}")
+    serving_fn = tf.function(lambda board_inputs: policy_value_net(board_inputs),
+                             input_signature=[tf.TensorSpec([None, 8, 8, 12], tf.float32)])
+    converter = tf.lite.TFLiteConverter.from_concrete_functions([serving_fn.get_concrete_function()], policy_value_net)
+    if quantization != 'float32':
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'float16':
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == 'int8':
+        calibration_boards = calibration_boards or sample_positions(200)
+        def representative_dataset():
+            for board in calibration_boards:
+                yield [np.expand_dims(board_to_input(board), axis=0)]
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8, tf.lite.OpsSet.TFLITE_BUILTINS]
+    with open(output_path, "wb") as model_file:
+        model_file.write(converter.convert())
+    return output_path
+
+def accuracy_report(reference_net, candidate_net, boards, batch_size=64):
+    """Compares `candidate_net` with the float32 `reference_net` on `boards`.
+
+    Policies are compared after legal-move masking, as the search sees them: total variation
+    distance, KL divergence and top-1 move agreement. Values by absolute error.
+    """
+    from .utils import board_to_input, mask_policy
+    policy_tv, policy_kl, value_errors, top1_agreement = [], [], [], []
+    for start in range(0, len(boards), batch_size):
+        batch_boards = boards[start:start + batch_size]
+        board_inputs = np.stack([board_to_input(board) for board in batch_boards])
+        reference_policy, reference_value = (np.asarray(output) for output in reference_net(board_inputs))
+        candidate_policy, candidate_value = (np.asarray(output) for output in candidate_net(board_inputs))
+        for index, board in enumerate(batch_boards):
+            p = mask_policy(reference_policy[index], board)
+            q = mask_policy(candidate_policy[index], board)
+            policy_tv.append(0.5 * np.abs(p - q).sum())
+            support = p > 0
+            policy_kl.append(float(np.sum(p[support] * np.log(p[support] / np.maximum(q[support], 1e-12)))))
+            top1_agreement.append(np.argmax(p) == np.argmax(q))
+        value_errors.extend(np.abs(reference_value[:, 0] - candidate_value[:, 0]))
+    return {
+        'positions': len(boards),
+        'top1_move_agreement': float(np.mean(top1_agreement)),
+        'policy_total_variation_mean': float(np.mean(policy_tv)),
+        'policy_total_variation_max': float(np.max(policy_tv)),
+        'policy_kl_mean': float(np.mean(policy_kl)),
+        'value_abs_error_mean': float(np.mean(value_errors)),
+        'value_abs_error_max': float(np.max(value_errors)),
+    }
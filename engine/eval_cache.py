@@ -0,0 +1,179 @@
+import os
+import struct
+import threading
+from collections import OrderedDict
+import numpy as np
+from .instrumentation import CACHE_LOOKUPS, CACHE_WRITTEN_BYTES
+from .utils import NUM_POSSIBLE_MOVES, position_key
+
+_EVALUATION_HEADER = struct.Struct("<fH") # value (float32), number of legal moves
+_RELEASE_LOCK_SCRIPT = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+
+def encode_evaluation(policy_probs, value):
+    """Packs a masked policy sparsely: value, legal move indices (uint16) and their probabilities (float16).
+
+    About 130 bytes for a typical middlegame instead of ~19 kB for the pickled float32 policy vector.
+    """
+    move_indices = np.flatnonzero(policy_probs).astype('<u2')
+    return (_EVALUATION_HEADER.pack(float(value), len(move_indices)) + move_indices.tobytes()
+            + policy_probs[move_indices].astype('<f2').tobytes())
+
+def decode_evaluation(data):
+    """Inverse of `encode_evaluation`, returns `(policy_probs, value)` with the policy renormalised."""
+    value, num_moves = _EVALUATION_HEADER.unpack_from(data)
+    offset = _EVALUATION_HEADER.size
+    move_indices = np.frombuffer(data, dtype='<u2', count=num_moves, offset=offset)
+    probabilities = np.frombuffer(data, dtype='<f2', count=num_moves, offset=offset + 2 * num_moves).astype(np.float32)
+    policy_probs = np.zeros(NUM_POSSIBLE_MOVES, dtype=np.float32)
+    policy_probs[move_indices] = probabilities
+    total = probabilities.sum()
+    if total > 0:
+        policy_probs /= total # float16 rounding
+    return policy_probs, np.float32(value)
+
+def search_key(board):
+    """Zobrist key plus the state that can change a search result but not the network's evaluation.
+
+    The network ignores move clocks and history, the search does not: it stops at the 75-move rule and
+    at fivefold repetition. The clock is only part of the key once that rule is within reach, and a
+    position that already occurred is keyed apart from a fresh one.
+    """
+    key = f"{position_key(board):016x}"
+    if board.halfmove_clock >= 100:
+        key += f":h{board.halfmove_clock}"
+    if board.is_repetition(2):
+        key += ":r"
+    return key
+
+def django_configured():
+    """True when Django settings are (or can be) loaded; the engine also runs without Django, e.g. over UCI."""
+    try:
+        from django.conf import settings
+    except ImportError:
+        return False
+    return settings.configured or bool(os.environ.get('DJANGO_SETTINGS_MODULE'))
+
+class LocalCache:
+    """Bounded in-process LRU with the subset of the Django cache API used here (timeouts are ignored).
+
+    Used when Django is not configured, e.g. by the UCI front end or standalone scripts.
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            value = self._entries.get(key, default)
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def add(self, key, value, timeout=None):
+        with self._lock: # Check and insert under one hold, so only one caller can acquire a lock key
+            if key in self._entries:
+                return False
+            self._entries[key] = value
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return True
+
+    def delete_if_equal(self, key, value):
+        """Deletes `key` only while it still holds `value`, atomically."""
+        with self._lock:
+            if key in self._entries and self._entries[key] == value:
+                del self._entries[key]
+                return True
+            return False
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+class EvaluationCache:
+    """Shared cache of network evaluations and searched moves, keyed by model version and canonical position.
+
+    Keys are `eval:<model>:<zobrist>` and `ai_move:<model>:<search key>`, so transpositions reached with
+    different move clocks share an entry and a new model never reads results of the previous one.
+    Lookups are counted in the `stockzero_cache_lookups_total` metric.
+    """
+
+    def __init__(self):
+        self._local_cache = None
+
+    @property
+    def settings(self):
+        if not django_configured():
+            return {}
+        from django.conf import settings
+        return getattr(settings, 'STOCKZERO_EVAL_CACHE', {})
+
+    @property
+    def backend(self):
+        if not django_configured():
+            if self._local_cache is None:
+                self._local_cache = LocalCache(self.settings.get('LOCAL_MAX_ENTRIES', 100000))
+            return self._local_cache
+        from django.core.cache import cache # Resolved per call, so override_settings(CACHES=...) applies
+        return cache
+
+    def get_evaluation(self, board, model_version):
+        data = self.backend.get(f"eval:{model_version}:{position_key(board):016x}")
+        CACHE_LOOKUPS.inc(1, 'eval', 'miss' if data is None else 'hit')
+        return None if data is None else decode_evaluation(data)
+
+    def set_evaluation(self, board, model_version, policy_probs, value):
+        data = encode_evaluation(policy_probs, value)
+        self.backend.set(f"eval:{model_version}:{position_key(board):016x}", data, timeout=self.settings.get('EVALUATION_TIMEOUT', 300))
+        CACHE_WRITTEN_BYTES.inc(len(data), 'eval')
+
+    def get_move(self, board, model_version):
+        move_uci = self.backend.get(f"ai_move:{model_version}:{search_key(board)}")
+        CACHE_LOOKUPS.inc(1, 'ai_move', 'miss' if move_uci is None else 'hit')
+        return move_uci
+
+    def set_move(self, board, model_version, move_uci):
+        self.backend.set(f"ai_move:{model_version}:{search_key(board)}", move_uci, timeout=self.settings.get('MOVE_TIMEOUT', 300))
+        CACHE_WRITTEN_BYTES.inc(len(move_uci), 'ai_move')
+
+    def acquire_search_lock(self, board, model_version, token, timeout):
+        """Claims the search of this position for one worker (atomic `add`, SET NX on Redis); expires after `timeout` seconds."""
+        return self.backend.add(f"search_lock:{model_version}:{search_key(board)}", token, timeout=timeout)
+
+    def search_locked(self, board, model_version):
+        return self.backend.get(f"search_lock:{model_version}:{search_key(board)}") is not None
+
+    def release_search_lock(self, board, model_version, token):
+        """Releases the lock only if this worker still holds it, never one that expired and was taken by another worker."""
+        lock_key = f"search_lock:{model_version}:{search_key(board)}"
+        backend = self.backend
+        if isinstance(backend, LocalCache):
+            backend.delete_if_equal(lock_key, token)
+            return
+        client = getattr(backend, 'client', None)
+        if hasattr(client, 'get_client') and hasattr(client, 'encode'): # django-redis: compare and delete in one server-side step
+            client.get_client(write=True).eval(_RELEASE_LOCK_SCRIPT, 1, backend.make_key(lock_key), client.encode(token))
+            return
+        if backend.get(lock_key) == token: # Other Django caches (local memory in development) have no atomic compare-and-delete
+            backend.delete(lock_key)
+
+    @staticmethod
+    def stats():
+        """Hit rates of this process since start, per cache."""
+        return {name: {'hits': CACHE_LOOKUPS.value(name, 'hit'), 'misses': CACHE_LOOKUPS.value(name, 'miss'),
+                       'written_bytes': CACHE_WRITTEN_BYTES.value(name)} for name in ('eval', 'ai_move')}
+
+evaluation_cache = EvaluationCache()
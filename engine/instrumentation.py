@@ -0,0 +1,246 @@
+import contextlib
+import contextvars
+import cProfile
+import glob
+import json
+import logging
+import os
+import random
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger('engine') # Get engine logger
+
+_current_stats = contextvars.ContextVar('stockzero_search_stats', default=None)
+
+class SearchStats:
+    """Counters and per-phase timings for one request, filled in by the search code while it is active."""
+
+    PHASES = ('tree_traversal', 'board_copy', 'encode', 'nn_inference', 'cache', 'expand_backup')
+
+    def __init__(self):
+        self.simulations = 0
+        self.nn_calls = 0
+        self.nn_batch_sizes = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.nodes_created = 0
+        self.phase_seconds = dict.fromkeys(self.PHASES, 0.0)
+
+    def add_time(self, phase, seconds):
+        self.phase_seconds[phase] += seconds
+
+    def record_nn_call(self, batch_size, seconds):
+        self.nn_calls += 1
+        self.nn_batch_sizes.append(batch_size)
+        self.phase_seconds['nn_inference'] += seconds
+
+    @property
+    def cache_hit_rate(self):
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+def current_stats():
+    """The `SearchStats` of the running request, or None when nothing is being recorded."""
+    return _current_stats.get()
+
+@contextlib.contextmanager
+def record_search():
+    """Collects `SearchStats` for the code run inside the block (same thread/context only)."""
+    stats = SearchStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+# --- Prometheus-style metrics (per process, merged across workers through a shared directory) ---
+def _format_labels(pairs):
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}" if pairs else ""
+
+class Histogram:
+    """Cumulative-bucket histogram rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name, help_text, buckets, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self.label_names = tuple(label_names)
+        self._series = {} # label values -> [per-bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        with self._lock:
+            series = self._series.setdefault(label_values, [0] * len(self.buckets) + [0, 0.0])
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[index] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(label_values), list(series)] for label_values, series in self._series.items()]
+
+    def merge(self, snapshot):
+        """Adds the series of another process's `snapshot()`."""
+        with self._lock:
+            for label_values, series in snapshot:
+                total = self._series.setdefault(tuple(label_values), [0] * len(self.buckets) + [0, 0.0])
+                for index, value in enumerate(series):
+                    total[index] += value
+
+    def empty_copy(self):
+        return Histogram(self.name, self.help_text, self.buckets, self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label_values, series in sorted(self._series.items()):
+                labels = list(zip(self.label_names, label_values))
+                for upper_bound, bucket_count in zip(self.buckets, series):
+                    lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', upper_bound)])} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_format_labels(labels + [('le', '+Inf')])} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(labels)} {series[-2]}")
+                lines.append(f"{self.name}_sum{_format_labels(labels)} {series[-1]}")
+        return "\n".join(lines)
+
+class Counter:
+    """Monotonic counter rendered in the Prometheus text exposition format."""
+
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {} # label values -> count
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, *label_values):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+
+    def snapshot(self):
+        with self._lock:
+            return [[list(label_values), count] for label_values, count in self._values.items()]
+
+    def merge(self, snapshot):
+        """Adds the counts of another process's `snapshot()`."""
+        with self._lock:
+            for label_values, count in snapshot:
+                self._values[tuple(label_values)] = self._values.get(tuple(label_values), 0) + count
+
+    def empty_copy(self):
+        return Counter(self.name, self.help_text, self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for label_values, count in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(list(zip(self.label_names, label_values)))} {count}")
+        return "\n".join(lines)
+
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800, 1600, 3200)
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_SECONDS = Histogram('stockzero_request_seconds', 'Wall time of engine requests.', SECONDS_BUCKETS, ('endpoint',))
+SIMULATIONS = Histogram('stockzero_search_simulations', 'MCTS simulations run per request.', COUNT_BUCKETS, ('endpoint',))
+NN_CALLS = Histogram('stockzero_nn_calls', 'Network calls per request.', COUNT_BUCKETS, ('endpoint',))
+NN_BATCH_SIZE = Histogram('stockzero_nn_batch_size', 'Positions per network call.', (1, 2, 4, 8, 16, 32, 64, 128, 256))
+CACHE_HIT_RATE = Histogram('stockzero_cache_hit_rate', 'Evaluation cache hit rate per request.', (0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0), ('endpoint',))
+TREE_SIZE = Histogram('stockzero_tree_nodes_created', 'Search tree nodes created per request.', (100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000), ('endpoint',))
+PHASE_SECONDS = Histogram('stockzero_phase_seconds', 'Time per search phase per request.', SECONDS_BUCKETS, ('endpoint', 'phase'))
+CACHE_LOOKUPS = Counter('stockzero_cache_lookups_total', 'Shared cache lookups by cache and result.', ('cache', 'result'))
+CACHE_WRITTEN_BYTES = Counter('stockzero_cache_written_bytes_total', 'Bytes of values written to the shared cache.', ('cache',))
+COALESCED_SEARCHES = Counter('stockzero_coalesced_searches_total', 'Move requests answered by a search already in flight, by where it ran.', ('scope',))
+ALL_METRICS = [REQUEST_SECONDS, SIMULATIONS, NN_CALLS, NN_BATCH_SIZE, CACHE_HIT_RATE, TREE_SIZE, PHASE_SECONDS, CACHE_LOOKUPS, CACHE_WRITTEN_BYTES,
+               COALESCED_SEARCHES]
+
+def observe_request(endpoint, stats, seconds):
+    """Folds one request's `SearchStats` into the process-wide histograms."""
+    REQUEST_SECONDS.observe(seconds, endpoint)
+    SIMULATIONS.observe(stats.simulations, endpoint)
+    NN_CALLS.observe(stats.nn_calls, endpoint)
+    for batch_size in stats.nn_batch_sizes:
+        NN_BATCH_SIZE.observe(batch_size)
+    if stats.cache_hit_rate is not None:
+        CACHE_HIT_RATE.observe(stats.cache_hit_rate, endpoint)
+    TREE_SIZE.observe(stats.nodes_created, endpoint)
+    for phase, phase_seconds in stats.phase_seconds.items():
+        PHASE_SECONDS.observe(phase_seconds, endpoint, phase)
+
+def write_metrics_snapshot(directory):
+    """Writes this process's metrics to `directory`/metrics_<pid>.json, replacing its previous snapshot atomically."""
+    os.makedirs(directory, exist_ok=True)
+    snapshot = {metric.name: metric.snapshot() for metric in ALL_METRICS}
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics_', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, os.path.join(directory, f"metrics_{os.getpid()}.json"))
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+def render_metrics(multiprocess_dir=None):
+    """All metrics in the Prometheus text exposition format.
+
+    Without `multiprocess_dir` these are the metrics of this process. With it, the snapshots every worker
+    wrote there are summed, so any worker answering the scrape reports the totals of the whole server.
+    Snapshots of exited workers are kept, so the counters never go backwards when a worker is replaced.
+    """
+    if multiprocess_dir is None:
+        return "\n\n".join(metric.render() for metric in ALL_METRICS) + "\n"
+    write_metrics_snapshot(multiprocess_dir) # Include everything this worker recorded up to now
+    totals = {metric.name: metric.empty_copy() for metric in ALL_METRICS}
+    for path in glob.glob(os.path.join(multiprocess_dir, 'metrics_*.json')):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e: # Removed since the glob, or not a snapshot
+            logger.warning(f"Skipping metrics snapshot {path}: {e}")
+            continue
+        for name, metric_snapshot in snapshot.items():
+            if name in totals:
+                totals[name].merge(metric_snapshot)
+    return "\n\n".join(metric.render() for metric in totals.values()) + "\n"
+
+# --- Sampled profiling ---
+@contextlib.contextmanager
+def maybe_profile(name, sample_rate=0.0, profiler='cprofile', output_dir=None):
+    """Profiles the block for a random `sample_rate` fraction of calls and writes the profile to `output_dir`.
+
+    `profiler` is 'cprofile' (a .prof file for pstats/snakeviz) or 'pyinstrument' (an HTML report,
+    only if pyinstrument is installed).
+    """
+    if sample_rate <= 0 or random.random() >= sample_rate or output_dir is None:
+        yield
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    file_stem = os.path.join(output_dir, f"{name}_{time.strftime('%Y%m%d-%H%M%S')}_{os.getpid()}_{threading.get_ident()}")
+    if profiler == 'pyinstrument':
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            logger.warning("pyinstrument is not installed, falling back to cProfile")
+        else:
+            sampling_profiler = Profiler()
+            sampling_profiler.start()
+            try:
+                yield
+            finally:
+                sampling_profiler.stop()
+                with open(file_stem + ".html", "w") as report_file:
+                    report_file.write(sampling_profiler.output_html())
+            return
+    deterministic_profiler = cProfile.Profile()
+    deterministic_profiler.enable()
+    try:
+        yield
+    finally:
+        deterministic_profiler.disable()
+        deterministic_profiler.dump_stats(file_stem + ".prof")
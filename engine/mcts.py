@@ -1,13 +1,15 @@
+import time
 import numpy as np
 import chess
-from django.core.cache import cache
-from .model import PolicyValueNetwork # Ensure correct relative import
-from .utils import move_to_index, index_to_move, board_to_input, get_legal_moves_mask, NUM_POSSIBLE_MOVES, get_game_result_value # Ensure correct relative import
+from .eval_cache import evaluation_cache
+from .instrumentation import current_stats
+from .utils import move_to_index, index_to_move, board_to_input, get_legal_moves_mask, mask_policy, NUM_POSSIBLE_MOVES, get_game_result_value # Ensure correct relative import
 
 class MCTSNode:
-    def __init__(self, board, parent=None, prior_prob=0):
-        self.board = board.copy()
+    def __init__(self, board, parent=None, prior_prob=0, move=None):
+        self._board = board.copy() if board is not None else None
         self.parent = parent
+        self.move = move # Move that led from parent to this node (None for the root)
         self.children = {}
         self.visits = 0
         self.value_sum = 0
@@ -15,6 +17,18 @@ class MCTSNode:
         self.policy_prob = 0
         self.value = 0
 
+    @property
+    def board(self):
+        """Child boards are built lazily from the parent, keeping the move stack for repetition detection."""
+        if self._board is None:
+            stats = current_stats()
+            start_time = time.perf_counter()
+            self._board = self.parent.board.copy()
+            self._board.push(self.move)
+            if stats is not None:
+                stats.add_time('board_copy', time.perf_counter() - start_time)
+        return self._board
+
     def select_child(self, exploration_constant=1.4):
         best_child = None
         best_ucb = -float('inf')
@@ -30,31 +44,41 @@ class MCTSNode:
         for move in legal_moves:
             move_index = move_to_index(move)
             prior_prob = policy_probs[move_index]
-            self.children[move] = MCTSNode(chess.Board(fen=self.board.fen()), parent=self, prior_prob=prior_prob)
+            self.children[move] = MCTSNode(None, parent=self, prior_prob=prior_prob, move=move)
 
     def evaluate(self, policy_value_net):
-        fen_str = self.board.fen()
-        cached_evaluation = cache.get(fen_str) # Check cache first
-        if cached_evaluation:
+        stats = current_stats()
+        model_version = getattr(policy_value_net, 'model_version', None) # Namespaces the cache, see engine.registry
+        start_time = time.perf_counter()
+        cached_evaluation = evaluation_cache.get_evaluation(self.board, model_version) # Check cache first
+        if stats is not None:
+            stats.add_time('cache', time.perf_counter() - start_time)
+        if cached_evaluation is not None:
+            if stats is not None:
+                stats.cache_hits += 1
             policy_probs, value = cached_evaluation
             return value, policy_probs
 
+        start_time = time.perf_counter()
         input_board = board_to_input(self.board)
+        encoded_time = time.perf_counter()
         policy_output, value_output = policy_value_net(np.expand_dims(input_board, axis=0))
-        policy_probs = policy_output.numpy()[0]
-        value = value_output.numpy()[0][0]
+        policy_probs = np.asarray(policy_output)[0] # Keras returns tensors, the TFLite backend numpy arrays
+        value = np.asarray(value_output)[0][0]
+        inference_time = time.perf_counter()
 
-        legal_moves_mask = get_legal_moves_mask(self.board)
-        masked_policy_probs = policy_probs * legal_moves_mask
-        if np.sum(masked_policy_probs) > 0:
-            masked_policy_probs /= np.sum(masked_policy_probs)
-        else:
-            masked_policy_probs = legal_moves_mask / np.sum(legal_moves_mask)
+        masked_policy_probs = mask_policy(policy_probs, self.board)
 
         self.policy_prob = masked_policy_probs
         self.value = value
 
-        cache.set(fen_str, (masked_policy_probs, value), timeout=300) # Cache for 5 minutes (adjust timeout)
+        masked_time = time.perf_counter()
+        evaluation_cache.set_evaluation(self.board, model_version, masked_policy_probs, value) # Timeout in STOCKZERO_EVAL_CACHE
+        if stats is not None:
+            stats.cache_misses += 1
+            stats.record_nn_call(1, inference_time - encoded_time)
+            stats.add_time('encode', (encoded_time - start_time) + (masked_time - inference_time))
+            stats.add_time('cache', time.perf_counter() - masked_time)
         return value, masked_policy_probs
 
     def backup(self, value):
@@ -65,7 +89,20 @@ class MCTSNode:
             self.parent.backup(-value)
 
 def run_mcts(root_node, policy_value_net, num_simulations):
-    for _ in range(num_simulations):
+    run_simulations(root_node, policy_value_net, num_simulations)
+    return choose_best_move_from_mcts(root_node)
+
+def run_simulations(root_node, policy_value_net, num_simulations, should_stop=None):
+    """Runs up to `num_simulations` MCTS simulations, checking `should_stop()` before each one.
+
+    Returns the number of simulations completed.
+    """
+    stats = current_stats()
+    for simulation in range(num_simulations):
+        if should_stop is not None and should_stop():
+            return simulation
+        start_time = time.perf_counter()
+        board_copy_before = stats.phase_seconds['board_copy'] if stats is not None else 0.0
         node = root_node
         search_path = [node]
 
@@ -75,15 +112,74 @@ def run_mcts(root_node, policy_value_net, num_simulations):
 
         leaf_node = search_path[-1]
 
-        if not leaf_node.board.is_game_over():
+        is_terminal = leaf_node.board.is_game_over()
+        if stats is not None: # Lazy board copies during selection are reported separately
+            stats.add_time('tree_traversal', time.perf_counter() - start_time - (stats.phase_seconds['board_copy'] - board_copy_before))
+
+        if not is_terminal:
             value, policy_probs = leaf_node.evaluate(policy_value_net)
+            start_time = time.perf_counter()
             leaf_node.expand(policy_probs)
         else:
             value = get_game_result_value(leaf_node.board)
+            start_time = time.perf_counter()
 
         leaf_node.backup(value)
+        if stats is not None:
+            stats.simulations += 1
+            stats.nodes_created += len(leaf_node.children) if not is_terminal else 0
+            stats.add_time('expand_backup', time.perf_counter() - start_time)
 
-    return choose_best_move_from_mcts(root_node)
+    return num_simulations
+
+def run_mcts_batch(root_nodes, evaluator, num_simulations):
+    """Searches several independent trees in lockstep, evaluating one leaf per tree per step in a single batch.
+
+    `evaluator` is a `BatchedEvaluator`, whose transposition table is shared by all the trees.
+    The root nodes must be distinct objects.
+    """
+    stats = current_stats()
+    for _ in range(num_simulations):
+        start_time = time.perf_counter()
+        board_copy_before = stats.phase_seconds['board_copy'] if stats is not None else 0.0
+        leaves, to_evaluate = [], []
+        for root_node in root_nodes:
+            node = root_node
+            while node.children and not node.board.is_game_over():
+                node = node.select_child()
+            is_terminal = node.board.is_game_over()
+            leaves.append((node, is_terminal))
+            if not is_terminal:
+                to_evaluate.append(node)
+        if stats is not None:
+            stats.add_time('tree_traversal', time.perf_counter() - start_time - (stats.phase_seconds['board_copy'] - board_copy_before))
+
+        evaluations = iter(evaluator.evaluate([leaf.board for leaf in to_evaluate]))
+        start_time = time.perf_counter()
+        for leaf, is_terminal in leaves:
+            if is_terminal:
+                value = get_game_result_value(leaf.board)
+            else:
+                value, policy_probs = next(evaluations)
+                leaf.expand(policy_probs)
+                if stats is not None:
+                    stats.nodes_created += len(leaf.children)
+            leaf.backup(value)
+        if stats is not None:
+            stats.simulations += len(leaves)
+            stats.add_time('expand_backup', time.perf_counter() - start_time)
+
+def advance_tree(root_node, move):
+    """Returns the subtree reached by `move`, detached from its parent so it can be reused as a new root."""
+    if root_node is None:
+        return None
+    child = root_node.children.get(move)
+    if child is None:
+        return None
+    child.board # Materialise the board before dropping the parent link
+    child.parent = None
+    child.move = None
+    return child
 
 def choose_best_move_from_mcts(root_node, temperature=0.0):
     if temperature == 0:
@@ -1,16 +1,84 @@
 import tensorflow as tf
+from .network_config import ARCHITECTURE_BASELINE, ARCHITECTURE_RESIDUAL, NUM_MOVE_PLANES, NUM_PROMOTION_PLANES, network_config
 
 class PolicyValueNetwork(tf.keras.Model):
     def __init__(self, num_moves):
         super(PolicyValueNetwork, self).__init__()
+        self.config = network_config(ARCHITECTURE_BASELINE)
         self.conv1 = tf.keras.layers.Conv2D(32, 3, activation='relu', padding='same', input_shape=(8, 8, 12))
         self.flatten = tf.keras.layers.Flatten()
         self.dense_policy = tf.keras.layers.Dense(num_moves, activation='softmax', name='policy_head')
         self.dense_value = tf.keras.layers.Dense(1, activation='tanh', name='value_head')
 
-    def call(self, inputs):
+    def call(self, inputs, training=False):
         x = self.conv1(inputs)
         x = self.flatten(x)
         policy = self.dense_policy(x)
         value = self.dense_value(x)
-        return policy, value
\ No newline at end of file
+        return policy, value
+
+def _conv_bn(filters, kernel_size, name):
+    """Convolution without bias followed by batch norm (folded into the convolution for inference)."""
+    return (tf.keras.layers.Conv2D(filters, kernel_size, padding='same', use_bias=False, name=f"{name}_conv"),
+            tf.keras.layers.BatchNormalization(name=f"{name}_bn"))
+
+class ResidualBlock(tf.keras.layers.Layer):
+    def __init__(self, num_filters, **kwargs):
+        super(ResidualBlock, self).__init__(**kwargs)
+        self.conv1, self.bn1 = _conv_bn(num_filters, 3, 'first')
+        self.conv2, self.bn2 = _conv_bn(num_filters, 3, 'second')
+
+    def call(self, inputs, training=False):
+        x = tf.nn.relu(self.bn1(self.conv1(inputs), training=training))
+        x = self.bn2(self.conv2(x), training=training)
+        return tf.nn.relu(x + inputs)
+
+class ResidualPolicyValueNetwork(tf.keras.Model):
+    """Residual tower with a convolutional policy head and a small value MLP.
+
+    The policy head has one 1x1 output plane per target square, read at the source square, so the
+    flattened (8, 8, 64) logits are exactly `move_to_index`'s from * 64 + to layout. Promotions come
+    from 4 more planes read at the target square (4096 + piece * 64 + to); the unused tail of the
+    4672 indices gets probability 0. No dense layer maps the whole board to every move.
+    """
+
+    def __init__(self, num_moves, num_blocks=6, num_filters=64, value_hidden_units=128):
+        super(ResidualPolicyValueNetwork, self).__init__()
+        self.config = network_config('medium', num_blocks=num_blocks, num_filters=num_filters, value_hidden_units=value_hidden_units)
+        self.num_moves = num_moves
+        self.stem_conv, self.stem_bn = _conv_bn(num_filters, 3, 'stem')
+        self.blocks = [ResidualBlock(num_filters, name=f"block_{index}") for index in range(num_blocks)]
+        self.policy_conv, self.policy_bn = _conv_bn(num_filters, 1, 'policy')
+        self.policy_moves = tf.keras.layers.Conv2D(NUM_MOVE_PLANES, 1, name='policy_moves')
+        self.policy_promotions = tf.keras.layers.Conv2D(NUM_PROMOTION_PLANES, 1, name='policy_promotions')
+        self.value_conv, self.value_bn = _conv_bn(1, 1, 'value')
+        self.flatten = tf.keras.layers.Flatten()
+        self.value_hidden = tf.keras.layers.Dense(value_hidden_units, activation='relu', name='value_hidden')
+        self.value_output = tf.keras.layers.Dense(1, activation='tanh', name='value_head')
+
+    def call(self, inputs, training=False):
+        x = tf.nn.relu(self.stem_bn(self.stem_conv(inputs), training=training))
+        for block in self.blocks:
+            x = block(x, training=training)
+
+        policy_features = tf.nn.relu(self.policy_bn(self.policy_conv(x), training=training))
+        move_logits = self.flatten(self.policy_moves(policy_features)) # (N, 64 squares * 64 targets)
+        promotion_logits = self.flatten(tf.transpose(self.policy_promotions(policy_features), [0, 3, 1, 2])) # (N, 4 pieces * 64 targets)
+        policy = tf.nn.softmax(tf.concat([move_logits, promotion_logits], axis=1))
+        policy = tf.pad(policy, [[0, 0], [0, self.num_moves - policy.shape[1]]])
+
+        value_features = self.flatten(tf.nn.relu(self.value_bn(self.value_conv(x), training=training)))
+        value = self.value_output(self.value_hidden(value_features))
+        return policy, value
+
+def build_policy_value_net(num_moves, config=None):
+    """Builds (creates the variables of) the network described by `config`, the baseline by default."""
+    config = config or network_config()
+    if config['architecture'] == ARCHITECTURE_BASELINE:
+        policy_value_net = PolicyValueNetwork(num_moves)
+    elif config['architecture'] == ARCHITECTURE_RESIDUAL:
+        policy_value_net = ResidualPolicyValueNetwork(num_moves, config['num_blocks'], config['num_filters'], config['value_hidden_units'])
+    else:
+        raise ValueError(f"Unknown network architecture: {config['architecture']}")
+    policy_value_net(tf.zeros((1, 8, 8, 12)))
+    return policy_value_net
@@ -0,0 +1,43 @@
+"""Architecture configurations of the policy-value network, without importing TensorFlow.
+
+A configuration is a plain dict saved in the weights' sidecar `.json` under `network`, so serving,
+conversion and export rebuild exactly the architecture that was trained.
+"""
+
+ARCHITECTURE_BASELINE = 'baseline' # The original conv + dense heads PolicyValueNetwork
+ARCHITECTURE_RESIDUAL = 'residual'
+
+NETWORK_PRESETS = { # Strength / latency tiers
+    'baseline': {'architecture': ARCHITECTURE_BASELINE},
+    'small': {'architecture': ARCHITECTURE_RESIDUAL, 'num_blocks': 4, 'num_filters': 32, 'value_hidden_units': 64},
+    'medium': {'architecture': ARCHITECTURE_RESIDUAL, 'num_blocks': 6, 'num_filters': 64, 'value_hidden_units': 128},
+    'large': {'architecture': ARCHITECTURE_RESIDUAL, 'num_blocks': 10, 'num_filters': 128, 'value_hidden_units': 256},
+}
+DEFAULT_PRESET = 'baseline' # Weights without a `network` entry in their sidecar were trained with it
+
+NUM_MOVE_PLANES = 64 # Policy head: one plane per target square, read at the source square (from * 64 + to)
+NUM_PROMOTION_PLANES = 4 # Knight, bishop, rook and queen promotions, read at the target square (4096 + piece * 64 + to)
+
+def network_config(preset=DEFAULT_PRESET, **overrides):
+    """The configuration of `preset`, with any non-None `overrides` (e.g. num_blocks=8) applied."""
+    if preset not in NETWORK_PRESETS:
+        raise ValueError(f"Unknown network preset: {preset} (choose from {', '.join(NETWORK_PRESETS)})")
+    config = dict(NETWORK_PRESETS[preset], **{name: value for name, value in overrides.items() if value is not None})
+    if config['architecture'] == ARCHITECTURE_BASELINE and len(config) > 1:
+        raise ValueError("The baseline architecture has no depth or width settings")
+    return config
+
+def network_cost(config, num_moves=4672):
+    """Weights (biases and batch norm excluded) and multiply-accumulates per position of `config`."""
+    if config['architecture'] == ARCHITECTURE_BASELINE:
+        conv_params = 3 * 3 * 12 * 32
+        layers = [(conv_params, conv_params * 64), (2048 * num_moves, 2048 * num_moves), (2048, 2048)]
+    else:
+        filters, hidden = config['num_filters'], config['value_hidden_units']
+        conv3 = 3 * 3 * filters * filters
+        layers = [(3 * 3 * 12 * filters, 3 * 3 * 12 * filters * 64)] # Stem
+        layers += [(conv3, conv3 * 64)] * (2 * config['num_blocks'])
+        layers += [(filters * filters, filters * filters * 64), # Policy 1x1 conv
+                   (filters * (NUM_MOVE_PLANES + NUM_PROMOTION_PLANES), filters * (NUM_MOVE_PLANES + NUM_PROMOTION_PLANES) * 64),
+                   (filters, filters * 64), (64 * hidden, 64 * hidden), (hidden, hidden)] # Value 1x1 conv and MLP
+    return {'parameters': sum(params for params, _ in layers), 'macs': sum(macs for _, macs in layers)}
@@ -0,0 +1,113 @@
+import json
+import os
+import threading
+import chess
+import numpy as np
+from .utils import position_key
+
+MAX_MOVES = 8 # Moves stored per position, by visit count
+
+ENTRY_DTYPE = np.dtype([
+    ('key', '<u8'), # Zobrist hash, the array is sorted by it
+    ('moves', '<u2', (MAX_MOVES,)), # Packed like utils.pack_moves: from | to << 6 | promotion << 12, 0 = unused slot
+    ('probs', '<f2', (MAX_MOVES,)), # Visit distribution of the stored moves
+    ('value', '<f2'), # Search value, side to move's point of view
+    ('visits', '<u4'), # Root visits of the offline search
+])
+
+def _pack_move(move):
+    return move.from_square | move.to_square << 6 | (move.promotion or 0) << 12
+
+def _unpack_move(code):
+    return chess.Move(code & 0x3F, code >> 6 & 0x3F, promotion=(code >> 12) or None)
+
+def metadata_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+def write_opening_cache(path, entries, metadata=None):
+    """Writes `entries` [(board, [(move, prob)...], value, visits)] as a sorted, memory-mappable .npy file.
+
+    The table and its metadata are each replaced atomically, so processes that have the previous version
+    mapped keep reading it. The table goes first: until the metadata follows, readers see a version that
+    does not match the new table and ignore the book rather than serve it for the wrong model.
+    """
+    table = np.zeros(len(entries), dtype=ENTRY_DTYPE)
+    for row, (board, move_probs, value, visits) in zip(table, entries):
+        move_probs = move_probs[:MAX_MOVES]
+        row['key'] = position_key(board)
+        row['moves'][:len(move_probs)] = [_pack_move(move) for move, _ in move_probs]
+        row['probs'][:len(move_probs)] = [prob for _, prob in move_probs]
+        row['value'] = value
+        row['visits'] = visits
+    table.sort(order='key')
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + ".tmp.npy" # np.save appends .npy to names without it
+    np.save(tmp_path, table)
+    os.replace(tmp_path, path)
+    tmp_metadata_path = metadata_path(path) + ".tmp"
+    with open(tmp_metadata_path, "w") as metadata_file:
+        json.dump(dict(metadata or {}, positions=len(entries)), metadata_file, indent=2, default=str)
+    os.replace(tmp_metadata_path, metadata_path(path))
+
+def _mtimes(path):
+    """Modification times of the table and its metadata (None for a missing metadata file)."""
+    try:
+        metadata_mtime = os.stat(metadata_path(path)).st_mtime_ns
+    except FileNotFoundError:
+        metadata_mtime = None
+    return os.stat(path).st_mtime_ns, metadata_mtime
+
+class OpeningCache:
+    """Read-only lookup of positions searched offline by `build_opening_cache`.
+
+    The table is memory-mapped, so all workers share one copy and only the pages touched are read.
+    `model_version` is the model it was searched with, from the metadata written next to it; None when
+    the metadata is missing or describes a table of another size (caught mid-rebuild).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtimes = _mtimes(path) # Taken before reading, so a rebuild that lands meanwhile triggers another reload
+        self.table = np.load(path, mmap_mode='r')
+        self.keys = self.table['key']
+        try:
+            with open(metadata_path(path)) as metadata_file:
+                metadata = json.load(metadata_file)
+        except (FileNotFoundError, ValueError):
+            metadata = {}
+        self.model_version = metadata.get('model_version') if metadata.get('positions') == len(self.table) else None
+
+    def __len__(self):
+        return len(self.table)
+
+    def lookup(self, board):
+        """Returns `(move_probs [(chess.Move, prob)...], value, visits)` for `board`, or None if it is not in the table."""
+        key = position_key(board)
+        index = int(np.searchsorted(self.keys, key))
+        if index == len(self.keys) or self.keys[index] != key:
+            return None
+        entry = self.table[index]
+        move_probs = [(_unpack_move(int(code)), float(prob)) for code, prob in zip(entry['moves'], entry['probs']) if code]
+        move_probs = [(move, prob) for move, prob in move_probs if board.is_legal(move)] # Guards against hash collisions
+        if not move_probs:
+            return None
+        return move_probs, float(entry['value']), int(entry['visits'])
+
+    def best_move(self, board):
+        found = self.lookup(board)
+        return max(found[0], key=lambda move_prob: move_prob[1])[0] if found else None
+
+_opening_cache = None
+_opening_cache_lock = threading.Lock()
+
+def get_opening_cache(path):
+    """The opening cache at `path`, reopened when the table or its metadata changes; None if there is no file."""
+    global _opening_cache
+    try:
+        mtimes = _mtimes(path)
+    except FileNotFoundError:
+        return None
+    with _opening_cache_lock:
+        if _opening_cache is None or _opening_cache.path != path or _opening_cache.mtimes != mtimes:
+            _opening_cache = OpeningCache(path)
+        return _opening_cache
@@ -0,0 +1,177 @@
+"""Tree-parallel MCTS: several threads search one tree, sharing a batched evaluator.
+
+Each thread selects a leaf under the tree lock and adds a virtual loss along its path, so the other
+threads are steered towards different leaves. The leaves are then evaluated together. Threads hand
+their leaf to `SharedBatchEvaluator`, and whichever thread completes a batch runs one network call
+for all of them, outside the tree lock (TensorFlow, TFLite and NumPy release the GIL there). Finally
+the virtual loss is replaced by the real backup.
+"""
+import threading
+import time
+from .utils import get_game_result_value
+
+class _Request:
+    __slots__ = ('board', 'result', 'taken', 'done')
+
+    def __init__(self, board):
+        self.board = board
+        self.result = None
+        self.taken = False # Claimed by a flushing thread
+        self.done = False
+
+class SharedBatchEvaluator:
+    """Collects single-position requests from several threads into batches for a `BatchedEvaluator`.
+
+    A batch is evaluated as soon as `batch_size` requests are waiting, or after `max_wait` seconds by
+    the thread that has waited longest, so a lone thread never stalls.
+    """
+
+    def __init__(self, evaluator, batch_size, max_wait=0.002):
+        self.evaluator = evaluator
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._pending = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock() # The wrapped evaluator is not thread-safe
+
+    def evaluate(self, board):
+        """Returns `(value, masked_policy_probs)` for `board`, blocking until its batch was evaluated."""
+        request = _Request(board)
+        batch = None
+        with self._condition:
+            self._pending.append(request)
+            deadline = time.monotonic() + self.max_wait
+            while not request.done:
+                if not request.taken and (len(self._pending) >= self.batch_size or time.monotonic() >= deadline):
+                    batch, self._pending = self._pending, []
+                    for pending_request in batch:
+                        pending_request.taken = True
+                    break
+                self._condition.wait(None if request.taken else max(deadline - time.monotonic(), 0.0))
+        if batch is not None:
+            self._flush(batch)
+        if isinstance(request.result, BaseException):
+            raise request.result
+        return request.result
+
+    def _flush(self, batch):
+        try:
+            with self._flush_lock:
+                results = self.evaluator.evaluate([request.board for request in batch])
+        except BaseException as e:
+            results = [e] * len(batch)
+        with self._condition:
+            for request, result in zip(batch, results):
+                request.result, request.done = result, True
+            self._condition.notify_all()
+
+class TreeParallelSearch:
+    """Searches `root_node` with `num_threads` threads until `stop()`, a node limit or a deadline.
+
+    `max_nodes` limits the simulations (playouts) of this search; `nodes` also counts those already in a reused tree.
+    """
+
+    def __init__(self, root_node, evaluator, num_threads=2, virtual_loss=1.0):
+        self.root_node = root_node
+        self.evaluator = SharedBatchEvaluator(evaluator, batch_size=num_threads)
+        self.num_threads = num_threads
+        self.virtual_loss = virtual_loss
+        self.simulations = 0 # Completed by this search
+        self.depth_sum = 0
+        self.max_depth = 0
+        self.start_time = None
+        self._tree_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._error = None
+
+    @property
+    def nodes(self):
+        return self.root_node.visits
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start_time if self.start_time is not None else 0.0
+
+    @property
+    def average_depth(self):
+        return self.depth_sum / self.simulations if self.simulations else 0
+
+    def run(self, max_nodes=None, deadline=None, on_progress=None, progress_interval=1.0):
+        """Blocks until the search stops; `deadline` is a `time.monotonic()` value.
+
+        At least one simulation is completed, so even an immediate `stop()` leaves an expanded root.
+        `on_progress(search)` is called from this thread every `progress_interval` seconds meanwhile.
+        """
+        self.start_time = time.monotonic()
+        should_stop = lambda: self.simulations > 0 and (self._stop_event.is_set() or (max_nodes is not None and self.simulations >= max_nodes)
+                                                          or (deadline is not None and time.monotonic() >= deadline))
+        threads = [threading.Thread(target=self._worker, args=(should_stop,), name=f"stockzero-search-{index}", daemon=True)
+                   for index in range(self.num_threads)]
+        for thread in threads:
+            thread.start()
+        next_progress = self.start_time + progress_interval
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=max(next_progress - time.monotonic(), 0.0) if on_progress is not None else None)
+                if on_progress is not None and time.monotonic() >= next_progress:
+                    on_progress(self)
+                    next_progress += progress_interval
+        if self._error is not None:
+            raise self._error
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _worker(self, should_stop):
+        try:
+            while not should_stop():
+                self._simulate()
+        except Exception as e:
+            self._error = e
+            self._stop_event.set()
+
+    def _simulate(self):
+        with self._tree_lock:
+            node, path = self.root_node, [self.root_node]
+            while node.children and not node.board.is_game_over():
+                node = node.select_child()
+                path.append(node)
+            for path_node in path[1:]: # Virtual loss: count the visit now and make the path look losing meanwhile
+                path_node.visits += 1
+                path_node.value_sum -= self.virtual_loss
+                path_node.value = path_node.value_sum / path_node.visits
+            is_terminal = node.board.is_game_over()
+            board = node.board
+
+        if is_terminal:
+            value, policy_probs = get_game_result_value(board), None
+        else:
+            value, policy_probs = self.evaluator.evaluate(board)
+
+        with self._tree_lock:
+            for path_node in path[1:]:
+                path_node.visits -= 1
+                path_node.value_sum += self.virtual_loss
+                path_node.value = path_node.value_sum / path_node.visits if path_node.visits else 0
+            if policy_probs is not None and not node.children: # Another thread may have expanded it meanwhile
+                node.expand(policy_probs)
+            node.backup(value)
+            self.simulations += 1
+            self.depth_sum += len(path) - 1
+            self.max_depth = max(self.max_depth, len(path) - 1)
+
+    def principal_variation(self, max_length=20):
+        with self._tree_lock:
+            moves, node = [], self.root_node
+            while node.children and len(moves) < max_length:
+                move, node = max(node.children.items(), key=lambda item: (item[1].visits, item[1].prior_prob))
+                if not node.visits and moves: # The first move is reported even when unvisited, as best_move() picks it
+                    break
+                moves.append(move)
+            return moves
+
+    def best_move(self):
+        """Most visited root move, with its value for the side to move (child stats are from the opponent's side, as in `RLEngine.analyse`)."""
+        with self._tree_lock:
+            move, child = max(self.root_node.children.items(), key=lambda item: (item[1].visits, item[1].prior_prob)) # Prior breaks ties after a very short search
+            return move, (-child.value_sum / child.visits if child.visits else 0.0)
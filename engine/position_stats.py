@@ -0,0 +1,143 @@
+import atexit
+import logging
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from .utils import position_key
+
+logger = logging.getLogger('engine') # Get engine logger
+
+class PositionStatsStore:
+    """Bounded LRU of aggregated root statistics (visits and value sums per move) from earlier searches.
+
+    Keyed by model version and Zobrist hash. `RLEngine.search` seeds the children of a new root with
+    the stored statistics (scaled down to `seed_visits`) and records what each search added. Per-position
+    totals decay once they exceed `max_visits`, so the statistics follow the current model and keep
+    adapting, and at most `max_moves` moves are kept per position.
+    """
+
+    def __init__(self, max_entries=50000, seed_visits=50, min_visits=20, max_visits=5000, max_moves=16, path=None):
+        self.max_entries = max_entries
+        self.seed_visits = seed_visits # Largest number of virtual visits a search is seeded with
+        self.min_visits = min_visits # Searches adding fewer root visits are not recorded
+        self.max_visits = max_visits
+        self.max_moves = max_moves
+        self.path = path
+        self._entries = OrderedDict() # (model version, zobrist) -> {move: [visits, value_sum]}
+        self._lock = threading.Lock()
+        if path:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, board, model_version):
+        key = (model_version, position_key(board))
+        with self._lock:
+            move_stats = self._entries.get(key)
+            if move_stats is None:
+                return None
+            self._entries.move_to_end(key)
+            return {move: tuple(stats) for move, stats in move_stats.items()}
+
+    def seed(self, root_node, model_version):
+        """Gives the children of an expanded `root_node` virtual visits from earlier searches of its position.
+
+        Returns the number of visits added to the root.
+        """
+        move_stats = self.lookup(root_node.board, model_version)
+        if not move_stats or not root_node.children:
+            return 0
+        total_visits = sum(visits for visits, _ in move_stats.values())
+        scale = min(1.0, self.seed_visits / total_visits)
+        seeded_visits = 0
+        for move, (visits, value_sum) in move_stats.items():
+            child = root_node.children.get(move)
+            seeded = int(visits * scale)
+            if child is None or seeded == 0:
+                continue
+            child.visits += seeded
+            child.value_sum += value_sum * seeded / visits
+            child.value = child.value_sum / child.visits
+            seeded_visits += seeded
+        root_node.visits += seeded_visits
+        return seeded_visits
+
+    def record(self, board, model_version, child_deltas):
+        """Adds the visits and value sums a search added to each root move, `{move: (visits, value_sum)}`."""
+        if sum(visits for visits, _ in child_deltas.values()) < self.min_visits:
+            return
+        key = (model_version, position_key(board))
+        with self._lock:
+            move_stats = self._entries.pop(key, {})
+            for move, (visits, value_sum) in child_deltas.items():
+                if visits > 0:
+                    stats = move_stats.setdefault(move, [0, 0.0])
+                    stats[0] += visits
+                    stats[1] += value_sum
+            total_visits = sum(stats[0] for stats in move_stats.values())
+            if total_visits > self.max_visits: # Exponential forgetting keeps totals bounded
+                decay = self.max_visits / total_visits
+                for stats in move_stats.values():
+                    stats[0] *= decay
+                    stats[1] *= decay
+            if len(move_stats) > self.max_moves:
+                move_stats = dict(sorted(move_stats.items(), key=lambda item: item[1][0], reverse=True)[:self.max_moves])
+            self._entries[key] = move_stats
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def save(self):
+        """Writes the store to `path` (atomically), so statistics survive restarts.
+
+        Every worker saves at exit; each writes its own temp file, so the last one to finish replaces the file whole.
+        """
+        with self._lock:
+            entries = list(self._entries.items())
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.path)), prefix=os.path.basename(self.path) + ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as stats_file:
+                pickle.dump(entries, stats_file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def load(self):
+        try:
+            with open(self.path, "rb") as stats_file:
+                entries = pickle.load(stats_file)
+        except FileNotFoundError:
+            return
+        except Exception:
+            logger.exception(f"Could not read position statistics from {self.path}, starting empty")
+            return
+        with self._lock:
+            self._entries = OrderedDict(entries[-self.max_entries:])
+
+_position_stats = None
+_position_stats_lock = threading.Lock()
+
+def get_position_stats(stats_settings):
+    """The process-wide store configured by `STOCKZERO_POSITION_STATS`, or None when disabled."""
+    global _position_stats
+    if not stats_settings.get('ENABLED', False):
+        return None
+    with _position_stats_lock:
+        if _position_stats is None:
+            _position_stats = PositionStatsStore(
+                max_entries=stats_settings.get('MAX_ENTRIES', 50000), seed_visits=stats_settings.get('SEED_VISITS', 50),
+                min_visits=stats_settings.get('MIN_VISITS', 20), max_visits=stats_settings.get('MAX_VISITS', 5000),
+                max_moves=stats_settings.get('MAX_MOVES', 16), path=stats_settings.get('PATH'))
+            if _position_stats.path:
+                atexit.register(_position_stats.save)
+        return _position_stats
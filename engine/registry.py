@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger('engine') # Get engine logger
+
+VERSIONED_WEIGHTS_PATTERN = re.compile(r"^stockzero_model_v(?P<version>.+)\.weights\.h5$") # Written by training
+DEFAULT_VERSION = "default" # The unversioned models/rl_chess_model.weights.h5
+SETTLE_SECONDS = 5.0 # A weights file modified more recently than this may still be being written
+
+class ModelVersion:
+    """One weights file in the models directory, with the metadata of its sidecar `.json` (if any)."""
+
+    def __init__(self, version, weights_file, metadata=None, digest=None):
+        self.version = version
+        self.weights_file = weights_file
+        self.metadata = metadata or {}
+        self.digest = digest # Content hash, tells apart retrains that reuse the same date version
+
+    @property
+    def key(self):
+        """Identifier used to namespace caches, identical in every worker serving the same file."""
+        return f"{self.version}.{self.digest[:12]}" if self.digest else self.version
+
+    def to_dict(self):
+        return {'version': self.version, 'key': self.key, 'weights_file': os.path.basename(self.weights_file), 'metadata': self.metadata}
+
+def metadata_file(weights_file):
+    return f"{weights_file[:-len('.weights.h5')] if weights_file.endswith('.weights.h5') else weights_file}.json"
+
+def write_model_metadata(weights_file, **metadata):
+    """Writes the sidecar metadata for a freshly saved weights file (training settings, dataset size...)."""
+    tmp_path = metadata_file(weights_file) + ".tmp"
+    with open(tmp_path, "w") as sidecar:
+        json.dump(metadata, sidecar, indent=2, default=str)
+    os.replace(tmp_path, metadata_file(weights_file))
+
+def read_model_metadata(weights_file):
+    """The sidecar metadata of `weights_file`, {} if it has none."""
+    try:
+        with open(metadata_file(weights_file)) as sidecar:
+            return json.load(sidecar)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as weights:
+        for block in iter(lambda: weights.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ModelRegistry:
+    """Tracks the versioned weights files in the models directory.
+
+    Versions come from training's `stockzero_model_v<version>.weights.h5` file names and sort as
+    strings (the dates training writes sort chronologically); the unversioned default file is only
+    used when no versioned file exists. A file is only picked up once it has not been modified for
+    `settle_seconds`, so a file still being written is never loaded. The check only looks at the file,
+    so every caller (watcher, first request, arena) gets the same answer from a single scan.
+    """
+
+    def __init__(self, model_dir, default_weights_file, settle_seconds=SETTLE_SECONDS):
+        self.model_dir = model_dir
+        self.default_weights_file = default_weights_file
+        self.settle_seconds = settle_seconds
+        self._digests = {} # path -> (mtime, size, digest)
+        self._lock = threading.Lock()
+
+    def scan(self):
+        """Returns {version: ModelVersion} for every complete weights file in the models directory."""
+        try:
+            file_names = os.listdir(self.model_dir)
+        except FileNotFoundError:
+            file_names = []
+        candidates = {}
+        for file_name in file_names:
+            match = VERSIONED_WEIGHTS_PATTERN.match(file_name)
+            if match:
+                candidates[match.group('version')] = os.path.join(self.model_dir, file_name)
+        if not candidates and os.path.exists(self.default_weights_file):
+            candidates[DEFAULT_VERSION] = self.default_weights_file
+
+        versions = {}
+        with self._lock:
+            for version, path in candidates.items():
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                if time.time() - stat.st_mtime < self.settle_seconds:
+                    continue # Possibly still being written, picked up by a later scan
+                signature = (stat.st_mtime, stat.st_size)
+                versions[version] = ModelVersion(version, path, read_model_metadata(path), self._digest(path, signature))
+        return versions
+
+    def latest(self):
+        """The newest complete version, or None if the models directory has no weights."""
+        versions = self.scan()
+        return versions[max(versions)] if versions else None
+
+    def get(self, version):
+        return self.scan().get(version)
+
+    def _digest(self, path, signature):
+        cached = self._digests.get(path)
+        if cached is None or cached[:2] != signature:
+            cached = (*signature, _file_digest(path))
+            self._digests[path] = cached
+        return cached[2]
+
+class ModelWatcher:
+    """Polls the registry in a daemon thread and calls `on_change(model_version)` when the served version should change.
+
+    `current_key()` returns the key of the served model, or None while no model is loaded (nothing to swap then).
+    """
+
+    def __init__(self, registry, on_change, current_key, poll_interval=30.0, pinned_version=None):
+        self.registry = registry
+        self.on_change = on_change
+        self.current_key = current_key
+        self.poll_interval = poll_interval
+        self.pinned_version = pinned_version
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stockzero-model-watcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join()
+
+    def check(self):
+        model_version = self.registry.get(self.pinned_version) if self.pinned_version else self.registry.latest()
+        current_key = self.current_key()
+        if model_version is not None and current_key is not None and model_version.key != current_key:
+            logger.info(f"Model version change detected: {current_key} -> {model_version.key}")
+            self.on_change(model_version)
+
+    def _run(self):
+        while not self._stop_event.wait(self.poll_interval):
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Model reload failed, keeping the current model") # Retried on the next poll
@@ -1,11 +1,115 @@
-from .mcts import run_mcts, MCTSNode # Ensure correct relative import
+import logging
+import threading
+import time
+from .mcts import run_mcts, run_mcts_batch, run_simulations, MCTSNode # Ensure correct relative import
+from .evaluator import BatchedEvaluator
+
+logger = logging.getLogger('engine') # Get engine logger
 
 class RLEngine:
-    def __init__(self, policy_value_net, num_simulations_per_move=100):
+    def __init__(self, policy_value_net, num_simulations_per_move=100, position_stats=None):
         self.policy_value_net = policy_value_net
         self.num_simulations_per_move = num_simulations_per_move
+        self.position_stats = position_stats # Optional PositionStatsStore seeding searches from earlier games
 
     def choose_move(self, board):
-        root_node = MCTSNode(board)
-        best_move = run_mcts(root_node, self.policy_value_net, self.num_simulations_per_move)
-        return best_move
\ No newline at end of file
+        best_move, _ = self.search(board)
+        return best_move
+
+    def search(self, board, root_node=None, num_simulations=None):
+        """Runs MCTS from `board`, reusing `root_node` when it is a tree already rooted at this position.
+
+        Visits already in a reused tree (from earlier searches or pondering) count towards the
+        simulation budget, so only the difference is searched now.
+        Returns the best move and the searched root so callers can keep the tree between moves.
+        """
+        if root_node is None or root_node.board.fen() != board.fen():
+            root_node = MCTSNode(board)
+        if num_simulations is None:
+            num_simulations = self.num_simulations_per_move
+        remaining_simulations = max(num_simulations - root_node.visits, 0 if root_node.children else 1)
+        if self.position_stats is None:
+            return run_mcts(root_node, self.policy_value_net, remaining_simulations), root_node
+
+        model_version = getattr(self.policy_value_net, 'model_version', None)
+        if not root_node.children and not board.is_game_over():
+            run_simulations(root_node, self.policy_value_net, 1) # Expands the root, so seeded statistics have children to land on
+            remaining_simulations -= 1
+            self.position_stats.seed(root_node, model_version) # Virtual visits on top of the budget, not instead of it
+        before = {move: (child.visits, child.value_sum) for move, child in root_node.children.items()}
+        best_move = run_mcts(root_node, self.policy_value_net, remaining_simulations)
+        self.position_stats.record(board, model_version, {
+            move: (child.visits - before.get(move, (0, 0))[0], child.value_sum - before.get(move, (0, 0))[1])
+            for move, child in root_node.children.items()
+        })
+        return best_move, root_node
+
+    def analyse(self, boards, num_simulations=None, top_k=3, evaluator=None):
+        """Multi-PV analysis of several positions with one shared batched evaluator and transposition table.
+
+        Returns one dict per board with the value-head evaluation of the position and its `top_k` moves
+        by visit count. Values and Q-values are from the point of view of the side to move.
+        """
+        if num_simulations is None:
+            num_simulations = self.num_simulations_per_move
+        if evaluator is None:
+            evaluator = BatchedEvaluator(self.policy_value_net)
+        root_nodes = [MCTSNode(board) for board in boards]
+        searchable_roots = [root_node for root_node in root_nodes if not root_node.board.is_game_over()]
+        root_values = evaluator.evaluate([root_node.board for root_node in searchable_roots])
+        run_mcts_batch(searchable_roots, evaluator, num_simulations)
+
+        root_values = dict(zip(map(id, searchable_roots), (value for value, _ in root_values)))
+        analyses = []
+        for root_node in root_nodes:
+            children = sorted(root_node.children.items(), key=lambda item: item[1].visits, reverse=True)[:top_k]
+            analyses.append({
+                'fen': root_node.board.fen(),
+                'value': root_values.get(id(root_node)), # None for finished games
+                'moves': [{
+                    'move': move.uci(),
+                    'visits': child.visits,
+                    'q': -child.value_sum / child.visits if child.visits else None, # Child stats are from the opponent's side
+                    'prior': float(child.prior_prob),
+                } for move, child in children],
+            })
+        return analyses
+
+    def start_ponder(self, root_node, max_simulations, max_seconds, on_finish=None):
+        """Keeps searching `root_node` (opponent to move) in a background thread until stopped or out of quota."""
+        ponder_search = PonderSearch(self, root_node, max_simulations, max_seconds, on_finish=on_finish)
+        ponder_search.start()
+        return ponder_search
+
+class PonderSearch:
+    """Background search on the opponent's time. Call `stop()` before touching the tree again."""
+
+    def __init__(self, engine, root_node, max_simulations, max_seconds, on_finish=None):
+        self.engine = engine
+        self.root_node = root_node
+        self.max_simulations = max_simulations
+        self.max_seconds = max_seconds
+        self.on_finish = on_finish # Called from the ponder thread when it exits, e.g. to release a quota slot
+        self.simulations = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stockzero-ponder", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        deadline = time.monotonic() + self.max_seconds
+        should_stop = lambda: self._stop_event.is_set() or time.monotonic() >= deadline
+        try:
+            self.simulations = run_simulations(self.root_node, self.engine.policy_value_net, self.max_simulations, should_stop=should_stop)
+        except Exception:
+            logger.exception("Ponder search failed") # The tree stays usable, the next request just searches more
+        finally:
+            if self.on_finish is not None:
+                self.on_finish(self)
+
+    def stop(self):
+        """Cancels the search, waits for the in-flight simulation and returns the pondered tree."""
+        self._stop_event.set()
+        self._thread.join()
+        return self.root_node
@@ -0,0 +1,116 @@
+import json
+import os
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from .network_config import ARCHITECTURE_BASELINE, network_config
+from .utils import NUM_POSSIBLE_MOVES
+
+MANIFEST_FILE = "manifest.json"
+LAYERS = ('conv1', 'dense_policy', 'dense_value') # PolicyValueNetwork layers, each with a kernel and a bias
+
+def shared_weights_dir(weights_file):
+    """Where `export_shared_weights` writes the .npy files for `weights_file` (next to it in models/)."""
+    return f"{weights_file[:-len('.weights.h5')] if weights_file.endswith('.weights.h5') else weights_file}.shared"
+
+def _fold_batch_norm(conv, batch_norm):
+    """Kernel and bias of a bias-free convolution followed by inference-mode batch norm, as one convolution."""
+    kernel = conv.get_weights()[0]
+    gamma, beta, moving_mean, moving_variance = batch_norm.get_weights()
+    scale = gamma / np.sqrt(moving_variance + batch_norm.epsilon)
+    return kernel * scale, beta - moving_mean * scale
+
+def inference_layers(policy_value_net):
+    """{layer name: (kernel, bias)} of a built network, with batch norm folded into the convolutions."""
+    if policy_value_net.config['architecture'] == ARCHITECTURE_BASELINE:
+        return {layer_name: tuple(getattr(policy_value_net, layer_name).get_weights()) for layer_name in LAYERS}
+    layers = {'stem': _fold_batch_norm(policy_value_net.stem_conv, policy_value_net.stem_bn)}
+    for index, block in enumerate(policy_value_net.blocks):
+        layers[f'block_{index}.first'] = _fold_batch_norm(block.conv1, block.bn1)
+        layers[f'block_{index}.second'] = _fold_batch_norm(block.conv2, block.bn2)
+    layers['policy'] = _fold_batch_norm(policy_value_net.policy_conv, policy_value_net.policy_bn)
+    layers['value'] = _fold_batch_norm(policy_value_net.value_conv, policy_value_net.value_bn)
+    for layer_name in ('policy_moves', 'policy_promotions', 'value_hidden', 'value_output'):
+        layers[layer_name] = tuple(getattr(policy_value_net, layer_name).get_weights())
+    return layers
+
+def export_weights(policy_value_net, output_dir):
+    """Writes every layer's kernel and bias of a built policy-value network as a .npy file plus a manifest."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {'network': dict(policy_value_net.config), 'layers': {}}
+    for layer_name, (kernel, bias) in inference_layers(policy_value_net).items():
+        for name, array in (('kernel', kernel), ('bias', bias)):
+            file_name = f"{layer_name}.{name}.npy"
+            np.save(os.path.join(output_dir, file_name), np.ascontiguousarray(array, dtype=np.float32))
+            manifest['layers'].setdefault(layer_name, {})[name] = {'file': file_name, 'shape': list(array.shape)}
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    return output_dir
+
+def _conv2d(x, kernel, bias):
+    """'same' convolution of (N, 8, 8, C) inputs with a (kh, kw, C, filters) kernel."""
+    kernel_size = kernel.shape[0]
+    if kernel_size == 1:
+        return x @ kernel.reshape(kernel.shape[2:]) + bias
+    pad = kernel_size // 2
+    padded = np.pad(x, ((0, 0), (pad, pad), (pad, pad), (0, 0)))
+    # (N, 8, 8, C, kh, kw) -> (N, 8, 8, kh, kw, C), matching the kernel's (kh, kw, C, filters) layout
+    patches = sliding_window_view(padded, (kernel_size, kernel_size), axis=(1, 2)).transpose(0, 1, 2, 4, 5, 3)
+    batch_size, rows, cols = patches.shape[:3]
+    x = patches.reshape(batch_size * rows * cols, -1) @ kernel.reshape(-1, kernel.shape[-1])
+    return (x + bias).reshape(batch_size, rows, cols, -1)
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    probs = np.exp(logits)
+    return probs / probs.sum(axis=1, keepdims=True)
+
+class NumpyPolicyValueNetwork:
+    """NumPy forward pass of the policy-value network over read-only memory-mapped weights.
+
+    The weights are mapped with `np.load(mmap_mode='r')`, so they live in the page cache: every process
+    that maps the same files (e.g. gunicorn workers forked after `preload_app`) shares one physical copy,
+    and no TensorFlow runtime is needed. Called like the Keras model, returns `(policy, value)` arrays.
+    """
+
+    def __init__(self, weights_dir):
+        with open(os.path.join(weights_dir, MANIFEST_FILE)) as manifest_file:
+            manifest = json.load(manifest_file)
+        self.weights_dir = weights_dir
+        self.config = manifest.get('network') or network_config() # Exports without a config are baseline networks
+        self.weights = {
+            (layer_name, name): np.load(os.path.join(weights_dir, entry['file']), mmap_mode='r')
+            for layer_name, layer in manifest['layers'].items() for name, entry in layer.items()
+        }
+
+    def _layer(self, layer_name, x):
+        return _conv2d(x, self.weights[(layer_name, 'kernel')], self.weights[(layer_name, 'bias')])
+
+    def __call__(self, board_inputs):
+        board_inputs = np.asarray(board_inputs, dtype=np.float32)
+        if self.config['architecture'] == ARCHITECTURE_BASELINE:
+            return self._baseline(board_inputs)
+        return self._residual(board_inputs)
+
+    def _baseline(self, board_inputs):
+        x = np.maximum(self._layer('conv1', board_inputs), 0.0).reshape(len(board_inputs), -1) # ReLU, then Flatten (row-major like Keras)
+        policy = _softmax(x @ self.weights[('dense_policy', 'kernel')] + self.weights[('dense_policy', 'bias')])
+        value = np.tanh(x @ self.weights[('dense_value', 'kernel')] + self.weights[('dense_value', 'bias')])
+        return policy, value
+
+    def _residual(self, board_inputs):
+        batch_size = len(board_inputs)
+        x = np.maximum(self._layer('stem', board_inputs), 0.0)
+        for index in range(self.config['num_blocks']):
+            residual = np.maximum(self._layer(f'block_{index}.first', x), 0.0)
+            x = np.maximum(self._layer(f'block_{index}.second', residual) + x, 0.0)
+
+        policy_features = np.maximum(self._layer('policy', x), 0.0)
+        move_logits = self._layer('policy_moves', policy_features).reshape(batch_size, -1) # from * 64 + to
+        promotion_logits = self._layer('policy_promotions', policy_features).transpose(0, 3, 1, 2).reshape(batch_size, -1) # piece * 64 + to
+        policy = np.zeros((batch_size, NUM_POSSIBLE_MOVES), dtype=np.float32)
+        policy[:, :move_logits.shape[1] + promotion_logits.shape[1]] = _softmax(np.concatenate([move_logits, promotion_logits], axis=1))
+
+        value_features = np.maximum(self._layer('value', x), 0.0).reshape(batch_size, -1)
+        hidden = np.maximum(value_features @ self.weights[('value_hidden', 'kernel')] + self.weights[('value_hidden', 'bias')], 0.0)
+        value = np.tanh(hidden @ self.weights[('value_output', 'kernel')] + self.weights[('value_output', 'bias')])
+        return policy, value
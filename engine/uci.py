@@ -0,0 +1,227 @@
+"""UCI front end for the RL engine, without Django: `python -m engine.uci`.
+
+Speaks the Universal Chess Interface on stdin/stdout, so StockZero runs under GUIs and tournament
+tools (cutechess-cli, Arena, fastchess). `go` searches with `TreeParallelSearch` in a background
+thread, so `stop` is read and honoured while it runs; the tree is kept between moves of a game.
+"""
+import math
+import os
+import sys
+import threading
+import time
+import chess
+from .mcts import MCTSNode, advance_tree
+from .evaluator import BatchedEvaluator
+from .parallel_search import TreeParallelSearch
+from .rl_agent import RLEngine
+from .backends import BACKEND_KERAS, BACKEND_NUMPY, BACKEND_TFLITE, load_policy_value_net
+
+ENGINE_NAME = "StockZero"
+ENGINE_AUTHOR = "Nirajan Dhakal"
+DEFAULT_MOVES_TO_GO = 30 # Assumed moves left in the game when the GUI does not say
+MAX_TABLE_SIZE = 100000 # Evaluations kept in the transposition table before it starts over (about 0.5 KB each, 50 MB)
+
+def q_to_centipawns(q):
+    """Maps a value in [-1, 1] to centipawns for `info score cp` (the curve Leela Chess Zero reports with)."""
+    q = max(min(q, 0.999), -0.999)
+    return int(round(290.680623072 * math.tan(1.548090806 * q)))
+
+class UCIEngine:
+    """UCI protocol state: options, the current position and its search tree, and the running search."""
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self._output_lock = threading.Lock() # Info lines come from the search thread
+        self.options = {
+            'Threads': min(4, os.cpu_count() or 1),
+            'Weights': '', # Weights file, empty = newest registry version in models/
+            'Backend': None, # None = STOCKZERO_INFERENCE_BACKEND, Keras outside Django
+            'MoveOverhead': 50, # Milliseconds kept back per move for GUI and transmission lag
+        }
+        self.engine = None
+        self.evaluator = None
+        self.board = chess.Board()
+        self.root_node = None
+        self._search = None
+        self._search_thread = None
+
+    def send(self, line):
+        with self._output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def run(self, input_stream=sys.stdin):
+        for line in input_stream:
+            try:
+                if not self.handle(line.strip()):
+                    break
+            except ValueError as e: # Malformed command (illegal move, bad FEN or number): report it, keep the previous state
+                self.send(f"info string Invalid command '{line.strip()}': {e}")
+        self.stop_search()
+
+    def handle(self, line):
+        """Handles one command line; returns False on `quit`."""
+        command, _, arguments = line.partition(" ")
+        arguments = arguments.split()
+        if command == 'uci':
+            self.send(f"id name {ENGINE_NAME}")
+            self.send(f"id author {ENGINE_AUTHOR}")
+            self.send(f"option name Threads type spin default {self.options['Threads']} min 1 max 256")
+            self.send("option name Weights type string default <empty>")
+            self.send(f"option name Backend type combo default {BACKEND_KERAS} var {BACKEND_KERAS} var {BACKEND_TFLITE} var {BACKEND_NUMPY}")
+            self.send(f"option name MoveOverhead type spin default {self.options['MoveOverhead']} min 0 max 5000")
+            self.send("uciok")
+        elif command == 'isready':
+            try:
+                self.load_engine() # GUIs wait for readyok, so the model is loaded here and not during the first search
+            except Exception as e:
+                self.send(f"info string Failed to load the network: {e}")
+            self.send("readyok")
+        elif command == 'setoption':
+            self.stop_search() # A new network replaces the engine and evaluator the search is using
+            self.set_option(arguments)
+        elif command == 'ucinewgame':
+            self.stop_search()
+            self.board, self.root_node = chess.Board(), None
+            if self.evaluator is not None:
+                self.evaluator.transposition_table.clear()
+        elif command == 'position':
+            self.stop_search()
+            self.set_position(arguments)
+        elif command == 'go':
+            self.stop_search()
+            self.go(arguments)
+        elif command == 'stop':
+            self.stop_search()
+        elif command == 'quit':
+            return False
+        elif command:
+            self.send(f"info string Unknown command: {line}")
+        return True
+
+    def set_option(self, arguments):
+        if 'name' not in arguments:
+            return
+        value_index = arguments.index('value') if 'value' in arguments else len(arguments)
+        name = " ".join(arguments[arguments.index('name') + 1:value_index])
+        value = " ".join(arguments[value_index + 1:])
+        if name not in self.options:
+            self.send(f"info string Unknown option: {name}")
+        elif name in ('Threads', 'MoveOverhead'):
+            self.options[name] = max(int(value), 1 if name == 'Threads' else 0)
+        else:
+            self.options[name] = '' if value == '<empty>' else value
+            self.engine = self.evaluator = self.root_node = None # Loaded again with the new network
+
+    def load_engine(self):
+        if self.engine is not None:
+            return self.engine
+        from . import MODEL_WEIGHTS_FILE, inference_backend_settings, model_registry
+        weights_file = self.options['Weights']
+        if not weights_file:
+            model_version = model_registry.latest()
+            weights_file = model_version.weights_file if model_version is not None else MODEL_WEIGHTS_FILE
+        backend_settings = inference_backend_settings()
+        policy_value_net = load_policy_value_net(weights_file, backend=self.options['Backend'] or backend_settings.get('BACKEND', BACKEND_KERAS),
+                                                 tflite_model=backend_settings.get('TFLITE_MODEL'), num_threads=backend_settings.get('NUM_THREADS'),
+                                                 shared_weights=backend_settings.get('SHARED_WEIGHTS_DIR'))
+        self.engine = RLEngine(policy_value_net)
+        self.evaluator = BatchedEvaluator(policy_value_net, max_table_size=MAX_TABLE_SIZE)
+        return self.engine
+
+    def set_position(self, arguments):
+        moves_index = arguments.index('moves') if 'moves' in arguments else len(arguments)
+        if arguments and arguments[0] == 'fen':
+            board = chess.Board(" ".join(arguments[1:moves_index]))
+        else:
+            board = chess.Board()
+        for move in arguments[moves_index + 1:]:
+            board.push_uci(move)
+
+        previous = self.board # Reuse the tree when the new position continues the previous one (the usual case in a game)
+        if (self.root_node is not None and len(board.move_stack) >= len(previous.move_stack) and board.root().fen() == previous.root().fen()
+                and board.move_stack[:len(previous.move_stack)] == previous.move_stack):
+            for move in board.move_stack[len(previous.move_stack):]:
+                self.root_node = advance_tree(self.root_node, move)
+        else:
+            self.root_node = None
+        self.board = board
+
+    def search_limits(self, arguments):
+        """`(max_nodes, deadline)` for the `go` arguments; both None for `go infinite`."""
+        params = {}
+        for name, value in zip(arguments, arguments[1:] + [None]):
+            if name in ('movetime', 'nodes', 'wtime', 'btime', 'winc', 'binc', 'movestogo'):
+                if value is None:
+                    raise ValueError(f"missing value for {name}")
+                params[name] = int(value)
+        if 'infinite' in arguments:
+            return None, None
+        overhead = self.options['MoveOverhead']
+        if 'movetime' in params:
+            seconds = max(params['movetime'] - overhead, 10) / 1000
+        elif ('wtime' if self.board.turn == chess.WHITE else 'btime') in params:
+            time_left = params['wtime' if self.board.turn == chess.WHITE else 'btime']
+            increment = params.get('winc' if self.board.turn == chess.WHITE else 'binc', 0)
+            seconds = time_left / params.get('movestogo', DEFAULT_MOVES_TO_GO) + 0.8 * increment
+            seconds = max(min(seconds, time_left / 2) - overhead, 10) / 1000 # Never bet more than half the clock
+        else:
+            seconds = None
+        max_nodes = params.get('nodes')
+        if max_nodes is None and seconds is None: # Bare `go`: the engine's usual fixed budget
+            max_nodes = self.engine.num_simulations_per_move
+        return max_nodes, (time.monotonic() + seconds if seconds is not None else None)
+
+    def go(self, arguments):
+        try:
+            self.load_engine()
+        except Exception as e:
+            self.send(f"info string Failed to load the network: {e}")
+            self.send("bestmove 0000")
+            return
+        if not any(self.board.legal_moves):
+            self.send("bestmove 0000")
+            return
+        max_nodes, deadline = self.search_limits(arguments)
+        if self.root_node is None:
+            self.root_node = MCTSNode(self.board)
+        self._search = TreeParallelSearch(self.root_node, self.evaluator, num_threads=self.options['Threads'])
+        self._search_thread = threading.Thread(target=self._run_search, args=(self._search, max_nodes, deadline),
+                                               name="stockzero-uci-search", daemon=True)
+        self._search_thread.start()
+
+    def _run_search(self, search, max_nodes, deadline):
+        try:
+            search.run(max_nodes=max_nodes, deadline=deadline, on_progress=self.send_info)
+        except Exception as e:
+            self.send(f"info string Search failed: {e}")
+        if search.root_node.children:
+            self.send_info(search)
+            best_move, _ = search.best_move()
+        else: # Failed before the root was expanded
+            best_move = next(iter(self.board.legal_moves))
+        self.send(f"bestmove {best_move.uci()}")
+
+    def send_info(self, search):
+        if not search.root_node.children:
+            return
+        _, q = search.best_move()
+        elapsed = max(search.elapsed, 1e-6)
+        pv = " ".join(move.uci() for move in search.principal_variation())
+        depth = max(int(round(search.average_depth)), 1) # MCTS has no iterations, so depth is the mean leaf depth
+        self.send(f"info depth {depth} seldepth {max(search.max_depth, depth)} score cp {q_to_centipawns(q)} "
+                  f"nodes {search.simulations} nps {int(search.simulations / elapsed)} time {int(elapsed * 1000)} pv {pv}")
+
+    def stop_search(self):
+        """Stops the running search (it finishes the simulations in flight) and waits for its `bestmove`."""
+        if self._search_thread is None:
+            return
+        self._search.stop()
+        self._search_thread.join()
+        self._search = self._search_thread = None
+
+def main():
+    UCIEngine().run()
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,6 @@
+import struct
 import chess
+import chess.polyglot
 import numpy as np
 
 # --- Correct and Deterministic Move Encoding/Decoding (Production Grade) ---
@@ -66,6 +68,16 @@ def index_to_move(index, board):
         return move
     return None # Move is not legal
 
+# --- Compact Move Lists (game storage) ---
+# Moves are packed as little-endian uint16: from square (6 bits), to square (6 bits), promotion piece type (3 bits).
+def pack_moves(moves):
+    """Packs a sequence of chess.Move into 2 bytes per move."""
+    return struct.pack(f"<{len(moves)}H", *((move.from_square | move.to_square << 6 | (move.promotion or 0) << 12) for move in moves))
+
+def unpack_moves(data):
+    """Inverse of `pack_moves`."""
+    return [chess.Move(code & 0x3F, code >> 6 & 0x3F, promotion=(code >> 12) or None) for code in struct.unpack(f"<{len(data) // 2}H", data)]
+
 # --- Board Representation (No Changes - Keep these functions) ---
 def board_to_input(board): # ... (rest of board_to_input function) ...
     piece_types = [chess.PAWN, chess.KNIGHT, chess.BISHOP, chess.ROOK, chess.QUEEN, chess.KING]
@@ -88,6 +100,20 @@ def get_legal_moves_mask(board): # ... (rest of get_legal_moves_mask function) .
     mask[move_indices] = 1.0
     return mask
 
+def mask_policy(policy_probs, board):
+    """Restricts a raw policy vector to the legal moves of `board` and renormalises it (uniform if all zero)."""
+    legal_moves_mask = get_legal_moves_mask(board)
+    masked_policy_probs = policy_probs * legal_moves_mask
+    if np.sum(masked_policy_probs) > 0:
+        masked_policy_probs /= np.sum(masked_policy_probs)
+    else:
+        masked_policy_probs = legal_moves_mask / np.sum(legal_moves_mask)
+    return masked_policy_probs
+
+def position_key(board):
+    """Zobrist hash of the position (pieces, side to move, castling and en passant rights), ignoring move clocks."""
+    return chess.polyglot.zobrist_hash(board)
+
 def get_game_result_value(board): # ... (rest of get_game_result_value function) ...
     if board.is_checkmate():
         return 1 if board.turn == chess.BLACK else -1
@@ -1,3 +1,3 @@
-from .inference_engine import get_optimized_ai_move # Ensure correct relative import
+from .inference_engine import get_optimized_ai_move, analyse_positions, start_pondering # Ensure correct relative import
 
-__all__ = ['get_optimized_ai_move'] # Export the optimized inference function
\ No newline at end of file
+__all__ = ['get_optimized_ai_move', 'analyse_positions', 'start_pondering'] # Export the optimized inference functions
\ No newline at end of file
@@ -1,28 +1,165 @@
+import contextlib
+import os
+import threading
+import time
+import uuid
 import chess
-import tensorflow as tf
-from engine import get_stockzero_engine, board_to_input, NUM_POSSIBLE_MOVES # Ensure correct relative import
-from django.core.cache import cache # Django caching
+from engine import MODEL_DIR, get_stockzero_engine, inference_backend_settings, model_change_callbacks # Ensure correct relative import
+from engine.backends import BACKEND_KERAS
+from engine.eval_cache import evaluation_cache, search_key
+from engine.evaluator import BatchedEvaluator
+from engine.instrumentation import COALESCED_SEARCHES, CACHE_LOOKUPS
+from engine.opening_cache import get_opening_cache
+from .sessions import session_store
+from engine.mcts import MCTSNode
+from django.conf import settings
 
-def get_optimized_ai_move(board_fen, num_simulations=100, use_cache=True):
-    """Optimized AI move inference function, using cache and GPU (if available)."""
+PONDER_SETTINGS = getattr(settings, 'STOCKZERO_PONDER', {})
+PONDER_ENABLED = PONDER_SETTINGS.get('ENABLED', False)
+PONDER_MAX_SIMULATIONS = PONDER_SETTINGS.get('MAX_SIMULATIONS', 400) # Per pondered move
+PONDER_MAX_SECONDS = PONDER_SETTINGS.get('MAX_SECONDS', 10.0) # Per pondered move
+_ponder_slots = threading.BoundedSemaphore(PONDER_SETTINGS.get('MAX_CONCURRENT', 2)) # Ponder searches allowed at once in this worker
+
+ANALYSE_SETTINGS = getattr(settings, 'STOCKZERO_ANALYSE', {})
+OPENING_CACHE_SETTINGS = getattr(settings, 'STOCKZERO_OPENING_CACHE', {})
+OPENING_CACHE_PATH = OPENING_CACHE_SETTINGS.get('PATH', os.path.join(MODEL_DIR, 'opening_cache.npy'))
+
+COALESCING_SETTINGS = getattr(settings, 'STOCKZERO_COALESCING', {})
+COALESCING_ENABLED = COALESCING_SETTINGS.get('ENABLED', True)
+COALESCING_LOCK_TIMEOUT = COALESCING_SETTINGS.get('LOCK_TIMEOUT', 30) # Seconds before a crashed worker's search lock expires
+COALESCING_WAIT_TIMEOUT = COALESCING_SETTINGS.get('WAIT_TIMEOUT', 10.0) # Longest wait for another request's search
+COALESCING_POLL_INTERVAL = COALESCING_SETTINGS.get('POLL_INTERVAL', 0.05) # Cache polling period while another worker searches
+
+_device_name = None
+
+def _drop_stale_search_trees(model_version):
+    session_store.drop_search_trees() # Their statistics come from the previous model
+
+model_change_callbacks.append(_drop_stale_search_trees)
+
+def inference_device():
+    """Device placement for the Keras backend (GPU if available); TensorFlow is only imported on first use."""
+    global _device_name
+    if inference_backend_settings().get('BACKEND', BACKEND_KERAS) != BACKEND_KERAS:
+        return contextlib.nullcontext()
+    import tensorflow as tf
+    if _device_name is None:
+        _device_name = '/GPU:0' if tf.config.list_physical_devices('GPU') else '/CPU:0'
+    return tf.device(_device_name)
+
+def get_optimized_ai_move(board_fen, num_simulations=100, use_cache=True, session=None):
+    """Optimized AI move inference function, using cache and GPU (if available).
+
+    When a `GameSession` is given, its live board and cached search tree are used instead of
+    parsing `board_fen`, and the searched tree is kept on the session for the next request.
+    Call `start_pondering(session)` once the reply has been pushed to keep searching on the opponent's time.
+    With caching on, concurrent requests for the same position share one search (see `_coalesced_search`).
+    """
+    engine = get_stockzero_engine() # Get pre-loaded engine
+    board = session.board if session is not None else chess.Board(fen=board_fen)
+    model_version = getattr(engine.policy_value_net, 'model_version', None) # A new model starts with fresh entries
+    opening_cache = get_opening_cache(OPENING_CACHE_PATH) if use_cache and OPENING_CACHE_SETTINGS.get('ENABLED') else None
+    if opening_cache is not None and opening_cache.model_version == model_version: # A book of the previous model is ignored until rebuilt
+        book_move = opening_cache.best_move(board) # Searched offline much deeper than we could now
+        CACHE_LOOKUPS.inc(1, 'opening', 'miss' if book_move is None else 'hit')
+        if book_move is not None:
+            return book_move.uci()
     if use_cache:
-        cached_move = cache.get(f"ai_move:{board_fen}")
+        cached_move = evaluation_cache.get_move(board, model_version) # Keyed by canonical position, not FEN
         if cached_move:
             return cached_move
 
-    engine = get_stockzero_engine() # Get pre-loaded engine
-    board = chess.Board(fen=board_fen)
+    def run_search():
+        root_node = session.search_tree if session is not None else None
+        # --- GPU Inference (TensorFlow should automatically use GPU if configured) ---
+        with inference_device(): # Explicitly place on GPU if available
+            ai_move, root_node = engine.search(board, root_node=root_node, num_simulations=num_simulations) # MCTS and NN inference
+        if session is not None:
+            session.search_tree = root_node # Advanced to the reply's subtree when the move is pushed
+        ai_move_uci = ai_move.uci()
+        if use_cache:
+            evaluation_cache.set_move(board, model_version, ai_move_uci)
+        return ai_move_uci
 
-    # --- GPU Inference (TensorFlow should automatically use GPU if configured) ---
-    with tf.device('/GPU:0' if tf.config.list_physical_devices('GPU') else '/CPU:0'): # Explicitly place on GPU if available
-        ai_move = engine.choose_move(board) # Engine's choose_move uses MCTS and NN inference
+    if not use_cache or not COALESCING_ENABLED:
+        return run_search()
+    return _coalesced_search(board, model_version, run_search)
 
-    ai_move_uci = ai_move.uci()
+class _InFlightSearch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.move_uci = None
 
-    if use_cache:
-        cache.set(f"ai_move:{board_fen}", ai_move_uci, timeout=300) # Cache AI move for 5 minutes
+_in_flight = {} # (model version, search key) -> _InFlightSearch running in this worker
+_in_flight_lock = threading.Lock()
+
+def _coalesced_search(board, model_version, run_search):
+    """Single-flight: one search per position and model, however many requests ask for it at once.
+
+    Requests in this worker wait on the thread already searching the position. Across workers the
+    search is claimed with a cache lock (SET NX on Redis); the other workers poll the `ai_move` cache
+    for its result. A waiter whose leader fails or exceeds `WAIT_TIMEOUT` runs its own search.
+    """
+    flight_key = (model_version, search_key(board))
+    with _in_flight_lock:
+        flight = _in_flight.get(flight_key)
+        is_leader = flight is None
+        if is_leader:
+            flight = _in_flight[flight_key] = _InFlightSearch()
+    if not is_leader:
+        if flight.done.wait(COALESCING_WAIT_TIMEOUT) and flight.move_uci:
+            COALESCED_SEARCHES.inc(1, 'process')
+            return flight.move_uci
+        return run_search()
+    try:
+        flight.move_uci = _search_across_workers(board, model_version, run_search)
+        return flight.move_uci
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(flight_key, None)
+        flight.done.set()
+
+def _search_across_workers(board, model_version, run_search):
+    token = uuid.uuid4().hex
+    if evaluation_cache.acquire_search_lock(board, model_version, token, timeout=COALESCING_LOCK_TIMEOUT):
+        try:
+            return run_search() # Also stores the move in the cache, where the other workers pick it up
+        finally:
+            evaluation_cache.release_search_lock(board, model_version, token)
+    deadline = time.monotonic() + COALESCING_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(COALESCING_POLL_INTERVAL)
+        move_uci = evaluation_cache.get_move(board, model_version)
+        if move_uci:
+            COALESCED_SEARCHES.inc(1, 'worker')
+            return move_uci
+        if not evaluation_cache.search_locked(board, model_version):
+            break # The other worker finished without a result (error) or its lock expired
+    return run_search()
+
+def analyse_positions(board_fens, num_simulations=100, top_k=3):
+    """Multi-PV analysis of a list of FENs, searched together with one batched evaluator (see `RLEngine.analyse`)."""
+    engine = get_stockzero_engine() # Get pre-loaded engine
+    boards = [chess.Board(fen=board_fen) for board_fen in board_fens]
+    with inference_device(): # Explicitly place on GPU if available
+        evaluator = BatchedEvaluator(engine.policy_value_net, max_table_size=ANALYSE_SETTINGS.get('MAX_TABLE_SIZE', 50000))
+        return engine.analyse(boards, num_simulations=num_simulations, top_k=top_k, evaluator=evaluator)
+
+def start_pondering(session):
+    """Searches the session's position (opponent to move) in the background within the ponder quota.
 
-    return ai_move_uci
+    The next `session.push()` cancels the search and keeps the subtree of the move actually played,
+    so the following `get_optimized_ai_move` call starts from the pondered statistics.
+    """
+    if not PONDER_ENABLED or session.ponder_search is not None or session.board.is_game_over():
+        return False
+    if not _ponder_slots.acquire(blocking=False): # All ponder slots busy, skip rather than steal request CPU
+        return False
+    if session.search_tree is None:
+        session.search_tree = MCTSNode(session.board)
+    engine = get_stockzero_engine()
+    session.ponder_search = engine.start_ponder(session.search_tree, PONDER_MAX_SIMULATIONS, PONDER_MAX_SECONDS, on_finish=lambda _: _ponder_slots.release())
+    return True
 
 if __name__ == "__main__":
     # Example usage (for testing inference)
@@ -35,4 +172,4 @@ if __name__ == "__main__":
     ai_move_gpu = get_optimized_ai_move(initial_fen, num_simulations=200, use_cache=False) # No cache for time measurement
     end_time = time.time()
     inference_time = end_time - start_time
-    print(f"AI move (no cache) on GPU: {ai_move_gpu}, Inference time: {inference_time:.4f} seconds")
\ No newline at end of file
+    print(f"AI move (no cache) on GPU: {ai_move_gpu}, Inference time: {inference_time:.4f} seconds")
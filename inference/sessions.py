@@ -0,0 +1,123 @@
+import threading
+import uuid
+from collections import OrderedDict
+import chess
+from django.conf import settings
+from django.core.cache import cache # Django caching (Redis in production)
+
+SESSION_SETTINGS = getattr(settings, 'STOCKZERO_SESSIONS', {})
+MAX_IN_PROCESS_SESSIONS = SESSION_SETTINGS.get('MAX_IN_PROCESS', 1000) # Sessions kept in this worker's memory
+SESSION_TIMEOUT = SESSION_SETTINGS.get('TIMEOUT', 60 * 60) # Seconds a spilled session survives in Redis
+
+class GameSession:
+    """Server-side state of one game: the move list, the live board and the engine's search tree."""
+
+    def __init__(self, session_id, initial_fen=chess.STARTING_FEN, moves=None, ai_player_color=None):
+        self.session_id = session_id
+        self.initial_fen = initial_fen
+        self.board = chess.Board(fen=initial_fen)
+        for move_uci in moves or []:
+            self.board.push_uci(move_uci) # Replaying keeps the move stack, so repetitions are detectable
+        if ai_player_color is None:
+            ai_player_color = "Black" if self.board.turn == chess.WHITE else "White"
+        self.ai_player_color = ai_player_color
+        self.search_tree = None # MCTSNode rooted at the current position, only kept in process
+        self.ponder_search = None # Background search running on the opponent's time, if any
+        self.lock = threading.Lock() # Serialises concurrent requests for the same game
+        self._ponder_lock = threading.Lock() # Guards ponder_search alone, also taken by the store when it evicts the session
+
+    @property
+    def moves(self):
+        return [move.uci() for move in self.board.move_stack]
+
+    def push(self, move):
+        """Plays `move` and advances the cached search tree to the matching subtree."""
+        from engine.mcts import advance_tree # Deferred to keep this module light to import
+        self.stop_pondering()
+        self.search_tree = advance_tree(self.search_tree, move)
+        self.board.push(move)
+
+    def stop_pondering(self):
+        """Cancels any background search; its statistics stay in `search_tree`. Safe to call from several threads."""
+        with self._ponder_lock:
+            ponder_search, self.ponder_search = self.ponder_search, None
+        if ponder_search is not None:
+            ponder_search.stop()
+
+    def to_dict(self):
+        """Compact, tree-free representation used to spill the session to Redis."""
+        return {'initial_fen': self.initial_fen, 'moves': self.moves, 'ai_player_color': self.ai_player_color}
+
+    @classmethod
+    def from_dict(cls, session_id, data):
+        return cls(session_id, initial_fen=data['initial_fen'], moves=data['moves'], ai_player_color=data['ai_player_color'])
+
+class SessionStore:
+    """In-process LRU of game sessions with write-through spill to the Django cache.
+
+    Sessions evicted from this worker, or created by another worker, are rebuilt from the
+    spilled move list; only the search tree is lost in that case.
+    """
+
+    def __init__(self, max_sessions=MAX_IN_PROCESS_SESSIONS, timeout=SESSION_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.timeout = timeout
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _cache_key(session_id):
+        return f"game_session:{session_id}"
+
+    def create(self, initial_fen=chess.STARTING_FEN):
+        session = GameSession(uuid.uuid4().hex, initial_fen=initial_fen)
+        self.save(session)
+        return session
+
+    def get(self, session_id):
+        data = cache.get(self._cache_key(session_id))
+        with self._lock:
+            session = self._sessions.get(session_id)
+            # Another worker may have advanced this game; trust the local copy only if it is current.
+            if session is not None and (data is None or len(data['moves']) == len(session.board.move_stack)):
+                self._sessions.move_to_end(session_id)
+                return session
+        if session is not None:
+            session.stop_pondering() # Stale copy, its tree no longer matches the game
+        if data is None:
+            return None
+        session = GameSession.from_dict(session_id, data)
+        self._remember(session)
+        return session
+
+    def save(self, session):
+        self._remember(session)
+        cache.set(self._cache_key(session.session_id), session.to_dict(), timeout=self.timeout)
+
+    def delete(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            session.stop_pondering()
+        cache.delete(self._cache_key(session_id))
+
+    def drop_search_trees(self):
+        """Stops pondering and forgets the search tree of every in-process session (e.g. after a model swap)."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            with session.lock: # Not while a request is searching this game
+                session.stop_pondering()
+                session.search_tree = None
+
+    def _remember(self, session):
+        evicted = []
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                evicted.append(self._sessions.popitem(last=False)[1]) # Already spilled on save, only the tree is dropped
+        for evicted_session in evicted: # Outside the store lock, stopping waits for the ponder thread
+            evicted_session.stop_pondering()
+
+session_store = SessionStore()
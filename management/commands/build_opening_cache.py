@@ -0,0 +1,88 @@
+from django.core.management.base import BaseCommand, CommandError
+from collections import Counter
+import glob
+import io
+import os
+import time
+import chess
+import chess.pgn
+from engine import get_stockzero_engine, get_model_version, MODEL_DIR
+from engine.opening_cache import MAX_MOVES, write_opening_cache
+from engine.utils import position_key, unpack_moves
+from training.self_play import SELF_PLAY_DATA_DIR
+from webapp.chessgame.models import GameRecord
+
+DEFAULT_OPENING_CACHE_FILE = os.path.join(MODEL_DIR, "opening_cache.npy")
+
+class Command(BaseCommand):
+    help = 'Searches the most frequent opening positions of logged and self-play games offline and writes them to the opening cache'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=DEFAULT_OPENING_CACHE_FILE, help='Opening cache file (memory-mapped .npy).')
+        parser.add_argument('--pgn-dir', default=SELF_PLAY_DATA_DIR, help='Directory with self-play PGN files to count positions from.')
+        parser.add_argument('--max-plies', type=int, default=10, help='Only positions within the first N plies are considered.')
+        parser.add_argument('--min-count', type=int, default=3, help='Minimum number of games a position must occur in.')
+        parser.add_argument('--max-positions', type=int, default=5000, help='Most frequent positions to search.')
+        parser.add_argument('--num-simulations', type=int, default=1600, help='MCTS simulations per position (deep offline search).')
+        parser.add_argument('--batch-size', type=int, default=64, help='Positions searched together with one batched evaluator.')
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+        counts, boards = Counter(), {}
+        num_games = 0
+        for game in self._game_move_lists(options['pgn_dir']):
+            num_games += 1
+            self._count_positions(game, options['max_plies'], counts, boards)
+        selected = [key for key, count in counts.most_common(options['max_positions']) if count >= options['min_count']]
+        self.stdout.write(f"Counted {len(counts)} distinct positions in {num_games} games; searching {len(selected)} of them.")
+        if not selected:
+            raise CommandError("No position reaches --min-count, nothing to build.")
+
+        engine = get_stockzero_engine()
+        entries = []
+        batch_size = options['batch_size']
+        for start in range(0, len(selected), batch_size):
+            batch_boards = [boards[key] for key in selected[start:start + batch_size]]
+            for board, analysis in zip(batch_boards, engine.analyse(batch_boards, num_simulations=options['num_simulations'], top_k=MAX_MOVES)):
+                total_visits = sum(move['visits'] for move in analysis['moves'])
+                if not total_visits:
+                    continue
+                move_probs = [(chess.Move.from_uci(move['move']), move['visits'] / total_visits) for move in analysis['moves']]
+                entries.append((board, move_probs, analysis['moves'][0]['q'], total_visits))
+            self.stdout.write(f"  searched {min(start + batch_size, len(selected))}/{len(selected)} positions")
+
+        write_opening_cache(options['output'], entries, metadata={
+            'model_version': get_model_version(), 'num_simulations': options['num_simulations'],
+            'max_plies': options['max_plies'], 'games': num_games, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        })
+        self.stdout.write(self.style.SUCCESS(
+            f"Opening cache with {len(entries)} positions written to '{options['output']}' in {time.time() - start_time:.2f} seconds."))
+
+    @staticmethod
+    def _game_move_lists(pgn_dir):
+        """Yields (initial_fen, moves) for every logged game and every self-play PGN."""
+        rows = GameRecord.objects.values_list('initial_fen', 'moves', 'pgn_content').iterator(chunk_size=2000)
+        for initial_fen, packed_moves, pgn_content in rows:
+            if packed_moves:
+                yield initial_fen or chess.STARTING_FEN, unpack_moves(bytes(packed_moves))
+            elif pgn_content: # Logged before games were stored as packed moves
+                game = chess.pgn.read_game(io.StringIO(pgn_content))
+                if game is not None:
+                    yield game.board().fen(), list(game.mainline_moves())
+        for pgn_path in sorted(glob.glob(os.path.join(pgn_dir, "*.pgn"))):
+            with open(pgn_path) as pgn_file:
+                while (game := chess.pgn.read_game(pgn_file)) is not None:
+                    yield game.board().fen(), list(game.mainline_moves())
+
+    @staticmethod
+    def _count_positions(game, max_plies, counts, boards):
+        initial_fen, moves = game
+        board = chess.Board(fen=initial_fen)
+        seen_in_game = set() # A position repeated within one game counts once
+        for move in moves[:max_plies]:
+            key = position_key(board)
+            if key not in seen_in_game:
+                seen_in_game.add(key)
+                counts[key] += 1
+                boards.setdefault(key, board.copy(stack=False))
+            board.push(move)
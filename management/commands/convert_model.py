@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+import os
+import time
+from engine import MODEL_WEIGHTS_FILE
+from engine.utils import position_key
+from engine.backends import QUANTIZATION_MODES, TFLiteBackend, accuracy_report, convert_to_tflite, load_keras_network, sample_positions, tflite_model_path
+
+class Command(BaseCommand):
+    help = 'Converts the trained model to a (quantized) TFLite model for CPU serving and reports its accuracy against float32'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weights', default=MODEL_WEIGHTS_FILE, help='Keras weights file to convert.')
+        parser.add_argument('--quantization', choices=QUANTIZATION_MODES, default='int8', help='Quantization mode of the TFLite model.')
+        parser.add_argument('--output', help='TFLite model path (default: next to the weights, e.g. models/rl_chess_model.int8.tflite).')
+        parser.add_argument('--calibration-positions', type=int, default=200, help='Positions used to calibrate int8 activations.')
+        parser.add_argument('--eval-positions', type=int, default=500, help='Positions used for the accuracy report (distinct from calibration).')
+        parser.add_argument('--search-positions', type=int, default=0, help='Also compare the moves chosen by MCTS on this many positions.')
+        parser.add_argument('--num-simulations', type=int, default=100, help='Simulations per search for --search-positions.')
+
+    def handle(self, *args, **options):
+        try:
+            reference_net = load_keras_network(options['weights'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        output_path = options['output'] or tflite_model_path(options['weights'], options['quantization'])
+
+        start_time = time.time()
+        calibration_boards = sample_positions(options['calibration_positions'], seed=1)
+        convert_to_tflite(reference_net, output_path, options['quantization'], calibration_boards=calibration_boards)
+        self.stdout.write(f"Converted '{options['weights']}' to '{output_path}' ({options['quantization']}, "
+                          f"{os.path.getsize(output_path) / 1e6:.1f} MB) in {time.time() - start_time:.2f} seconds.")
+
+        candidate_net = TFLiteBackend(output_path)
+        calibration_keys = {position_key(board) for board in calibration_boards} # Short playouts repeat positions, e.g. the start position
+        eval_boards = sample_positions(options['eval_positions'], seed=2, exclude=calibration_keys)
+        report = accuracy_report(reference_net, candidate_net, eval_boards)
+        if options['search_positions']:
+            report['search_move_agreement'] = self._search_agreement(reference_net, candidate_net, options['search_positions'], options['num_simulations'])
+        report.update({'weights': options['weights'], 'model': output_path, 'quantization': options['quantization']})
+
+        report_path = os.path.splitext(output_path)[0] + ".accuracy.json"
+        with open(report_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        for name, value in report.items():
+            self.stdout.write(f"  {name}: {value}")
+        self.stdout.write(self.style.SUCCESS(f"Accuracy report saved to '{report_path}'"))
+
+    @staticmethod
+    def _search_agreement(reference_net, candidate_net, num_positions, num_simulations):
+        """Fraction of positions where both networks lead MCTS to the same move."""
+        from engine.mcts import MCTSNode, run_mcts
+        from benchmarks.suite import no_evaluation_cache
+        boards = sample_positions(num_positions, seed=3)
+        with no_evaluation_cache(): # The evaluation cache is keyed by position only and would mix the two networks
+            agreements = [run_mcts(MCTSNode(board), reference_net, num_simulations) == run_mcts(MCTSNode(board), candidate_net, num_simulations)
+                          for board in boards]
+        return sum(agreements) / len(agreements)
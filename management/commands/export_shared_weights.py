@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+import os
+from engine import MODEL_WEIGHTS_FILE
+from engine.backends import load_keras_network
+from engine.shared_weights import export_weights, shared_weights_dir
+
+class Command(BaseCommand):
+    help = 'Exports the trained weights as memory-mappable .npy files for the shared-memory numpy backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weights', default=MODEL_WEIGHTS_FILE, help='Keras weights file to export.')
+        parser.add_argument('--output-dir', help='Directory for the .npy files (default: next to the weights, e.g. models/rl_chess_model.shared/).')
+
+    def handle(self, *args, **options):
+        try:
+            policy_value_net = load_keras_network(options['weights'])
+        except FileNotFoundError as e:
+            raise CommandError(str(e))
+        output_dir = export_weights(policy_value_net, options['output_dir'] or shared_weights_dir(options['weights']))
+        size_mb = sum(os.path.getsize(os.path.join(output_dir, name)) for name in os.listdir(output_dir)) / 1e6
+        self.stdout.write(self.style.SUCCESS(f"Exported shared weights to '{output_dir}' ({size_mb:.1f} MB)"))
@@ -0,0 +1,80 @@
+from django.core.management.base import BaseCommand, CommandError
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+import time
+from webapp.chessgame.models import GameRecord
+from training.data_utils import game_record_to_history, save_training_data, TRAINING_DATA_DIR
+
+EXPORT_STATE_FILE = "gamerecord_export_state.json" # Remembers the last exported GameRecord id
+
+class Command(BaseCommand):
+    help = 'Exports logged GameRecord games into training data shards, incrementally from the last exported game'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', default=TRAINING_DATA_DIR, help='Directory for the training shards and export state.')
+        parser.add_argument('--shard-size', type=int, default=5000, help='Number of games per training shard.')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows fetched per round trip from the server-side cursor.')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Worker processes used to convert games.')
+        parser.add_argument('--full', action='store_true', help='Ignore the export state and export every game again.')
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir']
+        shard_size = options['shard_size']
+        if shard_size < 1:
+            raise CommandError("--shard-size must be at least 1")
+        self.workers = options['workers'] or 1
+        os.makedirs(output_dir, exist_ok=True)
+        state_path = os.path.join(output_dir, EXPORT_STATE_FILE)
+
+        last_exported_id = 0 if options['full'] else self._read_state(state_path)
+        self.stdout.write(f"Exporting games with id > {last_exported_id} to '{output_dir}'...")
+
+        # values_list keeps rows as tuples; iterator() streams them through a server-side cursor on PostgreSQL
+        rows = (GameRecord.objects.filter(id__gt=last_exported_id).order_by('id')
+                .values_list('id', 'initial_fen', 'moves', 'pgn_content', 'result')
+                .iterator(chunk_size=options['chunk_size']))
+
+        start_time = time.time()
+        total_games = total_positions = num_shards = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            shard_ids, shard_records = [], []
+            for game_id, initial_fen, packed_moves, pgn_content, result in rows:
+                shard_ids.append(game_id)
+                shard_records.append((initial_fen, bytes(packed_moves), pgn_content, result)) # memoryview is not picklable
+                if len(shard_records) == shard_size:
+                    total_positions += self._write_shard(pool, output_dir, state_path, shard_ids, shard_records)
+                    total_games += len(shard_records)
+                    num_shards += 1
+                    shard_ids, shard_records = [], []
+            if shard_records:
+                total_positions += self._write_shard(pool, output_dir, state_path, shard_ids, shard_records)
+                total_games += len(shard_records)
+                num_shards += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {total_games} games ({total_positions} positions) into {num_shards} shards in {time.time() - start_time:.2f} seconds."))
+
+    def _write_shard(self, pool, output_dir, state_path, shard_ids, shard_records):
+        """Converts one shard in the process pool, saves it and advances the export state."""
+        chunksize = max(1, len(shard_records) // (4 * self.workers)) # A few tasks per worker keeps IPC overhead low
+        game_histories = [history for history in pool.map(game_record_to_history, shard_records, chunksize=chunksize) if history]
+        shard_path = os.path.join(output_dir, f"gamerecord_games_{shard_ids[0]}_{shard_ids[-1]}.pkl")
+        save_training_data(game_histories, filename=shard_path)
+        self._write_state(state_path, shard_ids[-1]) # Only after the shard is on disk, so a crash re-exports it
+        return sum(len(history) for history in game_histories)
+
+    @staticmethod
+    def _read_state(state_path):
+        try:
+            with open(state_path) as state_file:
+                return json.load(state_file)['last_exported_id']
+        except FileNotFoundError:
+            return 0
+
+    @staticmethod
+    def _write_state(state_path, last_exported_id):
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w") as state_file:
+            json.dump({'last_exported_id': last_exported_id}, state_file)
+        os.replace(tmp_path, state_path) # Atomic, the state never points past a missing shard
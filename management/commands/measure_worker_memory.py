@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+from engine import MODEL_WEIGHTS_FILE
+from engine.backends import BACKEND_KERAS, BACKEND_NUMPY, BACKEND_TFLITE, load_policy_value_net
+from benchmarks.worker_memory import measure_worker_memory
+
+class Command(BaseCommand):
+    help = 'Measures memory per pre-forked worker (RSS and PSS) for different worker counts and inference backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backend', choices=(BACKEND_KERAS, BACKEND_TFLITE, BACKEND_NUMPY), default=BACKEND_NUMPY, help='Inference backend to load.')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 8], help='Worker counts to compare.')
+        parser.add_argument('--weights', default=MODEL_WEIGHTS_FILE, help='Keras weights file the backend model was derived from.')
+        parser.add_argument('--no-preload', action='store_true', help='Load the model in every worker instead of once before forking.')
+        parser.add_argument('--output', help='Also write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        backend = options['backend']
+        preload = not options['no_preload']
+        if preload and backend != BACKEND_NUMPY:
+            raise CommandError("Only the numpy backend can be preloaded; TensorFlow is not fork-safe. Use --no-preload.")
+        load_net = lambda: load_policy_value_net(options['weights'], backend=backend)
+
+        results = []
+        for num_workers in options['workers']:
+            result = measure_worker_memory(load_net, num_workers, preload=preload)
+            result['backend'] = backend
+            results.append(result)
+            self.stdout.write(f"{backend}, {num_workers} worker(s), preload={preload}: "
+                              f"RSS/worker {result['mean_worker_rss_kb'] / 1024:.1f} MB, PSS/worker {result['mean_worker_pss_kb'] / 1024:.1f} MB, "
+                              f"host total (PSS) {result['total_pss_kb'] / 1024:.1f} MB")
+        if options['output']:
+            with open(options['output'], "w") as output_file:
+                json.dump(results, output_file, indent=2)
+        self.stdout.write(self.style.SUCCESS("Worker memory measurement finished."))
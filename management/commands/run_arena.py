@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+import datetime
+import json
+import os
+from arena import SPRT, SPRT_H1, default_openings, game_pgn, load_openings, parse_engine_spec, run_match
+from engine import inference_backend_settings
+
+ARENA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'arena', 'results') # arena/results/ dir in project root
+
+class Command(BaseCommand):
+    help = 'Plays a match between two engines in parallel worker processes and reports Elo, optionally gated by an SPRT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('engine_a', help='Candidate engine: rl:<checkpoint>[@<nodes>], traditional[:<depth>] or mcts:<nodes>.')
+        parser.add_argument('engine_b', help='Reference engine, same format (e.g. rl:latest@200).')
+        parser.add_argument('--games', type=int, default=400, help='Maximum number of games (played in opening pairs with colours reversed).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Games played at once per worker; their searches share batched network calls.')
+        parser.add_argument('--max-plies', type=int, default=400, help='Games still running after this many plies are adjudicated a draw.')
+        parser.add_argument('--openings', help='Opening suite: .pgn, or one FEN/EPD or SAN move line per line (default: built-in suite).')
+        parser.add_argument('--sprt', action='store_true', help='Stop early once the SPRT of --elo0 against --elo1 is decided.')
+        parser.add_argument('--elo0', type=float, default=0.0, help='SPRT null hypothesis (Elo of A over B).')
+        parser.add_argument('--elo1', type=float, default=10.0, help='SPRT alternative hypothesis (Elo of A over B).')
+        parser.add_argument('--alpha', type=float, default=0.05, help='SPRT false positive rate.')
+        parser.add_argument('--beta', type=float, default=0.05, help='SPRT false negative rate.')
+        parser.add_argument('--gate', action='store_true', help='Exit with an error unless the SPRT accepts H1 (engine A is stronger). Implies --sprt.')
+        parser.add_argument('--output', help='JSON report (default: arena/results/<timestamp>.json); the games are written next to it as PGN.')
+
+    def handle(self, *args, **options):
+        try:
+            engine_a, engine_b = parse_engine_spec(options['engine_a']), parse_engine_spec(options['engine_b'])
+            openings = load_openings(options['openings']) if options['openings'] else default_openings()
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+        sprt = SPRT(options['elo0'], options['elo1'], options['alpha'], options['beta']) if options['sprt'] or options['gate'] else None
+        self.stdout.write(f"{engine_a['name']} vs {engine_b['name']}: up to {options['games']} games, {len(openings)} openings, {options['workers']} workers")
+
+        def on_game(game, stats):
+            low, high = stats.elo_interval()
+            progress = f"  game {stats.games}: {stats.wins}W {stats.draws}D {stats.losses}L, Elo {stats.elo():+.1f} [{low:+.1f}, {high:+.1f}]"
+            if sprt is not None:
+                progress += f", LLR {sprt.llr(stats):.2f} ({sprt.lower_bound:.2f}, {sprt.upper_bound:.2f})"
+            self.stdout.write(progress)
+
+        try:
+            report = run_match(engine_a, engine_b, openings, options['games'], num_workers=options['workers'], concurrency=options['concurrency'],
+                               max_plies=options['max_plies'], sprt=sprt, backend=inference_backend_settings().get('BACKEND', 'keras'), on_game=on_game)
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        output_path = options['output'] or os.path.join(ARENA_DIR, f"{datetime.datetime.now():%Y-%m-%d_%H%M%S}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+        with open(output_path, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        with open(os.path.splitext(output_path)[0] + ".pgn", "w") as pgn_file:
+            for game in sorted(report['games'] + report['late_games'], key=lambda game: game['index']):
+                white, black = (engine_a, engine_b) if game['a_is_white'] else (engine_b, engine_a)
+                headers = {'Event': 'StockZero arena', 'Round': game['index'] + 1, 'White': white['name'], 'Black': black['name'],
+                           'Result': game['result'], 'Opening': game['opening'], 'Termination': game['termination']}
+                pgn_file.write(game_pgn(game['fen'], game['moves'] + game['game_moves'], headers) + "\n\n")
+
+        stats = report['stats']
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['games']} games in {report['seconds']:.1f} seconds: {engine_a['name']} scored {stats['score']:.1%} "
+            f"({stats['wins']}W {stats['draws']}D {stats['losses']}L), Elo {stats['elo']:+.1f} [{stats['elo_low']:+.1f}, {stats['elo_high']:+.1f}] (95%), "
+            f"LOS {stats['los']:.1%}. Report saved to '{output_path}'"))
+        if sprt is not None:
+            result = report['sprt']['result']
+            self.stdout.write(f"SPRT [{options['elo0']}, {options['elo1']}]: {result or 'inconclusive'} (LLR {report['sprt']['llr']:.2f})")
+            if options['gate'] and result != SPRT_H1:
+                raise CommandError(f"Gate failed: {engine_a['name']} is not shown to be stronger than {engine_b['name']}")
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+import datetime
+import os
+from benchmarks import BENCHMARKS, BenchmarkContext, run_benchmarks, compare_to_baseline, save_report, load_report
+from benchmarks.suite import build_benchmark_network
+from engine.network_config import NETWORK_PRESETS, network_config
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'benchmarks') # benchmarks/ dir in project root
+DEFAULT_BASELINE_FILE = os.path.join(BENCHMARK_DIR, 'baseline.json')
+
+class Command(BaseCommand):
+    help = 'Runs the engine hot-path benchmarks, writes the results to JSON and flags regressions against a baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Run only these benchmarks.')
+        parser.add_argument('--output', help='JSON file for the results (default: benchmarks/results/<timestamp>.json).')
+        parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help='Baseline JSON to compare against.')
+        parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline.')
+        parser.add_argument('--tolerance', type=float, default=0.10, help='Allowed slowdown before a benchmark counts as a regression (0.10 = 10%%).')
+        parser.add_argument('--weights', help='Benchmark a trained model instead of the seeded random network.')
+        parser.add_argument('--network', choices=sorted(NETWORK_PRESETS), help='Benchmark a seeded network of this architecture preset (default: baseline).')
+        parser.add_argument('--quick', action='store_true', help='Fewer iterations, for smoke runs (not comparable with full runs).')
+
+    def handle(self, *args, **options):
+        policy_value_net = build_benchmark_network(options['weights']) if options['weights'] else None
+        network = network_config(options['network']) if options['network'] else None
+        context = BenchmarkContext(policy_value_net=policy_value_net, quick=options['quick'], network=network)
+        report = run_benchmarks(options['only'], context=context, log=self.stdout.write)
+        report['meta']['quick'] = options['quick']
+
+        output_path = options['output'] or os.path.join(BENCHMARK_DIR, 'results', f"{datetime.datetime.now():%Y-%m-%d_%H%M%S}.json")
+        save_report(report, output_path)
+        self.stdout.write(self.style.SUCCESS(f"Benchmark results saved to '{output_path}'"))
+
+        if options['save_baseline']:
+            save_report(report, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f"Baseline updated at '{options['baseline']}'"))
+            return
+
+        if not os.path.exists(options['baseline']):
+            self.stdout.write(self.style.WARNING(f"No baseline at '{options['baseline']}', run with --save-baseline to create one."))
+            return
+        baseline = load_report(options['baseline'])
+        if baseline['meta'].get('quick') != report['meta']['quick']:
+            self.stdout.write(self.style.WARNING("Baseline and current run use different --quick settings, comparison skipped."))
+            return
+        if baseline['meta'].get('network', report['meta']['network']) != report['meta']['network']:
+            self.stdout.write(self.style.WARNING("Baseline was measured with a different network architecture, comparison skipped."))
+            return
+        regressions = compare_to_baseline(report, baseline, tolerance=options['tolerance'])
+        for name, baseline_value, value, ratio in regressions:
+            self.stdout.write(self.style.ERROR(f"REGRESSION {name}: {value:,.1f} vs baseline {baseline_value:,.1f} ({ratio:.0%})"))
+        if regressions:
+            raise CommandError(f"{len(regressions)} benchmark(s) regressed by more than {options['tolerance']:.0%}")
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
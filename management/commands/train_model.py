@@ -2,7 +2,12 @@ from django.core.management.base import BaseCommand, CommandError
 import tensorflow as tf
 import time
 import datetime
+import os
+from django.conf import settings
 from engine import get_stockzero_engine, board_to_input, NUM_POSSIBLE_MOVES # Ensure correct relative import
+from engine.model import build_policy_value_net
+from engine.network_config import NETWORK_PRESETS, network_config
+from engine.registry import write_model_metadata
 from training import self_play, train_network # Ensure correct relative import
 
 class Command(BaseCommand):
@@ -12,6 +17,11 @@ class Command(BaseCommand):
         parser.add_argument('--games', type=int, default=20, help='Number of self-play games to generate per iteration.')
         parser.add_argument('--epochs', type=int, default=10, help='Number of training epochs per iteration.')
         parser.add_argument('--simulations', type=int, default=50, help='Number of MCTS simulations per move in self-play.')
+        parser.add_argument('--full-search-probability', type=float, help="Share of self-play moves searched in full and given a policy target, 1.0 = every move (default: STOCKZERO_SELF_PLAY).")
+        parser.add_argument('--no-resign', action='store_true', help='Play every self-play game to the end (adjudication still applies).')
+        parser.add_argument('--network', choices=sorted(NETWORK_PRESETS), help="Architecture preset (default: STOCKZERO_NETWORK['PRESET']).")
+        parser.add_argument('--num-blocks', type=int, help='Residual blocks (overrides the preset).')
+        parser.add_argument('--num-filters', type=int, help='Convolution filters (overrides the preset).')
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Starting StockZero model training..."))
@@ -25,7 +35,7 @@ class Command(BaseCommand):
             gpu_device = '/CPU:0'
 
         with tf.device(gpu_device):
-            policy_value_net = engine.model.PolicyValueNetwork(NUM_POSSIBLE_MOVES) # Correct relative import
+            policy_value_net = build_policy_value_net(NUM_POSSIBLE_MOVES, self._network_config(options))
             optimizer = tf.keras.optimizers.Adam(learning_rate=0.001)
             engine = get_stockzero_engine() # Get engine instance
 
@@ -33,12 +43,24 @@ class Command(BaseCommand):
             epochs = options['epochs']
             num_simulations = options['simulations']
 
+            self_play_settings = dict(getattr(settings, 'STOCKZERO_SELF_PLAY', {}))
+            if options['full_search_probability'] is not None:
+                self_play_settings['FULL_SEARCH_PROBABILITY'] = options['full_search_probability']
+            if options['no_resign']:
+                self_play_settings['RESIGN_THRESHOLD'] = None
+
             game_histories = []
+            self_play_stats = self_play.SelfPlayStats()
             start_time = time.time()
             for i in range(num_self_play_games):
                 self.stdout.write(f"Generating self-play game {i+1}/{num_self_play_games}...")
-                game_history = self_play.self_play_game(num_simulations=num_simulations)
-                game_histories.append(game_history)
+                game = self_play.play_self_play_game(num_simulations=num_simulations, game_index=i, num_games=num_self_play_games, settings=self_play_settings)
+                self_play_stats.add(game)
+                game_histories.append(game.history)
+            self_play_summary = self_play_stats.to_dict()
+            self.stdout.write(f"Self-play: {self_play_summary['samples']} samples ({self_play_summary['policy_samples']} with a policy target) from {self_play_summary['games']} games "
+                              f"({self_play_summary['samples_per_cpu_hour']:,.0f} samples per CPU-hour), terminations {self_play_summary['terminations']}, "
+                              f"resignation false positive rate {self_play_summary['resign_false_positive_rate']}")
 
             self.stdout.write("Starting network training...")
             train_network.train_network(policy_value_net, game_histories, optimizer, epochs=epochs)
@@ -54,5 +76,17 @@ class Command(BaseCommand):
             os.makedirs(model_dir, exist_ok=True) # Create models/ directory if it doesn't exist
             model_save_path = os.path.join(model_dir, f"stockzero_model_v{model_version_str}.weights.h5") # Versioned filename in models/
             policy_value_net.save_weights(model_save_path)
+            write_model_metadata(model_save_path, created_at=current_datetime.isoformat(), self_play_games=num_self_play_games, self_play=self_play_summary, epochs=epochs, simulations=num_simulations, network=dict(policy_value_net.config))
             self.stdout.write(self.style.SUCCESS(f"Trained model weights saved to '{model_save_path}' in models/ directory"))
-            self.stdout.write(self.style.SUCCESS("StockZero model training finished."))
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS("StockZero model training finished."))
+
+    @staticmethod
+    def _network_config(options):
+        network_settings = getattr(settings, 'STOCKZERO_NETWORK', {})
+        try:
+            return network_config(options['network'] or network_settings.get('PRESET', 'baseline'),
+                                  num_blocks=options['num_blocks'] or network_settings.get('NUM_BLOCKS'),
+                                  num_filters=options['num_filters'] or network_settings.get('NUM_FILTERS'),
+                                  value_hidden_units=network_settings.get('VALUE_HIDDEN_UNITS'))
+        except ValueError as e:
+            raise CommandError(str(e))
@@ -0,0 +1,33 @@
+"""Gunicorn settings: `gunicorn -c stockzero/gunicorn.conf.py stockzero.wsgi`.
+
+With STOCKZERO_INFERENCE_BACKEND=numpy the app is preloaded: the master maps the shared weights
+(`python manage.py export_shared_weights`) and prewarms the engine before forking, so every worker
+reuses the same physical pages instead of loading its own copy of the model. TensorFlow is not
+fork-safe, so the Keras and TFLite backends keep loading the model in each worker.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', 'unix:/run/stockzero.sock')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = 120 # Deep searches can take a while
+
+preload_app = os.environ.get('STOCKZERO_INFERENCE_BACKEND', 'keras') == 'numpy'
+if preload_app:
+    os.environ['STOCKZERO_PRELOAD'] = 'True' # Prewarm in the foreground, a thread would not survive the fork
+
+# Workers write their metrics here and /metrics/ sums them (engine/instrumentation.py)
+os.environ.setdefault('STOCKZERO_METRICS_DIR', os.path.join(tempfile.gettempdir(), 'stockzero_metrics'))
+
+def on_starting(server):
+    # Snapshots of a previous server run would be added to the new totals
+    for path in glob.glob(os.path.join(os.environ['STOCKZERO_METRICS_DIR'], 'metrics_*.json')):
+        os.remove(path)
+
+def post_fork(server, worker):
+    # Threads started in the preloaded master do not survive the fork
+    from engine import start_model_watcher
+    start_model_watcher()
@@ -91,6 +91,111 @@ CACHES = {
     }
 }
 
+# Server-side game sessions (inference/sessions.py) - kept in process, spilled to the cache above
+STOCKZERO_SESSIONS = {
+    'MAX_IN_PROCESS': 1000, # Sessions (with their search trees) kept in each worker's memory
+    'TIMEOUT': 60 * 60, # Seconds an idle session survives in Redis
+}
+
+# Pondering (inference/inference_engine.py) - search on the user's time between requests
+STOCKZERO_PONDER = {
+    'ENABLED': True,
+    'MAX_SIMULATIONS': 400, # Simulation cap per pondered move
+    'MAX_SECONDS': 10.0, # Wall-clock cap per pondered move
+    'MAX_CONCURRENT': 2, # Ponder threads per worker; extra games simply don't ponder
+}
+
+# Game logging (webapp/chessgame/game_logger.py) - finished games are buffered and bulk-inserted off the request thread
+STOCKZERO_GAME_LOG = {
+    'ASYNC': True, # False writes each game synchronously (useful for tests)
+    'BATCH_SIZE': 50, # Flush as soon as this many games are queued
+    'FLUSH_INTERVAL': 5.0, # Otherwise flush every N seconds
+    'MAX_BUFFER': 10000, # Records kept for retry while the database is unavailable
+}
+
+# Sampled request profiling (webapp/chessgame/views.py) - 0.0 disables it
+STOCKZERO_PROFILING = {
+    'SAMPLE_RATE': 0.0, # Fraction of engine requests to profile, e.g. 0.01
+    'PROFILER': 'cprofile', # 'cprofile' (.prof files) or 'pyinstrument' (HTML, if installed)
+    'OUTPUT_DIR': os.path.join(BASE_DIR, 'logs', 'profiles'),
+}
+
+STOCKZERO_STARTUP = {
+    'PREWARM': os.environ.get('STOCKZERO_PREWARM', 'True') == 'True', # Load the model and run a dummy batch when the app starts
+    'PREWARM_IN_BACKGROUND': os.environ.get('STOCKZERO_PRELOAD', 'False') != 'True', # Don't block startup; /ready/ returns 503 until the model is warm. gunicorn.conf.py sets STOCKZERO_PRELOAD to load in the master before forking
+}
+
+STOCKZERO_EVAL_CACHE = {
+    'EVALUATION_TIMEOUT': 300, # Seconds a network evaluation stays in Redis (keyed by model version and Zobrist hash)
+    'MOVE_TIMEOUT': 300, # Seconds a searched AI move stays in Redis
+    'LOCAL_MAX_ENTRIES': 100000, # In-process LRU size used instead of Redis when running without Django (e.g. UCI)
+}
+
+STOCKZERO_OPENING_CACHE = {
+    'ENABLED': True, # Answer positions searched offline by 'python manage.py build_opening_cache' without searching
+    'PATH': os.path.join(BASE_DIR, 'models', 'opening_cache.npy'),
+}
+
+STOCKZERO_POSITION_STATS = {
+    'ENABLED': False, # Seed searches with visit/value statistics of earlier searches of the same position (per worker)
+    'MAX_ENTRIES': 50000, # Positions kept, least recently used are evicted
+    'SEED_VISITS': 50, # Most virtual visits a search is seeded with
+    'MIN_VISITS': 20, # Searches adding fewer root visits are not recorded
+    'MAX_VISITS': 5000, # Per-position totals decay beyond this, so statistics follow the current model
+    'MAX_MOVES': 16, # Moves kept per position
+    'PATH': None, # e.g. os.path.join(BASE_DIR, 'models', 'position_stats.pkl') to keep statistics across restarts
+}
+
+STOCKZERO_COALESCING = {
+    'ENABLED': True, # Concurrent requests for the same position share one search, in process and across workers
+    'LOCK_TIMEOUT': 30, # Seconds before the search lock of a crashed worker expires
+    'WAIT_TIMEOUT': 10.0, # Longest wait for another request's search before searching ourselves
+    'POLL_INTERVAL': 0.05, # Cache polling period while another worker searches
+}
+
+STOCKZERO_MODEL_REGISTRY = {
+    'WATCH': True, # Poll models/ and swap in new stockzero_model_v<version>.weights.h5 files without a restart
+    'POLL_INTERVAL': 30.0, # Seconds between scans of models/
+    'VERSION': None, # Pin a version (e.g. '2025-01-31'); None serves the newest
+}
+
+STOCKZERO_SELF_PLAY = { # Self-play game generation (training/self_play.py, train_model)
+    'TEMPERATURE': 0.8, # Move selection temperature
+    'FULL_SEARCH_PROBABILITY': 0.25, # Share of moves searched with the full --simulations and given a policy target; 1.0 turns playout-cap randomization off
+    'FAST_SIMULATIONS': None, # Simulations of the other moves (value-only samples), None = simulations // 6
+    'RESIGN_THRESHOLD': -0.9, # Resign when the chosen move's value stays below this; None disables resignation
+    'RESIGN_CONSECUTIVE': 3, # Consecutive moves of one side below the threshold before it resigns
+    'NO_RESIGN_FRACTION': 0.1, # Games played out regardless, to measure the resignation false positive rate
+    'MAX_PLIES': 400, # Longer games are adjudicated a draw
+    'DRAW_THRESHOLD': 0.05, # Draw adjudication once |value| stays below this...
+    'DRAW_CONSECUTIVE': 20, # ...for this many plies...
+    'DRAW_MIN_PLY': 80, # ...after this ply
+}
+
+STOCKZERO_NETWORK = { # Architecture of newly trained models; served models use the one recorded next to their weights
+    'PRESET': os.environ.get('STOCKZERO_NETWORK_PRESET', 'baseline'), # 'baseline', or a residual tier: 'small', 'medium', 'large' (engine/network_config.py)
+    'NUM_BLOCKS': None, # Residual blocks, None keeps the preset's
+    'NUM_FILTERS': None, # Convolution filters, None keeps the preset's
+    'VALUE_HIDDEN_UNITS': None, # Value head MLP width, None keeps the preset's
+}
+
+STOCKZERO_INFERENCE_BACKEND = {
+    'BACKEND': os.environ.get('STOCKZERO_INFERENCE_BACKEND', 'keras'), # 'keras' (float32 TensorFlow), 'tflite' (run 'python manage.py convert_model' first) or 'numpy' (run 'python manage.py export_shared_weights' first)
+    'TFLITE_MODEL': None, # Defaults to models/rl_chess_model.int8.tflite
+    'NUM_THREADS': None, # TFLite interpreter threads, None lets TFLite decide
+    'SHARED_WEIGHTS_DIR': None, # Defaults to models/rl_chess_model.shared/
+}
+
+STOCKZERO_ANALYSE = { # Batch analysis endpoint (/api/chess/analyse/)
+    'MAX_TOTAL_SIMULATIONS': 20000, # len(fens) * num_simulations allowed per request
+    'MAX_TABLE_SIZE': 50000, # Evaluations kept by the request's transposition table (about 0.5 KB each)
+}
+
+STOCKZERO_METRICS = { # Prometheus endpoint (/metrics/)
+    'MULTIPROCESS_DIR': os.environ.get('STOCKZERO_METRICS_DIR'), # Workers share their metrics through snapshot files here (gunicorn.conf.py sets it); None = this process only
+    'TOKEN': os.environ.get('STOCKZERO_METRICS_TOKEN'), # Scrapers send 'Authorization: Bearer <token>'; without it only staff users can read /metrics/
+}
+
 # REST Framework Settings
 REST_FRAMEWORK = {
     'DEFAULT_RENDERER_CLASSES': ['rest_framework.renderers.JSONRenderer', ],
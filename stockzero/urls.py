@@ -1,8 +1,11 @@
 from django.contrib import admin
 from django.urls import path, include
+from webapp.chessgame.views import metrics_view, readiness_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/chess/', include('webapp.chessgame.urls')),
+    path('metrics/', metrics_view, name='metrics'), # Prometheus scrape endpoint
+    path('ready/', readiness_view, name='ready'), # Readiness probe for the load balancer
     path('', include('webapp.frontend.urls')),
 ]
\ No newline at end of file
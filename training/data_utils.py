@@ -1,4 +1,13 @@
+import io
+import os
 import pickle
+import chess
+import chess.pgn
+import numpy as np
+from engine.utils import move_to_index, unpack_moves, NUM_POSSIBLE_MOVES
+
+TRAINING_DATA_DIR = os.path.join(os.path.dirname(__file__), 'training_data') # Directory for training data
+RESULT_VALUES = {'1-0': 1, '0-1': -1, '1/2-1/2': 0} # Game result from White's point of view
 
 def save_training_data(game_histories, filename="self_play_games.pkl"):
     """Saves game histories to a pickle file."""
@@ -17,6 +26,37 @@ def load_training_data(filename="self_play_games.pkl"):
         print(f"Error: Training data file not found: {filename}")
         return []
 
+def game_record_to_history(record):
+    """Converts one logged game into training positions: (fen, one-hot policy target, value target).
+
+    `record` is a plain `(initial_fen, packed_moves, pgn_content, result)` tuple so it can be sent to a
+    process pool. The policy target is the move actually played and the value target is the game
+    result from the point of view of the side to move. Games without a decisive or drawn result
+    yield no positions.
+    """
+    initial_fen, packed_moves, pgn_content, result = record
+    if pgn_content: # Legacy rows only have PGN text
+        game_pgn = chess.pgn.read_game(io.StringIO(pgn_content))
+        if game_pgn is None:
+            return []
+        board = game_pgn.board()
+        moves = list(game_pgn.mainline_moves())
+        result = result or game_pgn.headers.get("Result", "*")
+    else:
+        board = chess.Board(fen=initial_fen or chess.STARTING_FEN)
+        moves = unpack_moves(packed_moves)
+    if result not in RESULT_VALUES:
+        return []
+    white_value = RESULT_VALUES[result]
+
+    game_history = []
+    for move in moves:
+        policy_target = np.zeros(NUM_POSSIBLE_MOVES, dtype=np.float32)
+        policy_target[move_to_index(move)] = 1.0
+        game_history.append((board.fen(), policy_target, white_value if board.turn == chess.WHITE else -white_value))
+        board.push(move)
+    return game_history
+
 if __name__ == "__main__":
     # Example usage (for testing data saving/loading)
     example_data = [("fen1", [0.1, 0.9], 1), ("fen2", [0.5, 0.5], -1)] # Dummy data
@@ -1,63 +1,189 @@
 import chess
+import chess.pgn
 import numpy as np
+import random
 import time
 import logging # Import logging
 import os # Import os for file paths
-from engine import get_stockzero_engine, get_game_result_value # Ensure correct relative import
+from engine import get_stockzero_engine # Ensure correct relative import
+from engine.mcts import MCTSNode, advance_tree, choose_best_move_from_mcts, run_simulations
 from engine.utils import move_to_index, NUM_POSSIBLE_MOVES # Ensure correct relative import
-from .data_utils import save_training_data # Import data saving utility
+from .data_utils import RESULT_VALUES, save_training_data # Import data saving utility
 
 logger = logging.getLogger('training') # Get training logger
 
 SELF_PLAY_DATA_DIR = os.path.join(os.path.dirname(__file__), 'self_play_data') # Directory for self-play data
 os.makedirs(SELF_PLAY_DATA_DIR, exist_ok=True) # Create directory if it doesn't exist
 
-def self_play_game(num_simulations, game_index):
-    game_history = []
+DEFAULT_SELF_PLAY_SETTINGS = { # Overridden by STOCKZERO_SELF_PLAY in settings.py (see train_model)
+    'TEMPERATURE': 0.8, # Move selection temperature (exploration)
+    'FULL_SEARCH_PROBABILITY': 0.25, # Playout-cap randomization: share of moves searched in full and recorded with a policy target (1.0 = off)
+    'FAST_SIMULATIONS': None, # Simulations of the other moves (value-only samples), None = num_simulations // 6
+    'RESIGN_THRESHOLD': -0.9, # Resign when the chosen move's value stays below this, None disables resignation
+    'RESIGN_CONSECUTIVE': 3, # ...for this many consecutive moves of the same side
+    'NO_RESIGN_FRACTION': 0.1, # Games played out anyway to measure how often resigning would have been wrong
+    'MAX_PLIES': 400, # Games still running are adjudicated a draw
+    'DRAW_THRESHOLD': 0.05, # Adjudicate a draw when |value| stays below this...
+    'DRAW_CONSECUTIVE': 20, # ...for this many consecutive plies...
+    'DRAW_MIN_PLY': 80, # ...once the game is at least this long
+}
+
+class SelfPlayGame:
+    """Outcome of one self-play game: the recorded samples and what it cost to produce them."""
+
+    def __init__(self):
+        self.history = [] # (fen, policy target, value target); the policy target is all zeros for fast-searched positions
+        self.result = None
+        self.termination = None
+        self.plies = 0
+        self.simulations = 0
+        self.full_searches = 0
+        self.resign_enabled = True
+        self.would_resign = None # Side that met the resignation condition in a no-resign game
+        self.cpu_seconds = 0.0
+
+    @property
+    def resign_false_positive(self):
+        """In a no-resign game, whether the side that would have resigned still avoided losing (None if it never would have)."""
+        if self.would_resign is None:
+            return None
+        loser = {'1-0': chess.BLACK, '0-1': chess.WHITE}.get(self.result)
+        return loser != self.would_resign
+
+class SelfPlayStats:
+    """Totals over several games: samples per CPU-hour and the measured resignation false positive rate."""
+
+    def __init__(self):
+        self.games = 0
+        self.samples = 0
+        self.policy_samples = 0 # Samples with a policy target (fully searched)
+        self.plies = 0
+        self.simulations = 0
+        self.cpu_seconds = 0.0
+        self.terminations = {}
+        self.resign_checks = 0
+        self.resign_false_positives = 0
+
+    def add(self, game):
+        self.games += 1
+        self.samples += len(game.history)
+        self.policy_samples += game.full_searches
+        self.plies += game.plies
+        self.simulations += game.simulations
+        self.cpu_seconds += game.cpu_seconds
+        self.terminations[game.termination] = self.terminations.get(game.termination, 0) + 1
+        if game.resign_false_positive is not None:
+            self.resign_checks += 1
+            self.resign_false_positives += game.resign_false_positive
+
+    def to_dict(self):
+        return {
+            'games': self.games, 'samples': self.samples, 'plies': self.plies, 'simulations': self.simulations,
+            'samples_per_cpu_hour': self.samples / self.cpu_seconds * 3600 if self.cpu_seconds else 0.0,
+            'samples_per_simulation': self.samples / self.simulations if self.simulations else 0.0,
+            'policy_samples': self.policy_samples,
+            'policy_samples_per_simulation': self.policy_samples / self.simulations if self.simulations else 0.0,
+            'terminations': dict(self.terminations),
+            'resign_false_positive_rate': self.resign_false_positives / self.resign_checks if self.resign_checks else None,
+        }
+
+def play_self_play_game(num_simulations, game_index=0, num_games=None, settings=None, policy_value_net=None, save_pgn=True):
+    """Plays one self-play game and returns a `SelfPlayGame`.
+
+    With playout-cap randomization only a random share of the moves gets the full `num_simulations`
+    search and a policy target; the others use a cheap search and are recorded as value-only samples
+    (an all-zero policy target, which `train_step` leaves out of the policy loss). The search tree is
+    kept between moves and visits already in it count towards either budget, so a cheap search after
+    a full one is often free. Games end early by resignation (except a
+    `NO_RESIGN_FRACTION` of them, which check that resigning was right), by draw adjudication on a
+    flat value, or at `MAX_PLIES`.
+    """
+    settings = dict(DEFAULT_SELF_PLAY_SETTINGS, **(settings or {}))
+    if policy_value_net is None:
+        policy_value_net = get_stockzero_engine().policy_value_net # Get trained engine instance
+    fast_simulations = max(2, settings['FAST_SIMULATIONS'] or num_simulations // 6) # The first simulation only expands the root
+    game = SelfPlayGame()
+    game.resign_enabled = settings['RESIGN_THRESHOLD'] is not None and random.random() >= settings['NO_RESIGN_FRACTION']
     board = chess.Board()
-    engine = get_stockzero_engine() # Get trained engine instance
     game_pgn = chess.pgn.Game() # Initialize PGN game for self-play record
     game_pgn.headers["Event"] = "StockZero Self-Play Game"
-    game_pgn.headers["Round"] = game_index + 1 # Game number in training run
-    game_pgn.setup(board.fen())
-    node = game_pgn.end()
+    game_pgn.headers["Round"] = str(game_index + 1) # Game number in training run
+    node = game_pgn
+
+    game_label = f"{game_index + 1}/{num_games}" if num_games else f"{game_index + 1}"
+    logger.info(f"Starting self-play game {game_label}...")
+    start_time, start_cpu = time.time(), time.process_time()
+    samples = [] # (fen, policy target, side to move)
+    low_value_moves = {chess.WHITE: 0, chess.BLACK: 0}
+    flat_plies = 0
+    root_node = None
+
+    while True:
+        outcome = board.outcome() # Checkmate, stalemate, insufficient material, 75 moves, fivefold
+        if outcome is not None:
+            game.result, game.termination = outcome.result(), outcome.termination.name.lower()
+            break
+        if board.is_repetition(3) or board.halfmove_clock >= 100: # Claimable draws end self-play games right away
+            game.result, game.termination = "1/2-1/2", 'claimed_draw'
+            break
+        if board.ply() >= settings['MAX_PLIES']:
+            game.result, game.termination = "1/2-1/2", 'max_plies'
+            break
 
-    logger.info(f"Starting self-play game {game_index + 1}/{num_self_play_games}...")
-    start_time = time.time()
+        full_search = random.random() < settings['FULL_SEARCH_PROBABILITY']
+        if root_node is None:
+            root_node = MCTSNode(board)
+        budget = num_simulations if full_search else fast_simulations
+        game.simulations += run_simulations(root_node, policy_value_net, max(budget - root_node.visits, 0 if root_node.children else 1)) # Reused subtree visits count
+        if full_search:
+            game.full_searches += 1
+            samples.append((board.fen(), create_policy_targets_from_mcts_visits(root_node), board.turn))
+        else: # Too few visits for a policy target, but the game result is still a value target
+            samples.append((board.fen(), np.zeros(NUM_POSSIBLE_MOVES, dtype=np.float32), board.turn))
 
-    while not board.is_game_over():
-        root_node = engine.rl_agent.MCTSNode(board) # Access MCTSNode via engine
-        engine.rl_agent.run_mcts(root_node, engine.policy_value_net, num_simulations) # Run MCTS
+        best_move = choose_best_move_from_mcts(root_node, temperature=settings['TEMPERATURE']) # Exploration temp
+        best_child = max(root_node.children.values(), key=lambda child: child.visits)
+        value = -best_child.value_sum / best_child.visits # Value of the most visited move for the side to move, as RLEngine.analyse reports it
 
-        policy_targets = create_policy_targets_from_mcts_visits(root_node) # Function to create policy targets from visits
-        game_history.append((board.fen(), policy_targets))
+        if settings['RESIGN_THRESHOLD'] is not None:
+            low_value_moves[board.turn] = low_value_moves[board.turn] + 1 if value < settings['RESIGN_THRESHOLD'] else 0
+            if low_value_moves[board.turn] >= settings['RESIGN_CONSECUTIVE']:
+                if game.resign_enabled:
+                    game.result, game.termination = ("0-1" if board.turn == chess.WHITE else "1-0"), 'resignation'
+                    break
+                if game.would_resign is None:
+                    game.would_resign = board.turn
+        flat_plies = flat_plies + 1 if abs(value) < settings['DRAW_THRESHOLD'] else 0
+        if board.ply() >= settings['DRAW_MIN_PLY'] and flat_plies >= settings['DRAW_CONSECUTIVE']:
+            game.result, game.termination = "1/2-1/2", 'draw_adjudication'
+            break
 
-        best_move = engine.rl_agent.choose_best_move_from_mcts(root_node, temperature=0.8) # Exploration temp
         node = node.add_variation(best_move) # Add move to PGN tree
         board.push(best_move)
+        root_node = advance_tree(root_node, best_move)
 
-    game_result = get_game_result_value(board)
-    game_pgn.headers["Result"] = board.result() # Set game result in PGN
-    game_pgn.headers["Termination"] = board.outcome(claim_draw=True).termination.name # Add termination reason
-    game_pgn.headers["PlyCount"] = board.ply() # Add ply count
-    game_pgn.headers["AI-Engine"] = "StockZero" # Add engine info
-
-    # Add game result to history as value targets
-    for i in range(len(game_history)):
-        fen, policy_target = game_history[i]
-        game_history[i] = (fen, policy_target, game_result if board.turn == chess.WHITE else -game_result)
+    white_value = RESULT_VALUES[game.result]
+    game.history = [(fen, policy_target, white_value if turn == chess.WHITE else -white_value) for fen, policy_target, turn in samples] # Side to move's point of view
+    game.plies = board.ply()
+    game.cpu_seconds = time.process_time() - start_cpu
 
-    end_time = time.time()
-    game_time = end_time - start_time
-    logger.info(f"Self-play game {game_index + 1}/{num_self_play_games} finished in {game_time:.2f} seconds, Result: {board.result()}, Termination: {board.outcome(claim_draw=True).termination.name}, PlyCount: {board.ply()}")
+    game_pgn.headers["Result"] = game.result # Set game result in PGN
+    game_pgn.headers["Termination"] = game.termination # Add termination reason
+    game_pgn.headers["PlyCount"] = str(game.plies) # Add ply count
+    game_pgn.headers["AI-Engine"] = "StockZero" # Add engine info
+    logger.info(f"Self-play game {game_label} finished in {time.time() - start_time:.2f} seconds, Result: {game.result}, Termination: {game.termination}, "
+                f"PlyCount: {game.plies}, Samples: {len(game.history)}, Simulations: {game.simulations}")
 
-    # Save PGN to a file (optional, for analysis)
-    pgn_filename = os.path.join(SELF_PLAY_DATA_DIR, f"self_play_game_{game_index + 1}.pgn")
-    with open(pgn_filename, "w") as pgn_file:
-        pgn_file.write(game_pgn.export(as_str=True))
-    logger.info(f"PGN saved to: {pgn_filename}")
+    if save_pgn: # Save PGN to a file (optional, for analysis)
+        pgn_filename = os.path.join(SELF_PLAY_DATA_DIR, f"self_play_game_{game_index + 1}.pgn")
+        with open(pgn_filename, "w") as pgn_file:
+            pgn_file.write(str(game_pgn))
+        logger.info(f"PGN saved to: {pgn_filename}")
+    return game
 
-    return game_history
+def self_play_game(num_simulations, game_index=0, num_games=None, settings=None, policy_value_net=None):
+    """Plays one self-play game and returns its training samples `[(fen, policy target, value target)]`."""
+    return play_self_play_game(num_simulations, game_index, num_games, settings, policy_value_net).history
 
 def create_policy_targets_from_mcts_visits(root_node):
     """Creates policy target vector from MCTS visit counts (moved from views to training utils)."""
@@ -72,10 +198,12 @@ if __name__ == "__main__":
     # Example usage (for testing self-play generation)
     num_self_play_games = 2 # Example number of games for testing
     all_game_histories = []
+    self_play_stats = SelfPlayStats()
     for i in range(num_self_play_games):
-        game_history = self_play_game(num_simulations=50, game_index=i)
-        all_game_histories.append(game_history)
+        game = play_self_play_game(num_simulations=50, game_index=i, num_games=num_self_play_games)
+        self_play_stats.add(game)
+        all_game_histories.append(game.history)
 
     # Example: Save game histories to files (using data_utils)
     save_training_data(all_game_histories, filename=os.path.join(SELF_PLAY_DATA_DIR, "example_self_play_games.pkl"))
-    print(f"Generated {num_self_play_games} self-play games and saved example data.")
\ No newline at end of file
+    print(f"Generated {num_self_play_games} self-play games and saved example data: {self_play_stats.to_dict()}")
@@ -4,19 +4,22 @@ import time
 import logging # Import logging
 import os # Import os for file paths
 from engine import get_stockzero_engine, board_to_input, NUM_POSSIBLE_MOVES # Ensure correct relative import
-from .data_utils import load_training_data, save_training_data # Ensure correct relative import
+from engine.registry import write_model_metadata
+from .data_utils import load_training_data, save_training_data, TRAINING_DATA_DIR # Ensure correct relative import
 
 logger = logging.getLogger('training') # Get training logger
 
-TRAINING_DATA_DIR = os.path.join(os.path.dirname(__file__), 'training_data') # Directory for training data
 os.makedirs(TRAINING_DATA_DIR, exist_ok=True) # Create directory if it doesn't exist
 CHECKPOINT_DIR = os.path.join(os.path.dirname(__file__), 'checkpoints') # Directory for checkpoints
 os.makedirs(CHECKPOINT_DIR, exist_ok=True) # Create directory if it doesn't exist
 
 def train_step(model, board_inputs, policy_targets, value_targets, optimizer):
+    """One optimizer step; rows with an all-zero policy target (value-only samples) are left out of the policy loss."""
     with tf.GradientTape() as tape:
-        policy_outputs, value_outputs = model(board_inputs)
-        policy_loss = tf.keras.losses.CategoricalCrossentropy()(policy_targets, policy_outputs)
+        policy_outputs, value_outputs = model(board_inputs, training=True) # Batch norm uses batch statistics
+        policy_weights = tf.reduce_sum(policy_targets, axis=-1) # 1 with a policy target, 0 without
+        policy_losses = tf.keras.losses.categorical_crossentropy(policy_targets, policy_outputs)
+        policy_loss = tf.reduce_sum(policy_losses * policy_weights) / tf.maximum(tf.reduce_sum(policy_weights), 1.0)
         value_loss = tf.keras.losses.MeanSquaredError()(value_targets, value_outputs)
         total_loss = policy_loss + value_loss
     gradients = tape.gradient(total_loss, model.trainable_variables)
@@ -61,8 +64,9 @@ def train_network(model, game_histories, optimizer, epochs=10, batch_size=32, ch
 
 if __name__ == "__main__":
     # --- Training Script Execution ---
-    from engine.model import PolicyValueNetwork # Correct relative import
-    policy_value_net = PolicyValueNetwork(NUM_POSSIBLE_MOVES)
+    from engine.model import build_policy_value_net # Correct relative import
+    from engine.network_config import network_config
+    policy_value_net = build_policy_value_net(NUM_POSSIBLE_MOVES, network_config(os.environ.get('STOCKZERO_NETWORK_PRESET', 'baseline')))
     optimizer = tf.keras.optimizers.Adam(learning_rate=0.001)
 
     # --- Load game histories from file (for example) ---
@@ -87,5 +91,6 @@ if __name__ == "__main__":
         os.makedirs(model_dir, exist_ok=True) # Create models/ directory if it doesn't exist
         model_save_path = os.path.join(model_dir, f"stockzero_model_v{model_version_str}.weights.h5") # Versioned filename in models/
         policy_value_net.save_weights(model_save_path)
+        write_model_metadata(model_save_path, created_at=current_datetime.isoformat(), training_games=len(game_histories), epochs=10, batch_size=32, network=dict(policy_value_net.config))
         logger.info(f"Trained model weights saved to '{model_save_path}'")
         logger.info("Training finished.")
\ No newline at end of file
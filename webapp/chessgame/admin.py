@@ -3,17 +3,21 @@ from .models import GameRecord
 
 @admin.register(GameRecord)
 class GameRecordAdmin(admin.ModelAdmin):
-    list_display = ('timestamp', 'result', 'ai_player_color', 'user') # Display more relevant fields in list view
+    list_display = ('timestamp', 'result', 'ai_player_color', 'ply_count', 'user') # Display more relevant fields in list view
     list_filter = ('timestamp', 'ai_player_color', 'result') # Add filters for easier searching
-    search_fields = ('pgn_content', 'result', 'user__username', 'user__email') # Searchable fields
-    readonly_fields = ('timestamp', 'pgn_content') # Make PGN content and timestamp read-only in admin
+    search_fields = ('result', 'user__username', 'user__email') # Searchable fields
+    readonly_fields = ('timestamp', 'ply_count', 'rendered_pgn') # Make PGN content and timestamp read-only in admin
 
     fieldsets = ( # Organize fields in admin edit form
         ('Game Information', {
-            'fields': ('timestamp', 'result', 'ai_player_color', 'user')
+            'fields': ('timestamp', 'result', 'ai_player_color', 'ply_count', 'user')
         }),
         ('PGN Content', {
-            'fields': ('pgn_content',),
+            'fields': ('rendered_pgn',),
             'classes': ('collapse',), # Collapse PGN content by default for cleaner view
         }),
-    )
\ No newline at end of file
+    )
+
+    @admin.display(description="PGN")
+    def rendered_pgn(self, obj):
+        return obj.to_pgn() # Rendered from the packed moves on demand
@@ -1,9 +1,37 @@
+import os
+import sys
+import threading
 from django.apps import AppConfig
+from django.conf import settings
 
 class ChessgameConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'webapp.chessgame'
 
     def ready(self):
-        from engine import load_chess_engine
-        load_chess_engine()
\ No newline at end of file
+        startup_settings = getattr(settings, 'STOCKZERO_STARTUP', {})
+        if self._is_management_command():
+            return # The model is loaded lazily, only if the command needs it
+        from engine import prewarm_engine, engine_status, start_model_watcher
+        if os.environ.get('STOCKZERO_PRELOAD') != 'True': # Preloaded gunicorn masters start it in post_fork instead
+            start_model_watcher() # Swaps in new model versions written to models/ without a restart
+        if not startup_settings.get('PREWARM', True):
+            engine_status['ready'] = True # Lazy mode: the first engine request loads the model
+            return
+        if startup_settings.get('PREWARM_IN_BACKGROUND', True):
+            # Serve traditional-engine, admin and readiness requests while the model loads
+            threading.Thread(target=self._prewarm_quietly, args=(prewarm_engine,), name="stockzero-prewarm", daemon=True).start()
+        else:
+            prewarm_engine()
+
+    @staticmethod
+    def _prewarm_quietly(prewarm_engine):
+        try:
+            prewarm_engine()
+        except Exception:
+            pass # Logged and reported by the readiness endpoint
+
+    @staticmethod
+    def _is_management_command():
+        """True for `manage.py` commands other than runserver (migrate, shell, export_training_data...)."""
+        return sys.argv[0].endswith('manage.py') and len(sys.argv) > 1 and sys.argv[1] != 'runserver'
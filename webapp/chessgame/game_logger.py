@@ -0,0 +1,92 @@
+import atexit
+import logging
+import queue
+import threading
+from django.conf import settings
+from django.db import close_old_connections
+from .models import GameRecord
+
+logger = logging.getLogger('webapp') # Get webapp logger
+
+GAME_LOG_SETTINGS = getattr(settings, 'STOCKZERO_GAME_LOG', {})
+
+class GameLogBuffer:
+    """Buffers finished games and writes them with `bulk_create` from a background thread.
+
+    Request threads only enqueue an unsaved `GameRecord`, so they never wait on the database.
+    A batch is written once `batch_size` records are queued or `flush_interval` seconds have passed.
+    Failed batches are retried on the next flush, keeping at most `max_buffer` records.
+    """
+
+    def __init__(self, batch_size=50, flush_interval=5.0, max_buffer=10000, use_thread=True):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.use_thread = use_thread
+        self._queue = queue.Queue()
+        self._pending = [] # Records taken off the queue but not yet written
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event() # Set when a full batch is waiting
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+    def log(self, game_record):
+        if not self.use_thread: # Synchronous mode, e.g. for tests
+            self._queue.put(game_record)
+            self.flush()
+            return
+        self._ensure_thread()
+        self._queue.put(game_record)
+        if self._queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+
+    def _ensure_thread(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stockzero-game-log", daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered record; safe to call from any thread."""
+        with self._flush_lock:
+            while True:
+                try:
+                    self._pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._pending:
+                return 0
+            batch = self._pending
+            try:
+                close_old_connections()
+                GameRecord.objects.bulk_create(batch, batch_size=self.batch_size)
+            except Exception:
+                logger.exception(f"Failed to write {len(batch)} game records, will retry") # Keep records for the next flush
+                if len(batch) > self.max_buffer:
+                    logger.error(f"Game log buffer full, dropping {len(batch) - self.max_buffer} oldest records")
+                    del batch[:len(batch) - self.max_buffer]
+                return 0
+            self._pending = []
+            logger.info(f"Game log flushed {len(batch)} game records to database")
+            return len(batch)
+
+game_log_buffer = GameLogBuffer(
+    batch_size=GAME_LOG_SETTINGS.get('BATCH_SIZE', 50),
+    flush_interval=GAME_LOG_SETTINGS.get('FLUSH_INTERVAL', 5.0),
+    max_buffer=GAME_LOG_SETTINGS.get('MAX_BUFFER', 10000),
+    use_thread=GAME_LOG_SETTINGS.get('ASYNC', True),
+)
+
+def log_game(board, result, ai_player_color, user=None):
+    """Queues a finished game (the board's move stack) for batched writing."""
+    user_id = user.pk if user is not None and user.is_authenticated else None # Resolve lazy user in the request thread
+    game_log_buffer.log(GameRecord.from_board(board, result, ai_player_color, user_id=user_id))
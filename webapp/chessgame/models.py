@@ -1,17 +1,59 @@
+import chess
+import chess.pgn
 from django.db import models
 from django.conf import settings # Import settings for user model
+from engine.utils import pack_moves, unpack_moves
 
 class GameRecord(models.Model):
-    pgn_content = models.TextField(help_text="PGN format of the chess game")
+    pgn_content = models.TextField(blank=True, help_text="PGN format of the chess game (legacy records only, new records store packed moves)")
+    initial_fen = models.CharField(max_length=100, blank=True, help_text="Starting position if not the standard one")
+    moves = models.BinaryField(default=b'', help_text="Packed move list, 2 bytes per move (see pack_moves)")
+    ply_count = models.PositiveSmallIntegerField(default=0, help_text="Number of half-moves played")
     timestamp = models.DateTimeField(auto_now_add=True, help_text="Timestamp when the game record was created")
     result = models.CharField(max_length=10, blank=True, help_text="Result of the game (e.g., 1-0, 0-1, 1/2-1/2)") # Store result explicitly
-    ai_player_color = models.CharField(max_length=10, blank=True, help_text="Color played by AI (White or Black)") # Store AI color
+    ai_player_color = models.CharField(max_length=20, blank=True, help_text="Color played by AI (White or Black)") # Store AI color
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, help_text="User who played the game (optional)") # Link to User model if user authentication is added
 
     def __str__(self):
         return f"Game recorded on {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
 
+    @classmethod
+    def from_board(cls, board, result, ai_player_color, user_id=None):
+        """Builds an unsaved record from a board whose move stack holds the whole game."""
+        root_fen = board.root().fen()
+        return cls(
+            initial_fen='' if root_fen == chess.STARTING_FEN else root_fen,
+            moves=pack_moves(board.move_stack),
+            ply_count=len(board.move_stack),
+            result=result,
+            ai_player_color=ai_player_color,
+            user_id=user_id,
+        )
+
+    def get_moves(self):
+        return unpack_moves(bytes(self.moves))
+
+    def to_pgn(self):
+        """Renders the game as PGN text; only done on export, not when the game is logged."""
+        if self.pgn_content:
+            return self.pgn_content
+        board = chess.Board(fen=self.initial_fen or chess.STARTING_FEN)
+        for move in self.get_moves():
+            board.push(move)
+        game_pgn = chess.pgn.Game.from_board(board)
+        game_pgn.headers["Event"] = "StockZero Chess Game"
+        if self.timestamp:
+            game_pgn.headers["Date"] = self.timestamp.strftime("%Y.%m.%d")
+        game_pgn.headers["Result"] = self.result or board.result(claim_draw=True)
+        game_pgn.headers["AI"] = f"StockZero Engine ({self.ai_player_color})"
+        return str(game_pgn)
+
     class Meta:
         verbose_name = "Game Record"
         verbose_name_plural = "Game Records"
-        ordering = ['-timestamp'] # Order by most recent first
\ No newline at end of file
+        ordering = ['-timestamp'] # Order by most recent first
+        indexes = [
+            models.Index(fields=['-timestamp'], name='gamerecord_timestamp_idx'),
+            models.Index(fields=['user', '-timestamp'], name='gamerecord_user_idx'),
+            models.Index(fields=['result'], name='gamerecord_result_idx'),
+        ]
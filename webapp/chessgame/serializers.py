@@ -1,12 +1,55 @@
+import chess
+from django.conf import settings
 from rest_framework import serializers
 
+ANALYSE_SETTINGS = getattr(settings, 'STOCKZERO_ANALYSE', {})
+
 class MakeMoveRequestSerializer(serializers.Serializer):
     move = serializers.CharField()
-    fen = serializers.CharField()
+    fen = serializers.CharField(required=False) # Only needed to start a game without a session
+    session_id = serializers.CharField(required=False) # Server-side game session from a previous response
+
+    def validate(self, data):
+        if 'fen' not in data and 'session_id' not in data:
+            raise serializers.ValidationError("Either 'fen' or 'session_id' is required.")
+        return data
 
 class MakeMoveResponseSerializer(serializers.Serializer):
     ai_move = serializers.CharField(required=False, allow_null=True)
-    next_fen = serializers.CharField()
-    game_over = serializers.BooleanField()
+    next_fen = serializers.CharField(required=False) # Absent on error responses
+    game_over = serializers.BooleanField(required=False)
     result = serializers.CharField(required=False, allow_null=True)
-    error = serializers.CharField(required=False, allow_null=True)
\ No newline at end of file
+    error = serializers.CharField(required=False, allow_null=True)
+    session_id = serializers.CharField(required=False, allow_null=True)
+
+class AnalyseRequestSerializer(serializers.Serializer):
+    fens = serializers.ListField(child=serializers.CharField(), min_length=1, max_length=200)
+    top_k = serializers.IntegerField(required=False, default=3, min_value=1, max_value=20)
+    num_simulations = serializers.IntegerField(required=False, default=100, min_value=1, max_value=800)
+
+    def validate_fens(self, fens):
+        for fen in fens:
+            try:
+                board = chess.Board(fen=fen)
+            except ValueError:
+                raise serializers.ValidationError(f"Invalid FEN: {fen}")
+            if not board.is_valid(): # E.g. missing kings or the side not to move in check
+                raise serializers.ValidationError(f"Illegal position: {fen}")
+        return fens
+
+    def validate(self, data):
+        max_total_simulations = ANALYSE_SETTINGS.get('MAX_TOTAL_SIMULATIONS', 20000)
+        if len(data['fens']) * data['num_simulations'] > max_total_simulations: # Bounds the work and memory of one synchronous request
+            raise serializers.ValidationError(f"len(fens) * num_simulations must not exceed {max_total_simulations}.")
+        return data
+
+class AnalysedMoveSerializer(serializers.Serializer):
+    move = serializers.CharField()
+    visits = serializers.IntegerField()
+    q = serializers.FloatField(allow_null=True)
+    prior = serializers.FloatField()
+
+class PositionAnalysisSerializer(serializers.Serializer):
+    fen = serializers.CharField()
+    value = serializers.FloatField(allow_null=True)
+    moves = AnalysedMoveSerializer(many=True)
@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('make_move/', views.make_move_api, name='make_move_api'), # RL-based engine API
     path('make_traditional_move/', views.make_traditional_move_api, name='make_traditional_move_api'), # Traditional engine API
+    path('analyse/', views.analyse_positions_api, name='analyse_positions_api'), # Batch multi-PV analysis API
 ]
\ No newline at end of file
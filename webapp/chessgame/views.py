@@ -3,82 +3,110 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
 import chess
+import functools
+import hmac
 import logging
-from inference import get_optimized_ai_move
+import time
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from inference import get_optimized_ai_move, analyse_positions, start_pondering
 from engine.traditional_engine import call_AI as call_traditional_ai
-from .serializers import MakeMoveRequestSerializer, MakeMoveResponseSerializer
-from .models import GameRecord
+from engine import engine_status
+from engine.instrumentation import record_search, observe_request, render_metrics, write_metrics_snapshot, maybe_profile
+from .serializers import MakeMoveRequestSerializer, MakeMoveResponseSerializer, AnalyseRequestSerializer, PositionAnalysisSerializer
+from .game_logger import log_game
+from inference.sessions import session_store
 
 logger = logging.getLogger('webapp') # Get webapp logger
 
+PROFILING_SETTINGS = getattr(settings, 'STOCKZERO_PROFILING', {})
+METRICS_SETTINGS = getattr(settings, 'STOCKZERO_METRICS', {})
+
+def instrumented(endpoint):
+    """Records search statistics for the wrapped view into the metrics histograms, profiling a sampled fraction of calls."""
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            start_time = time.perf_counter()
+            with record_search() as stats, maybe_profile(endpoint, sample_rate=PROFILING_SETTINGS.get('SAMPLE_RATE', 0.0),
+                                                         profiler=PROFILING_SETTINGS.get('PROFILER', 'cprofile'),
+                                                         output_dir=PROFILING_SETTINGS.get('OUTPUT_DIR')):
+                response = view_func(request, *args, **kwargs)
+            observe_request(endpoint, stats, time.perf_counter() - start_time)
+            if METRICS_SETTINGS.get('MULTIPROCESS_DIR'):
+                try:
+                    write_metrics_snapshot(METRICS_SETTINGS['MULTIPROCESS_DIR'])
+                except OSError as e:
+                    logger.warning(f"Could not write the metrics snapshot: {e}")
+            return response
+        return wrapper
+    return decorator
+
 @api_view(['POST'])
 @throttle_classes([AnonRateThrottle, UserRateThrottle]) # Apply rate limiting
+@instrumented('make_move')
 def make_move_api(request):
-    """API endpoint to handle user moves and get optimized AI response, records game in PGN, production ready."""
+    """API endpoint to handle user moves and get optimized AI response, records game in PGN, production ready.
+
+    Games live in a server-side session: the first request sends the starting `fen`, later
+    requests send only the `move` and the `session_id` returned by the previous response.
+    """
     serializer = MakeMoveRequestSerializer(data=request.data)
     if not serializer.is_valid():
         logger.warning(f"Invalid make_move request data: {serializer.errors}") # Log invalid request data
         return Response(MakeMoveResponseSerializer({'error': serializer.errors}).data, status=status.HTTP_400_BAD_REQUEST)
 
     user_move_uci = serializer.validated_data['move']
-    current_fen = serializer.validated_data['fen']
-
-    board = chess.Board(fen=current_fen)
-    game_pgn = chess.pgn.Game() # Initialize PGN game for this session
-    game_pgn.headers["Event"] = "StockZero Chess Game"
-    game_pgn.setup(board.fen())
-    node = game_pgn.end() # Start PGN at current board position
-    ai_player_color = "Black" if board.turn == chess.WHITE else "White" # Determine AI's color based on turn
-
-    try:
-        user_move = chess.Move.from_uci(user_move_uci)
-        if user_move not in board.legal_moves:
-            logger.warning(f"Illegal move attempted: {user_move_uci}, FEN: {current_fen}") # Log illegal move attempts
-            return Response(MakeMoveResponseSerializer({'error': 'Illegal move'}).data, status=status.HTTP_400_BAD_REQUEST)
-
-        node = node.add_variation(user_move, comment="User Move") # Add user move to PGN with comment
-        board.push(user_move)
-
-        if board.is_game_over():
-            game_pgn.headers["Result"] = board.result() # Set game result in PGN
-            game_pgn.headers["AI"] = f"StockZero Engine ({ai_player_color})" # Add AI engine info
-            game_record = GameRecord.objects.create(
-                pgn_content=game_pgn.export(as_str=True),
-                result=board.result(),
-                ai_player_color=ai_player_color,
-                user=request.user if request.user.is_authenticated else None # Associate with user if authenticated
-            )
-            logger.info(f"Game over - Recorded PGN to database, Game ID: {game_record.id}, Result: {board.result()}") # Log game completion
-            response_data = {'game_over': True, 'result': board.result(), 'next_fen': board.fen()}
+    session_id = serializer.validated_data.get('session_id')
+    current_fen = serializer.validated_data.get('fen')
+
+    session = session_store.get(session_id) if session_id else None
+    if session is None:
+        if current_fen is None:
+            logger.warning(f"Unknown or expired game session: {session_id}") # Log expired sessions
+            return Response(MakeMoveResponseSerializer({'error': 'Unknown or expired game session'}).data, status=status.HTTP_404_NOT_FOUND)
+        session = session_store.create(initial_fen=current_fen)
+
+    with session.lock:
+        board = session.board
+        try:
+            user_move = chess.Move.from_uci(user_move_uci)
+            if user_move not in board.legal_moves:
+                logger.warning(f"Illegal move attempted: {user_move_uci}, FEN: {board.fen()}, Session: {session.session_id}") # Log illegal move attempts
+                return Response(MakeMoveResponseSerializer({'error': 'Illegal move'}).data, status=status.HTTP_400_BAD_REQUEST)
+
+            session.push(user_move)
+
+            if board.is_game_over(claim_draw=True): # Session history makes threefold repetition detectable
+                return _finish_session_game(request, session)
+
+            ai_move_uci = get_optimized_ai_move(board.fen(), num_simulations=100, session=session)
+            session.push(chess.Move.from_uci(ai_move_uci))
+
+            if board.is_game_over(claim_draw=True):
+                return _finish_session_game(request, session, ai_move_uci)
+
+            session_store.save(session)
+            start_pondering(session) # Search the user's likely replies while they think
+            response_data = {'ai_move': ai_move_uci, 'next_fen': board.fen(), 'game_over': False, 'session_id': session.session_id}
             return Response(MakeMoveResponseSerializer(response_data).data)
 
-        ai_move_uci = get_optimized_ai_move(board.fen(), num_simulations=100)
-        ai_move = chess.Move.from_uci(ai_move_uci)
-
-        node = node.add_variation(ai_move, comment="AI Move (StockZero)") # Add AI move to PGN with engine info
-        board.push(ai_move)
-
-        response_data = {'ai_move': ai_move_uci, 'next_fen': board.fen()}
-        if board.is_game_over():
-            game_pgn.headers["Result"] = board.result() # Set game result in PGN
-            game_pgn.headers["AI"] = f"StockZero Engine ({ai_player_color})" # Add AI engine info
-            game_record = GameRecord.objects.create(
-                pgn_content=game_pgn.export(as_str=True),
-                result=board.result(),
-                ai_player_color=ai_player_color,
-                user=request.user if request.user.is_authenticated else None # Associate with user if authenticated
-            )
-            logger.info(f"Game over - Recorded PGN to database, Game ID: {game_record.id}, Result: {board.result()}") # Log game completion
-            response_data.update({'game_over': True, 'result': board.result()})
+        except ValueError as ve:
+            logger.error(f"ValueError processing move: {user_move_uci}, FEN: {board.fen()}, Error: {ve}") # Log ValueErrors
+            return Response(MakeMoveResponseSerializer({'error': 'Invalid move format'}).data, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            logger.exception(f"Unexpected server error processing move: {user_move_uci}, FEN: {board.fen()}") # Log unexpected errors with traceback
+            return Response(MakeMoveResponseSerializer({'error': f'Server error: {str(e)}'}).data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        return Response(MakeMoveResponseSerializer(response_data).data)
-
-    except ValueError as ve:
-        logger.error(f"ValueError processing move: {user_move_uci}, FEN: {current_fen}, Error: {ve}") # Log ValueErrors
-        return Response(MakeMoveResponseSerializer({'error': 'Invalid move format'}).data, status=status.HTTP_400_BAD_REQUEST)
-    except Exception as e:
-        logger.exception(f"Unexpected server error processing move: {user_move_uci}, FEN: {current_fen}") # Log unexpected errors with traceback
-        return Response(MakeMoveResponseSerializer({'error': f'Server error: {str(e)}'}).data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+def _finish_session_game(request, session, ai_move_uci=None):
+    """Queues the full game history of a finished session for logging and closes the session."""
+    board = session.board
+    result = board.result(claim_draw=True)
+    log_game(board, result, session.ai_player_color, user=request.user) # Buffered, written in batches off the request thread
+    session_store.delete(session.session_id)
+    logger.info(f"Game over - Queued game record, Session: {session.session_id}, Result: {result}, Plies: {len(board.move_stack)}") # Log game completion
+    response_data = {'ai_move': ai_move_uci, 'game_over': True, 'result': result, 'next_fen': board.fen(), 'session_id': session.session_id}
+    return Response(MakeMoveResponseSerializer(response_data).data)
 
 
 
@@ -91,38 +119,32 @@ def make_traditional_move_api(request):
         return Response(MakeMoveResponseSerializer({'error': serializer.errors}).data, status=status.HTTP_400_BAD_REQUEST)
 
     user_move_uci = serializer.validated_data['move']
-    current_fen = serializer.validated_data['fen']
+    current_fen = serializer.validated_data.get('fen')
+    if current_fen is None: # The traditional engine is stateless and always needs the position
+        return Response(MakeMoveResponseSerializer({'error': "'fen' is required"}).data, status=status.HTTP_400_BAD_REQUEST)
 
     board = chess.Board(fen=current_fen)
-    game_pgn = chess.pgn.Game()
-    game_pgn.headers["Event"] = "Traditional Chess Game"
-    game_pgn.setup(board.fen())
-    node = game_pgn.end()
 
     try:
         user_move = chess.Move.from_uci(user_move_uci)
         if user_move not in board.legal_moves:
             return Response(MakeMoveResponseSerializer({'error': 'Illegal move'}).data, status=status.HTTP_400_BAD_REQUEST)
 
-        node = node.add_variation(user_move, comment="User Move")
         board.push(user_move)
 
         if board.is_game_over():
-            game_pgn.headers["Result"] = board.result()
-            GameRecord.objects.create(pgn_content=game_pgn.export(as_str=True), result=board.result(), ai_player_color="Traditional AI", user=request.user if request.user.is_authenticated else None)
+            log_game(board, board.result(), "Traditional AI", user=request.user)
             response_data = {'game_over': True, 'result': board.result(), 'next_fen': board.fen()}
             return Response(MakeMoveResponseSerializer(response_data).data)
 
         ai_move_uci = call_traditional_ai(board.fen(), level=2) # Call traditional engine, depth=2 (adjust depth)
         ai_move = chess.Move.from_uci(ai_move_uci)
 
-        node = node.add_variation(ai_move, comment="Traditional AI Move")
         board.push(ai_move)
 
         response_data = {'ai_move': ai_move_uci, 'next_fen': board.fen()}
         if board.is_game_over():
-            game_pgn.headers["Result"] = board.result()
-            GameRecord.objects.create(pgn_content=game_pgn.export(as_str=True), result=board.result(), ai_player_color="Traditional AI", user=request.user if request.user.is_authenticated else None)
+            log_game(board, board.result(), "Traditional AI", user=request.user)
             response_data.update({'game_over': True, 'result': board.result()})
 
         return Response(MakeMoveResponseSerializer(response_data).data)
@@ -130,4 +152,35 @@ def make_traditional_move_api(request):
     except ValueError:
         return Response(MakeMoveResponseSerializer({'error': 'Invalid move format'}).data, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
-        return Response(MakeMoveResponseSerializer({'error': f'Server error: {str(e)}'}).data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response(MakeMoveResponseSerializer({'error': f'Server error: {str(e)}'}).data, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+@throttle_classes([AnonRateThrottle, UserRateThrottle])
+@instrumented('analyse')
+def analyse_positions_api(request):
+    """API endpoint for bulk analysis: top-K moves with visits, Q-values and value-head evaluation for each FEN."""
+    serializer = AnalyseRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        logger.warning(f"Invalid analyse request data: {serializer.errors}")
+        return Response({'error': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+    fens = serializer.validated_data['fens']
+    try:
+        analyses = analyse_positions(fens, num_simulations=serializer.validated_data['num_simulations'], top_k=serializer.validated_data['top_k'])
+    except Exception as e:
+        logger.exception(f"Unexpected server error analysing {len(fens)} positions")
+        return Response({'error': f'Server error: {str(e)}'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    return Response({'positions': PositionAnalysisSerializer(analyses, many=True).data})
+
+def metrics_view(request):
+    """Prometheus scrape endpoint with the search metrics of all workers, for staff users or scrapers sending the metrics token."""
+    token = METRICS_SETTINGS.get('TOKEN')
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    has_token = bool(token) and hmac.compare_digest(authorization.encode(), f"Bearer {token}".encode())
+    if not (has_token or (request.user.is_authenticated and request.user.is_staff)):
+        return HttpResponse("Forbidden\n", status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(METRICS_SETTINGS.get('MULTIPROCESS_DIR')), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+def readiness_view(request):
+    """Readiness probe: 200 once the model is loaded and warmed up, 503 before (or if loading failed)."""
+    return JsonResponse(engine_status, status=200 if engine_status['ready'] else 503)
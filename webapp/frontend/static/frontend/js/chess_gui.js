@@ -4,6 +4,7 @@ $ (document).ready (function () {
   var $board = $ ('#board');
   var $status = $ ('#game-status');
   var engineThinking = false; // Flag to prevent user moves while AI is thinking
+  var sessionId = null; // Server-side game session for the RL engine
 
   function onDragStart (source, piece, position, orientation) {
     if (game.game_over () || engineThinking) return false; // Block drag if game over or AI thinking
@@ -17,6 +18,7 @@ $ (document).ready (function () {
 
   function onDrop (source, target) {
     engineThinking = true;
+    var fenBeforeMove = game.fen ();
     var move = {
       from: source,
       to: target,
@@ -34,8 +36,14 @@ $ (document).ready (function () {
 
     var engineType = $ ('#engine-selector').val (); // Get selected engine type (assuming a selector is added in HTML)
     var apiUrl = '/api/chess/make_move/'; // Default RL-based engine API
+    var payload = {move: possibleMove.uci ()};
     if (engineType === 'traditional') {
       apiUrl = '/api/chess/make_traditional_move/'; // Use traditional engine API if selected
+      payload.fen = fenBeforeMove; // Traditional engine is stateless
+    } else if (sessionId) {
+      payload.session_id = sessionId; // Server already holds the game, send only the move
+    } else {
+      payload.fen = fenBeforeMove; // First move starts a new server-side session
     }
 
     $.ajax ({
@@ -43,15 +51,15 @@ $ (document).ready (function () {
       url: apiUrl,
       contentType: 'application/json',
       dataType: 'json',
-      data: JSON.stringify ({
-        move: possibleMove.uci (),
-        fen: game.fen (),
-      }),
+      data: JSON.stringify (payload),
       headers: {
         'X-CSRFToken': getCookie ('csrftoken'),
       },
       success: function (data) {
         engineThinking = false; // Reset flag - AI move received
+        if (data.session_id) {
+          sessionId = data.session_id;
+        }
         if (data.error) {
           alert ('Error: ' + data.error);
           game.undo ();
@@ -64,6 +72,7 @@ $ (document).ready (function () {
             updateBoardPosition ();
             updateStatus (true, data.result); // Update status again after AI's final move
           }
+          sessionId = null; // Session is closed once the game is recorded
           alert ('Game Over! Result: ' + data.result); // Alert game over result
         } else {
           game.move (data.ai_move);
@@ -73,6 +82,9 @@ $ (document).ready (function () {
       },
       error: function (xhr, textStatus, errorThrown) {
         engineThinking = false; // Reset flag in case of error
+        if (xhr.status === 404) {
+          sessionId = null; // Session expired - the next move starts a new one from the current position
+        }
         alert ('Request failed: ' + textStatus + ', ' + errorThrown);
         game.undo ();
         updateBoardPosition ();